@@ -3,6 +3,7 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
+from storefront.images import schedule_derivatives
 from storefront.models import Customer
 
 def register(request):
@@ -121,8 +122,12 @@ def edit_profile(request):
     if request.method == 'POST':
         if customer:
             # Update customer profile
-            if request.FILES.get('profile_picture'):
-                customer.profile_picture = request.FILES.get('profile_picture')
+            new_picture = request.FILES.get('profile_picture')
+            if new_picture:
+                customer.profile_picture = new_picture
+                # Recorded again by the image pipeline once the new derivatives exist
+                customer.profile_picture_width = None
+                customer.profile_picture_height = None
             
             customer.bio = request.POST.get('bio', '')
             
@@ -137,6 +142,8 @@ def edit_profile(request):
             customer.employment_status = request.POST.get('employment_status', 'Employed')
             customer.income_range = request.POST.get('income_range', 'Below 30k')
             customer.save()
+            if new_picture:
+                schedule_derivatives(customer)
         
         return redirect('accounts:profile')
     
@@ -1,4 +1,5 @@
 from django import forms
+from storefront.images import schedule_derivatives
 from storefront.models import Product
 
 
@@ -6,6 +7,7 @@ class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
         fields = [
+            'sku',
             'name',
             'description',
             'category',
@@ -22,4 +24,16 @@ class ProductForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'rows': 4}),
         }
 
-
+    def save(self, commit=True):
+        product = super().save(commit=False)
+        image_changed = 'image' in self.changed_data
+        if image_changed:
+            # Recorded again by the image pipeline once the new derivatives exist
+            product.image_width = None
+            product.image_height = None
+        if commit:
+            product.save()
+            self.save_m2m()
+            if image_changed:
+                schedule_derivatives(product)
+        return product
@@ -1,3 +1,252 @@
-from django.test import TestCase
+import asyncio
+from decimal import Decimal
+import json
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from storefront import order_summary, perf, restock
+from storefront.events import DatabaseBroker, get_broker, order_event
+from storefront.models import Product, Customer, Favorite, Order, OrderItem
+from storefront.signals import get_sales_version
+from storefront.tests.base import QueryPlanMixin
+
+
+class DashboardDataTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='staffpass123', is_staff=True)
+        self.client.force_login(self.staff)
+        self.product = Product.objects.create(name='Lamp', category='Home & Kitchen', price=Decimal('20.00'), stock=5)
+        customer = Customer.objects.create(user=User.objects.create_user('buyer'))
+        order = Order.objects.create(customer=customer, total_amount=Decimal('40.00'))
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, price=Decimal('20.00'))
+        self.customer = customer
+
+    def test_chart_endpoints_return_json(self):
+        resp = self.client.get(reverse('adminpanel:admin_category_data'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {'labels': ['Home & Kitchen'], 'data': [40.0]})
+        resp = self.client.get(reverse('adminpanel:admin_sales_data'))
+        self.assertEqual(resp.json()['monthly']['data'], [40.0])
+
+    def test_unchanged_data_returns_304_without_queries(self):
+        url = reverse('adminpanel:admin_sales_data')
+        etag = self.client.get(url)['ETag']
+        # Only the user lookup runs (the session comes from cache) - no aggregation
+        with self.assertNumQueries(1):
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_new_order_changes_etag(self):
+        url = reverse('adminpanel:admin_category_data')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(customer=self.customer, total_amount=Decimal('5.00'))
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_etag_changes_only_after_the_order_commits(self):
+        version = get_sales_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            order = Order.objects.create(customer=self.customer, total_amount=Decimal('5.00'))
+            OrderItem.objects.create(order=order, product=self.product, quantity=1, price=Decimal('5.00'))
+            # A chart poll before the commit still gets the old ETag
+            self.assertEqual(get_sales_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_sales_version(), version)
+
+    def test_non_staff_cannot_read_chart_data(self):
+        self.client.force_login(self.customer.user)
+        resp = self.client.get(reverse('adminpanel:admin_sales_data'))
+        self.assertEqual(resp.status_code, 302)
+
+    def test_dashboard_shell_renders(self):
+        resp = self.client.get(reverse('adminpanel:admin_dashboard'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, reverse('adminpanel:admin_sales_data'))
+
+    def test_performance_page_lists_views(self):
+        perf.reset_stats()
+        self.client.get(reverse('adminpanel:admin_dashboard'))
+        resp = self.client.get(reverse('adminpanel:admin_performance'))
+        self.assertContains(resp, 'adminpanel:admin_dashboard')
+        self.client.post(reverse('adminpanel:admin_performance'))
+        # Only the reset request itself is left
+        self.assertEqual([row['view'] for row in perf.view_stats()], ['adminpanel:admin_performance'])
+
+        self.client.force_login(self.customer.user)
+        self.assertEqual(self.client.get(reverse('adminpanel:admin_performance')).status_code, 302)
+
+
+class LiveOrderFeedTests(TestCase):
+    LISTENERS = 300
+
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='staffpass123', is_staff=True)
+        self.buyer = User.objects.create_user('buyer', password='buyerpass123')
+        self.product = Product.objects.create(name='Kettle', category='Home & Kitchen', price=Decimal('30.00'), stock=10)
+
+    async def wait_for(self, predicate, timeout=10):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not predicate():
+            self.assertLess(asyncio.get_running_loop().time(), deadline)
+            await asyncio.sleep(0.01)
+
+    async def test_many_listeners_share_one_worker_without_polling(self):
+        await self.async_client.aforce_login(self.staff)
+        url = reverse('adminpanel:admin_live_orders')
+        responses = await asyncio.gather(*[self.async_client.get(url) for _ in range(self.LISTENERS)])
+        received = [[] for _ in responses]
+
+        async def listen(response, chunks):
+            async for chunk in response.streaming_content:
+                chunks.append(chunk.decode() if isinstance(chunk, bytes) else chunk)
+
+        tasks = [asyncio.create_task(listen(r, chunks)) for r, chunks in zip(responses, received)]
+        await self.wait_for(lambda: get_broker().listener_count() == self.LISTENERS)
+
+        event = {'order_id': 1, 'customer': 'buyer', 'status': 'Pending',
+                 'total_amount': 34.99, 'revenue_delta': 30.0, 'item_count': 1,
+                 'created_at': '2025-01-01T00:00:00+00:00'}
+        ctx = CaptureQueriesContext(connection)
+        await sync_to_async(ctx.__enter__)()
+        # Publish from another thread, as a sync checkout view would
+        delivered = await asyncio.to_thread(get_broker().publish, event)
+        await self.wait_for(lambda: all(len(chunks) == 2 for chunks in received))
+        await sync_to_async(ctx.__exit__)(None, None, None)
+
+        self.assertEqual(delivered, self.LISTENERS)
+        self.assertEqual(len(ctx.captured_queries), 0)
+        for chunks in received:
+            self.assertIn('event: order', chunks[1])
+            self.assertEqual(json.loads(chunks[1].split('data: ', 1)[1])['revenue_delta'], 30.0)
+
+        # Client disconnects cancel the streams, which unsubscribes them
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertEqual(get_broker().listener_count(), 0)
+
+    def test_confirm_order_publishes_event(self):
+        received = []
+        broker = get_broker()
+        original_publish = broker.publish
+        broker.publish = received.append
+        try:
+            self.client.force_login(self.buyer)
+            self.client.post(reverse('storefront:add_to_cart', args=[self.product.id]), {'quantity': 2})
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('storefront:confirm_order'))
+        finally:
+            broker.publish = original_publish
+        self.assertEqual(len(received), 1)
+        self.assertEqual(received[0]['revenue_delta'], 60.0)
+        self.assertEqual(received[0]['item_count'], 2)
+
+    def place_order(self, total='34.99'):
+        customer, _ = Customer.objects.get_or_create(user=self.buyer)
+        order = Order.objects.create(customer=customer, total_amount=Decimal(total))
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=Decimal('30.00'))
+        order_summary.summarize_orders([order.pk])
+        return order
+
+    async def test_database_broker_delivers_orders_from_other_processes(self):
+        broker = DatabaseBroker()
+        with mock.patch.object(broker, 'ensure_poller'):
+            subscription = broker.subscribe()
+        # The first poll only notes where to start
+        await sync_to_async(self.place_order)()
+        self.assertEqual(await sync_to_async(broker.poll)(), 0)
+
+        # Placed by another worker: nothing was published in this process
+        other = await sync_to_async(self.place_order)()
+
+        def poll_once():
+            # One range read, with the summaries joined in
+            with self.assertNumQueries(1):
+                return broker.poll()
+
+        self.assertEqual(await sync_to_async(poll_once)(), 1)
+        event = await asyncio.wait_for(subscription.get(), timeout=5)
+        self.assertEqual((event['order_id'], event['revenue_delta']), (other.pk, 30.0))
+
+        # Placed here: delivered when published, not again by the poll
+        own = await sync_to_async(self.place_order)()
+        summary = await sync_to_async(lambda: own.summary)()
+        broker.publish(order_event(own, summary))
+        self.assertEqual(await sync_to_async(broker.poll)(), 0)
+        event = await asyncio.wait_for(subscription.get(), timeout=5)
+        self.assertEqual(event['order_id'], own.pk)
+        self.assertTrue(subscription.queue.empty())
+
+        broker.unsubscribe(subscription)
+        self.assertEqual(await sync_to_async(broker.poll)(), 0)
+        self.assertIsNone(broker.last_order_id)
+
+    def test_wsgi_request_gets_204(self):
+        self.client.force_login(self.staff)
+        resp = self.client.get(reverse('adminpanel:admin_live_orders'))
+        self.assertEqual(resp.status_code, 204)
+
+
+@override_settings(RESTOCK_NOTIFY_WORKERS=1)
+class RestockFromAdminTests(TestCase):
+    def test_save_queues_notifications_instead_of_sending(self):
+        staff = User.objects.create_user('staff', password='staffpass123', is_staff=True)
+        product = Product.objects.create(sku='KETTLE', name='Kettle', category='Home & Kitchen',
+                                         price=Decimal('30.00'), stock=0)
+        fans = User.objects.bulk_create(User(username=f'fan{n}', email=f'fan{n}@example.com') for n in range(50))
+        Favorite.objects.bulk_create(Favorite(user=u, product=product, notify_when_available=True) for u in fans)
+        self.client.force_login(staff)
+
+        executor = mock.Mock()
+        with mock.patch.object(restock, 'get_executor', return_value=executor), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('adminpanel:admin_edit_product', args=[product.id]), {
+                'sku': 'KETTLE', 'name': 'Kettle', 'category': 'Home & Kitchen', 'price': '30.00',
+                'stock': 12, 'reorder_threshold': 10,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        executor.submit.assert_called_once_with(restock._run_in_worker, [product.id])
+
+        # What the worker thread then does
+        restock.send_restock_notifications([product.id])
+        self.assertEqual(len(mail.outbox), 50)
+
+
+class AdminQueryPlanTests(QueryPlanMixin, TestCase):
+    """Dashboard, chart and stock queries must use indexes"""
+
+    def setUp(self):
+        staff = User.objects.create_user('staff', password='staffpass123', is_staff=True)
+        self.client.force_login(staff)
+        self.product = Product.objects.create(name='Lamp', category='Home & Kitchen', price=Decimal('20.00'), stock=5)
+        customer = Customer.objects.create(user=User.objects.create_user('buyer'))
+        for status in ('Pending', 'Cancelled'):
+            order = Order.objects.create(customer=customer, status=status, total_amount=Decimal('20.00'))
+            OrderItem.objects.create(order=order, product=self.product, quantity=1, price=Decimal('20.00'))
+
+    def test_admin_pages_use_indexes(self):
+        for name, args in [
+            ('adminpanel:admin_dashboard', []),
+            ('adminpanel:admin_sales_data', []),
+            ('adminpanel:admin_category_data', []),
+            ('adminpanel:admin_stock', []),
+            ('adminpanel:admin_edit_product', [self.product.id]),
+        ]:
+            with self.subTest(view=name):
+                wrapper, queries = self.capture_queries()
+                with wrapper:
+                    response = self.client.get(reverse(name, args=args))
+                self.assertEqual(response.status_code, 200)
+                self.assertNoFullScans(queries)
@@ -9,4 +9,8 @@ urlpatterns = [
     path('edit/<int:product_id>/', views.edit_product, name='admin_edit_product'),
     path('delete/<int:product_id>/', views.delete_product, name='admin_delete_product'),
     path('stock/', views.stock_management, name='admin_stock'),
+    path('performance/', views.performance, name='admin_performance'),
+    path('data/sales/', views.sales_timeseries_data, name='admin_sales_data'),
+    path('data/categories/', views.category_pie_data, name='admin_category_data'),
+    path('live/orders/', views.live_orders, name='admin_live_orders'),
 ]
@@ -1,50 +1,57 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.db.models import Sum, F
 from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncYear
+from django.conf import settings
+from storefront import perf, product_cache
 from storefront.models import Product, OrderItem, Order
+from storefront.events import get_broker
+from storefront.signals import get_sales_version
 from .forms import ProductForm
+import asyncio
 import json
 
+# Seconds between SSE keep-alive comments on an idle live feed
+LIVE_FEED_KEEPALIVE = 15
+
 
 def staff_required(user):
     return user.is_authenticated and (user.is_staff or user.is_superuser)
 
-@login_required
-@user_passes_test(staff_required)
-def dashboard(request):
-    products = Product.objects.all()
+def aggregate_sales_by(trunc_fn, queryset, periods):
+    """Sales revenue per period for the last ``periods`` periods"""
+    qs = (
+        OrderItem.objects.filter(order__in=queryset)
+        .annotate(period=trunc_fn(F('order__created_at')))
+        .values('period')
+        .annotate(total=Sum(F('price') * F('quantity')))
+        .order_by('period')
+    )
+    labels = [x['period'].strftime('%Y-%m-%d') if hasattr(x['period'], 'strftime') else str(x['period']) for x in qs]
+    data = [float(x['total'] or 0) for x in qs]
+    return {'labels': labels[-periods:], 'data': data[-periods:]}
 
+
+def get_sales_timeseries():
+    """Revenue time series (daily/weekly/monthly/yearly) over non-cancelled orders"""
     # Filter orders to include only non-cancelled
-    valid_orders = Order.objects.exclude(status='Cancelled')
-
-    # Time-series aggregations (sales revenue)
-    def aggregate_sales_by(trunc_fn, queryset, periods):
-        qs = (
-            OrderItem.objects.filter(order__in=queryset)
-            .annotate(period=trunc_fn(F('order__created_at')))
-            .values('period')
-            .annotate(total=Sum(F('price') * F('quantity')))
-            .order_by('period')
-        )
-        labels = [x['period'].strftime('%Y-%m-%d') if hasattr(x['period'], 'strftime') else str(x['period']) for x in qs]
-        data = [float(x['total'] or 0) for x in qs]
-        return {'labels': labels[-periods:], 'data': data[-periods:]}
-
-    sales_daily = aggregate_sales_by(TruncDay, valid_orders, periods=30)
-    sales_weekly = aggregate_sales_by(TruncWeek, valid_orders, periods=12)
-    sales_monthly = aggregate_sales_by(TruncMonth, valid_orders, periods=12)
-    sales_yearly = aggregate_sales_by(TruncYear, valid_orders, periods=5)
-
-    sales_timeseries = {
-        'daily': sales_daily,
-        'weekly': sales_weekly,
-        'monthly': sales_monthly,
-        'yearly': sales_yearly,
+    valid_orders = Order.objects.filter(status__in=Order.VALID_STATUSES)
+    return {
+        'daily': aggregate_sales_by(TruncDay, valid_orders, periods=30),
+        'weekly': aggregate_sales_by(TruncWeek, valid_orders, periods=12),
+        'monthly': aggregate_sales_by(TruncMonth, valid_orders, periods=12),
+        'yearly': aggregate_sales_by(TruncYear, valid_orders, periods=5),
     }
 
-    # Category pie (revenue by product category)
+
+def get_category_pie():
+    """Revenue by product category over non-cancelled orders"""
+    valid_orders = Order.objects.filter(status__in=Order.VALID_STATUSES)
     category_qs = (
         OrderItem.objects.filter(order__in=valid_orders)
         .values('product__category')
@@ -53,24 +60,78 @@ def dashboard(request):
     )
     category_labels = [row['product__category'] or 'Uncategorized' for row in category_qs]
     category_data = [float(row['total'] or 0) for row in category_qs]
+    return {'labels': category_labels, 'data': category_data}
 
-    raw_categories = (
-        Product.objects
-        .values_list('category', flat=True)
-        .exclude(category__isnull=True)
-        .exclude(category__exact='')
-    )
+
+def sales_etag(request, *args, **kwargs):
+    """ETag for chart data - changes only when sales data changes"""
+    return f'sales-{get_sales_version()}'
+
+
+@login_required
+@user_passes_test(staff_required)
+def dashboard(request):
+    products = Product.objects.all()
+
+    # Blank categories are dropped here: a WHERE on them would still read the whole index
+    raw_categories = Product.objects.values_list('category', flat=True).order_by().distinct()
     # Normalize categories to remove duplicate variants (trim/case)
-    categories = sorted({(c or '').strip() for c in raw_categories}, key=lambda x: x.lower())
+    categories = sorted({(c or '').strip() for c in raw_categories} - {''}, key=lambda x: x.lower())
     
+    # Chart data is loaded separately from the JSON endpoints below
     context = {
         'products': products,
         'categories': categories,
-        'sales_timeseries_json': json.dumps(sales_timeseries),
-        'category_pie_json': json.dumps({'labels': category_labels, 'data': category_data}),
     }
     return render(request, 'adminpanel/dashboard.html', context)
 
+@login_required
+@user_passes_test(staff_required)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=sales_etag)
+def sales_timeseries_data(request):
+    """Sales time series as JSON (304 when unchanged)"""
+    return JsonResponse(get_sales_timeseries())
+
+@login_required
+@user_passes_test(staff_required)
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=sales_etag)
+def category_pie_data(request):
+    """Revenue by category as JSON (304 when unchanged)"""
+    return JsonResponse(get_category_pie())
+
+@login_required
+@user_passes_test(staff_required)
+async def live_orders(request):
+    """Server-Sent Events stream of newly placed orders (ASGI only)"""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for the whole stream; 204 tells
+        # EventSource to stop reconnecting
+        return HttpResponse(status=204)
+
+    broker = get_broker()
+
+    async def stream():
+        subscription = broker.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=LIVE_FEED_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: order\nid: {event['order_id']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Runs when the client disconnects and the stream is cancelled
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 @user_passes_test(staff_required)
 def add_product(request):
@@ -108,5 +169,24 @@ def delete_product(request, product_id):
 @login_required
 @user_passes_test(staff_required)
 def stock_management(request):
-    low_stock = Product.objects.filter(stock__lte=10)
+    low_stock = Product.objects.filter(stock__lte=10).order_by('stock')
     return render(request, 'adminpanel/stock.html', {'low_stock': low_stock})
+
+@login_required
+@user_passes_test(staff_required)
+def performance(request):
+    """Rolling per-view timings and suspected N+1 queries for this server process"""
+    if request.method == 'POST':
+        perf.reset_stats()
+        product_cache.reset_stats()
+        return redirect('adminpanel:admin_performance')
+    views = perf.view_stats()
+    context = {
+        'enabled': getattr(settings, 'PERF_INSTRUMENTATION', True),
+        'window': perf.window(),
+        'threshold': perf.n_plus_one_threshold(),
+        'views': views,
+        'suspects': [(row['view'], *suspect) for row in views for suspect in row['suspects']],
+        'product_cache': product_cache.stats(),
+    }
+    return render(request, 'adminpanel/performance.html', context)
@@ -3,14 +3,34 @@ ASGI config for auroramart project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Async views such as the admin live order feed (Server-Sent Events) need to be
+served from here, e.g. ``manage.py serve --asgi`` (pre-fork uvicorn workers) or
+``uvicorn auroramart.asgi:application``; under WSGI (``runserver``) the feed
+is disabled and the dashboard works without it.
+The storefront home and product pages are async too: under ASGI they run
+their independent queries concurrently, under WSGI Django runs them in a
+private event loop per request (``manage.py benchmark_views`` compares both).
+AuroBot's streamed replies (``aurabot/stream/``) are paced only under ASGI,
+where a waiting conversation costs no thread (``manage.py loadtest_chat``).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auroramart.settings')
 
 application = get_asgi_application()
+
+# Write coalesced sessions back to the database periodically (storefront/sessions.py)
+from storefront.sessions import enable_flusher
+enable_flusher()
+
+# Load the ML models before serving instead of on the first request that needs them
+if getattr(settings, 'ML_PRELOAD', False):
+    from storefront.ml import preload_models
+    preload_models()
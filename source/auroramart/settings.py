@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,10 +45,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'storefront.perf.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'storefront.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,7 +59,9 @@ ROOT_URLCONF = 'auroramart.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render timing for storefront.perf
+        'BACKEND': 'storefront.perf.InstrumentedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,11 +83,111 @@ WSGI_APPLICATION = 'auroramart.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Read-through product cache (storefront/product_cache.py)
+    'products': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'products',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    # Token buckets (storefront/ratelimit.py)
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ratelimit',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    # Rendered product cards, keyed by Product.card_version so they never go stale
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template_fragments',
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+PRODUCT_CACHE_ALIAS = 'products'
+
+# Version behind the dashboard chart ETags (storefront/signals.py); every server
+# process must see the same one
+SALES_VERSION_CACHE = 'default'
+
+# Sessions: served from the 'sessions' cache, written to the database at most
+# every SESSION_FLUSH_INTERVAL seconds (storefront/sessions.py)
+SESSION_ENGINE = 'storefront.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_FLUSH_INTERVAL = 30
+
+# Per-request timings, Server-Timing headers and N+1 detection (storefront/perf.py)
+PERF_INSTRUMENTATION = True
+# Who gets the Server-Timing header: True (everyone), 'staff' or False
+PERF_SERVER_TIMING = True
+PERF_WINDOW = 500
+PERF_N_PLUS_ONE_THRESHOLD = 5
+
+# ML models (storefront/ml.py) load on first use; True loads them when the
+# WSGI/ASGI application starts
+ML_PRELOAD = False
+
+# AuroBot product search index (storefront/product_search.py), written by
+# manage.py build_search_index; built from the database when missing
+PRODUCT_SEARCH_INDEX = BASE_DIR / 'ml_models' / 'product_index.joblib'
+
+# Token buckets per user or client IP for expensive views, and load shedding
+# by priority when this worker has too many requests in flight (storefront/ratelimit.py)
+RATE_LIMIT_CACHE = 'ratelimit'
+RATE_LIMITS = {
+    'storefront:aurabot_reply': {'rate': '30/m', 'burst': 10, 'priority': 'low'},
+    'storefront:aurabot_stream': {'rate': '30/m', 'burst': 10, 'priority': 'low'},
+    'storefront:confirm_order': {'rate': '10/m', 'burst': 5, 'methods': ['POST'], 'priority': 'high'},
+    'accounts:login': {'rate': '10/m', 'burst': 10, 'methods': ['POST'], 'priority': 'high'},
+    'adminpanel:admin_dashboard': {'rate': '60/m', 'burst': 20},
+    # Long-lived but cheap: every open dashboard holds one
+    'adminpanel:admin_live_orders': {'priority': 'high'},
+}
+LOAD_SHED_LIMITS = {'low': 16, 'normal': 48}
+LOAD_SHED_RETRY_AFTER = 2
+
+# Order history (storefront/orders.py): orders per page, and how long a
+# customer's first page is cached
+ORDER_HISTORY_PAGE_SIZE = 10
+ORDER_HISTORY_CACHE_TIMEOUT = 300
+# Shared by every server process, like SALES_VERSION_CACHE
+ORDER_HISTORY_CACHE = 'default'
+
+# Pre-fork production server (manage.py serve, storefront/prefork.py): worker
+# processes (0 = one per CPU), request threads per worker, and requests before a
+# worker is replaced (plus up to the jitter)
+SERVER_WORKERS = 0
+SERVER_THREADS = 4
+SERVER_MAX_REQUESTS = 5000
+SERVER_MAX_REQUESTS_JITTER = 500
+SERVER_TIMEOUT = 30
+SERVER_GRACEFUL_TIMEOUT = 30
+# Products loaded into the product cache before the workers are forked
+SERVER_PRELOAD_PRODUCTS = 1000
+
+# Seconds between the chunks of a streamed AuroBot reply (storefront/chat.py, ASGI only)
+AURABOT_STREAM_DELAY = 0.05
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -124,6 +229,20 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Threads that resize uploaded images off the request path (0 = resize inline)
+IMAGE_PIPELINE_WORKERS = 2
+
+# "Back in stock" emails (storefront/restock.py): sent off the request path
+# (0 workers = inline), written to files here instead of a mail server
+RESTOCK_NOTIFY_WORKERS = 1
+RESTOCK_PRODUCT_BATCH = 500
+RESTOCK_EMAIL_CHUNK = 500
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+DEFAULT_FROM_EMAIL = 'AuroraMart <auroramart@gmail.com>'
+# Absolute links in emails
+SITE_URL = 'http://127.0.0.1:8000'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,148 @@
+"""
+Production settings for auroramart.
+
+Builds on the development settings in ``settings.py``. Use with
+``DJANGO_SETTINGS_MODULE=auroramart.settings_production`` (or ``--settings``),
+after running ``python manage.py collectstatic``.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, CACHES, DATABASES, MIDDLEWARE, TEMPLATES
+
+DEBUG = False
+
+# Never fall back to the development key committed in settings.py: anyone could forge sessions with it
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY to run with the production settings')
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '127.0.0.1,localhost').split(',')
+SITE_URL = os.environ.get('DJANGO_SITE_URL', f'https://{ALLOWED_HOSTS[0]}')
+
+# Restock notifications go through a real mail server
+EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_HOST = os.environ.get('DJANGO_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('DJANGO_EMAIL_PORT', 25))
+
+
+# Database: keep connections open between requests (checked before reuse) and
+# let readers run alongside the single writer (WAL)
+
+DATABASES['default'].update({
+    'CONN_MAX_AGE': 600,
+    'CONN_HEALTH_CHECKS': True,
+    'OPTIONS': {
+        # Take the write lock at BEGIN so transactions never fail mid-way upgrading to it
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': 5,
+    },
+})
+
+# Applied to every new SQLite connection (storefront/db.py)
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,           # ms to wait for the write lock instead of failing
+    'journal_mode': 'WAL',          # readers no longer block on the writer
+    'synchronous': 'NORMAL',        # fsync at checkpoints only; safe with WAL
+    'cache_size': -64000,           # 64 MB page cache per connection
+    'mmap_size': 268435456,         # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+
+# Read replicas (storefront/routers.py): catalog reads in GET requests go to a
+# replica. DJANGO_DB_REPLICAS lists SQLite files kept fresh
+# with `manage.py snapshot_replicas --interval 30`.
+
+DATABASE_REPLICAS = []
+for index, path in enumerate(p for p in os.environ.get('DJANGO_DB_REPLICAS', '').split(',') if p):
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'OPTIONS': {'timeout': 5},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['storefront.routers.ReplicaRouter']
+
+# After a write, the client reads from the primary for this long
+REPLICA_STICKY_SECONDS = 5
+
+
+# Default, product and session caches on disk, so every worker process sees the
+# same invalidations, version counters and not-yet-flushed session changes
+
+CACHES['default'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': BASE_DIR / 'cache' / 'default',
+    'TIMEOUT': 300,
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+}
+
+CACHES['products'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': BASE_DIR / 'cache' / 'products',
+    'TIMEOUT': 300,
+    'OPTIONS': {'MAX_ENTRIES': 20000},
+}
+
+CACHES['sessions'] = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': BASE_DIR / 'cache' / 'sessions',
+    'TIMEOUT': None,
+    'OPTIONS': {'MAX_ENTRIES': 50000},
+}
+
+# Query counts and N+1 suspects are internals: only staff see Server-Timing
+# (the admin performance page still has every request's timings)
+PERF_SERVER_TIMING = 'staff'
+
+# Live dashboard feed: each worker also polls for orders placed by the others
+# (storefront/events.py)
+LIVE_FEED_BROKER = 'storefront.events.DatabaseBroker'
+LIVE_FEED_POLL_INTERVAL = 1
+
+# Rate-limit buckets in a memory-mapped table shared by all workers
+# (storefront/ratelimit.py); the file cache would list its directory on every write
+RATE_LIMIT_SHARED_FILE = BASE_DIR / 'cache' / 'ratelimit.buckets'
+
+
+# Static files: content-hashed names + gzip/brotli copies, built by collectstatic
+# and served by the app itself with far-future caching (see storefront/staticfiles.py)
+
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'storefront.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Templates: compiled once per process and never re-checked on disk (Django only
+# does this implicitly; pinned here so it survives DEBUG or loader changes)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# Uploaded product images are served by the same handler (urls.py only serves them with DEBUG on)
+STATIC_ASSETS_SERVE_MEDIA = True
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'storefront.staticfiles.StaticAssetMiddleware',
+    'storefront.routers.ReplicaRoutingMiddleware',
+] + [m for m in MIDDLEWARE if m != 'django.middleware.security.SecurityMiddleware']
+
+# Servers load the ML models at startup so no request waits for them
+# (manage.py commands still skip them)
+ML_PRELOAD = True
@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auroramart.settings')
 
 application = get_wsgi_application()
+
+# Write coalesced sessions back to the database periodically (storefront/sessions.py)
+from storefront.sessions import enable_flusher
+enable_flusher()
+
+# Load the ML models before serving instead of on the first request that needs them
+if getattr(settings, 'ML_PRELOAD', False):
+    from storefront.ml import preload_models
+    preload_models()
@@ -13,11 +13,12 @@ Run: python manage.py shell < load_initial_data.py
 import pandas as pd
 import os
 import sys
-from decimal import Decimal
 
 # Import Django models
 from storefront.models import Product, Customer
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
 
 print("=" * 60)
 print("🚀 AuroraMart Initial Data Loading")
@@ -30,39 +31,10 @@ print("\n📦 STEP 1: Loading Products...")
 print("-" * 60)
 
 try:
-    products_df = pd.read_csv('b2c_products_500.csv')
-    print(f"✓ Found CSV with {len(products_df)} products")
-    
-    created_count = 0
-    for idx, row in products_df.iterrows():
-        try:
-            # Map CSV columns to Product model
-            product, created = Product.objects.get_or_create(
-                name=row['Product name'],
-                defaults={
-                    'description': row['Product description'],
-                    'category': row['Product Category'],
-                    'price': Decimal(str(row['Unit price'])),
-                    'stock': int(row['Quantity on hand']),
-                    'reorder_threshold': int(row['Reorder Quantity']),
-                    'rating': Decimal(str(row['Product rating'])) if pd.notna(row['Product rating']) else None,
-                }
-            )
-            if created:
-                created_count += 1
-                
-            # Progress indicator
-            if (idx + 1) % 100 == 0:
-                print(f"  Progress: {idx + 1}/{len(products_df)} products processed")
-                
-        except Exception as e:
-            print(f"  ⚠ Error loading product {idx}: {e}")
-            continue
-    
-    print(f"✓ Successfully loaded {created_count} products into database")
-    
-except FileNotFoundError:
-    print("✗ ERROR: b2c_products_500.csv not found!")
+    # Chunked, batched upsert by SKU (see storefront/management/commands/load_catalog.py)
+    call_command('load_catalog', 'b2c_products_500.csv')
+except CommandError as e:
+    print(f"✗ ERROR: {e}")
     print("  Place the CSV file in the auroramartproj directory")
 except Exception as e:
     print(f"✗ ERROR loading products: {e}")
@@ -74,51 +46,10 @@ print("\n👥 STEP 2: Loading Customers...")
 print("-" * 60)
 
 try:
-    customers_df = pd.read_csv('b2c_customers_100.csv')
-    print(f"✓ Found CSV with {len(customers_df)} customers")
-    
-    created_count = 0
-    for idx, row in customers_df.iterrows():
-        try:
-            # Create Django User first
-            username = f"customer_{idx + 1}"
-            email = f"customer{idx + 1}@auroramart.com"
-            
-            # Create or get user
-            user, user_created = User.objects.get_or_create(
-                username=username,
-                defaults={
-                    'email': email,
-                    'first_name': f'Customer {idx + 1}',
-                }
-            )
-            
-            # Create or update Customer profile
-            customer, cust_created = Customer.objects.get_or_create(
-                user=user,
-                defaults={
-                    'age': int(row['age']) if pd.notna(row['age']) else None,
-                    'gender': 'M' if row['gender'] == 'Male' else 'F' if row['gender'] == 'Female' else 'O',
-                    'employment_status': row['employment_status'] if pd.notna(row['employment_status']) else 'Employed',
-                    'income_range': 'Below 30k',  # You might want to derive this from monthly_income_sgd
-                    'preferred_category': row['preferred_category'] if pd.notna(row['preferred_category']) else None,
-                }
-            )
-            
-            if cust_created:
-                created_count += 1
-                
-            if (idx + 1) % 20 == 0:
-                print(f"  Progress: {idx + 1}/{len(customers_df)} customers processed")
-                
-        except Exception as e:
-            print(f"  ⚠ Error loading customer {idx}: {e}")
-            continue
-    
-    print(f"✓ Successfully loaded {created_count} customers into database")
-    
-except FileNotFoundError:
-    print("✗ ERROR: b2c_customers_100.csv not found!")
+    # Vectorized field mapping + bulk inserts (see storefront/management/commands/load_customers.py)
+    call_command('load_customers', 'b2c_customers_100.csv')
+except CommandError as e:
+    print(f"✗ ERROR: {e}")
 except Exception as e:
     print(f"✗ ERROR loading customers: {e}")
 
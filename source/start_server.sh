@@ -10,10 +10,27 @@ if [ -d "venv" ]; then
     source venv/bin/activate
 fi
 
+# ./start_server.sh --production [host:port]: pre-fork server with the production settings
+if [ "$1" = "--production" ]; then
+    # Before migrating, so the production database and pragmas are the ones migrated
+    export DJANGO_SETTINGS_MODULE=auroramart.settings_production
+    if [ -z "$DJANGO_SECRET_KEY" ]; then
+        echo "Set DJANGO_SECRET_KEY to run with the production settings" >&2
+        exit 1
+    fi
+fi
+
 # Check if migrations are up to date
 echo "Checking migrations..."
 python3 manage.py migrate
 
+if [ "$1" = "--production" ]; then
+    python3 manage.py collectstatic --noinput
+    echo ""
+    echo "Starting production server (one worker per CPU, Ctrl+C to stop)..."
+    exec python3 manage.py serve "${2:-0.0.0.0:8000}"
+fi
+
 # Start the server
 echo ""
 echo "Starting Django development server..."
@@ -1,5 +1,8 @@
 from django.contrib import admin
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
 from .models import Product, Customer, Cart, CartItem, Order, OrderItem
+from .order_summary import attach_summaries
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -15,9 +18,39 @@ class CustomerAdmin(admin.ModelAdmin):
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'customer', 'status', 'total_amount', 'created_at')
+    # Customer and lines come from the order's summary, one joined row per order
+    list_display = ('id', 'customer_name', 'status', 'total_amount', 'item_count', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('customer__user__username',)
+    raw_id_fields = ('customer',)
+    readonly_fields = ('lines',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('summary')
+
+    def get_object(self, request, object_id, from_field=None):
+        order = super().get_object(request, object_id, from_field)
+        return order and attach_summaries([order])[0]
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        attach_summaries(changelist.result_list)
+        return changelist
+
+    @admin.display(description='Customer')
+    def customer_name(self, order):
+        return order.summary.data['customer']['username']
+
+    @admin.display(description='Items')
+    def item_count(self, order):
+        return order.summary.data['item_count']
+
+    @admin.display(description='Lines')
+    def lines(self, order):
+        return format_html_join(
+            mark_safe('<br>'), '{} × {} @ ${}',
+            ((line['quantity'], line['name'], line['unit_price']) for line in order.summary.data['lines']),
+        )
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
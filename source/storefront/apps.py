@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class StorefrontConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'storefront'
+
+    def ready(self):
+        # Register signal handlers and system checks
+        from . import (  # noqa: F401
+            db, orders, perf, product_cache, product_search, restock, routers, sessions, signals, staticfiles,
+        )
@@ -0,0 +1,94 @@
+"""
+AuroBot answers, whole (``aurabot_reply``) or streamed as Server-Sent Events
+(``aurabot_stream``).
+
+The streamed reply is sent a few words at a time, ``AURABOT_STREAM_DELAY``
+seconds apart. Under ASGI a conversation waiting between chunks is just a
+suspended coroutine, so one worker holds thousands of them (``manage.py
+loadtest_chat``). When the client goes away Django cancels the stream, and
+nothing more is sent. Under WSGI the chunks are sent without the delay, so a
+worker thread is never held for the pacing.
+"""
+
+import asyncio
+import json
+import logging
+import re
+
+from django.db import close_old_connections
+
+from .intents import get_engine
+from .product_search import suggest_products
+
+logger = logging.getLogger('storefront.chat')
+
+CHUNK_RE = re.compile(r'\S+\s*')
+WORDS_PER_CHUNK = 3
+
+_open_streams = 0
+
+
+def answer(message):
+    """(reply, products) for a message: the matching intent's reply, plus products unless it is small talk"""
+    table = get_engine().current()
+    intent = table.match(message)
+    products = []
+    if intent is None or intent.search:
+        products = suggest_products(message)
+    if intent is not None:
+        reply = intent.reply
+    elif products:
+        reply = f"Here's what I found for '{message}':"
+    else:
+        reply = table.fallback_reply(message)
+    return reply, products
+
+
+def answer_off_thread(message):
+    """
+    ``answer`` for a pool thread of its own (``thread_sensitive=False``). It is
+    CPU-bound, so chats do not wait in line on the single sync thread. The
+    product lookups may open a connection in that thread; it is closed or kept
+    under the same rules as at the end of a request.
+    """
+    try:
+        return answer(message)
+    finally:
+        close_old_connections()
+
+
+def sse_event(data, event=None):
+    lines = [f'event: {event}'] if event else []
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def reply_events(reply, products):
+    """The SSE events for a reply: text chunks, then the products, then done"""
+    words = CHUNK_RE.findall(reply)
+    for start in range(0, len(words), WORDS_PER_CHUNK):
+        yield sse_event({'text': ''.join(words[start:start + WORDS_PER_CHUNK])})
+    yield sse_event(products, event='products')
+    yield sse_event({}, event='done')
+
+
+async def stream_reply(reply, products, delay):
+    global _open_streams
+    _open_streams += 1
+    sent = 0
+    try:
+        for event in reply_events(reply, products):
+            if sent and delay:
+                await asyncio.sleep(delay)
+            yield event
+            sent += 1
+    except asyncio.CancelledError:
+        logger.debug('Chat client disconnected after %d events', sent)
+        raise
+    finally:
+        _open_streams -= 1
+
+
+def open_streams():
+    """Streamed replies in progress in this process"""
+    return _open_streams
@@ -0,0 +1,189 @@
+"""
+Live order events for the admin dashboard.
+
+Order placement publishes a small event, and every connected dashboard
+(an async SSE stream, see ``adminpanel.views.live_orders``) receives it
+without querying the database. The default broker, ``LocalBroker``, is
+in-process, so it needs no external service; with several worker processes
+each worker only sees its own orders.
+
+``DatabaseBroker`` (``LIVE_FEED_BROKER`` in the production settings) also
+delivers orders placed in other processes. While a process has listeners,
+one thread in it reads the orders committed since its last look every
+``LIVE_FEED_POLL_INTERVAL`` seconds: a single primary-key range read,
+whatever the number of listeners. Orders placed in the same process are
+delivered at once and skipped by the poll. Set ``LIVE_FEED_BROKER`` to the
+dotted path of any class with the same publish/subscribe/unsubscribe
+methods to use another transport.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('storefront.events')
+
+
+class Subscription:
+    """One listener: an asyncio queue bound to the loop that reads it"""
+
+    def __init__(self, loop, max_pending):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+
+    def put(self, event):
+        # Slow listeners drop their oldest event instead of growing forever
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """In-process pub/sub that fans events out to asyncio listeners"""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def listener_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event):
+        """Deliver an event to every listener (safe to call from any thread)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The listener's event loop is gone
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+
+class DatabaseBroker(LocalBroker):
+    """LocalBroker that also polls the orders table for orders placed by other processes"""
+
+    batch_size = 100
+
+    def __init__(self, max_pending=100):
+        super().__init__(max_pending)
+        self.last_order_id = None
+        # Orders this process published itself, so the poll does not repeat them
+        self._published = set()
+        # pid of the process whose poller thread is running (threads do not survive fork)
+        self._poller_pid = None
+
+    def subscribe(self):
+        subscription = super().subscribe()
+        self.ensure_poller()
+        return subscription
+
+    def publish(self, event):
+        with self._lock:
+            if self._subscribers:
+                self._published.add(event['order_id'])
+        return super().publish(event)
+
+    def ensure_poller(self):
+        if self._poller_pid == os.getpid():
+            return
+        with self._lock:
+            if self._poller_pid == os.getpid():
+                return
+            self._poller_pid = os.getpid()
+        threading.Thread(target=self._poll_periodically, name='live-feed-poller', daemon=True).start()
+
+    def _poll_periodically(self):
+        while True:
+            time.sleep(getattr(settings, 'LIVE_FEED_POLL_INTERVAL', 1))
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('Error polling for new orders')
+                connections.close_all()
+
+    def poll(self):
+        """Publish orders committed since the last poll; returns how many were new to this process"""
+        from .models import Order
+        from .order_summary import attach_summaries
+
+        if not self.listener_count():
+            # Nobody to tell: start from the newest order again once someone listens
+            self.last_order_id = None
+            with self._lock:
+                self._published.clear()
+            return 0
+        if self.last_order_id is None:
+            self.last_order_id = Order.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            with self._lock:
+                self._published = {pk for pk in self._published if pk > self.last_order_id}
+            return 0
+        orders = attach_summaries(list(
+            Order.objects.filter(pk__gt=self.last_order_id).select_related('summary').order_by('pk')[:self.batch_size]
+        ))
+        delivered = 0
+        for order in orders:
+            with self._lock:
+                seen = order.pk in self._published
+                self._published.discard(order.pk)
+            if not seen:
+                super().publish(order_event(order, order.summary))
+                delivered += 1
+            self.last_order_id = order.pk
+        return delivered
+
+
+_broker = None
+
+
+def get_broker():
+    """Return the process-wide broker"""
+    global _broker
+    if _broker is None:
+        broker_path = getattr(settings, 'LIVE_FEED_BROKER', None)
+        _broker = import_string(broker_path)() if broker_path else LocalBroker()
+    return _broker
+
+
+def order_event(order, summary):
+    """Build the event for a newly placed order from its summary"""
+    data = summary.data
+    return {
+        'order_id': order.id,
+        'customer': data['customer']['username'],
+        'status': order.status,
+        'total_amount': float(data['total']),
+        'revenue_delta': float(data['subtotal']),
+        'item_count': data['item_count'],
+        'created_at': data['created_at'],
+    }
+
+
+def publish_order(order, summary):
+    """Publish a placed order to live dashboards"""
+    try:
+        return get_broker().publish(order_event(order, summary))
+    except Exception as e:
+        # The live feed must never break checkout
+        print(f"Warning: Could not publish order event: {e}")
+        return 0
@@ -0,0 +1,130 @@
+"""
+Responsive image derivatives for product images and profile pictures.
+
+Each uploaded image gets WebP and JPEG copies at the widths in ``WIDTHS``
+(only those narrower than the original), stored next to it under
+``derived/``. Resizing runs in a small thread pool after the upload is
+committed, so it stays off the request path. When it finishes, the
+original's dimensions are recorded on the model. Templates only offer a
+``srcset`` once those dimensions are set (see the ``responsive_image`` tag).
+"""
+
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .models import Product, Customer
+
+WIDTHS = (160, 320, 640, 960)
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+QUALITY = 80
+
+# model -> (image field, width field, height field)
+IMAGE_FIELDS = {
+    Product: ('image', 'image_width', 'image_height'),
+    Customer: ('profile_picture', 'profile_picture_width', 'profile_picture_height'),
+}
+
+
+def derivative_name(name, width, fmt):
+    """Storage name of the resized copy of ``name``"""
+    folder, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(folder, 'derived', f'{stem}-{width}w.{fmt}')
+
+
+def derivative_widths(original_width):
+    """Widths that have resized copies for an image of this width"""
+    if not original_width:
+        return []
+    return [w for w in WIDTHS if w < original_width]
+
+
+def generate_derivatives(name, storage=default_storage):
+    """Write the resized copies of an image; return its (width, height)"""
+    with storage.open(name, 'rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        image.load()
+    width, height = image.size
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    for target in derivative_widths(width):
+        resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+        for fmt, pil_format in FORMATS.items():
+            out = resized.convert('RGB') if pil_format == 'JPEG' else resized
+            buffer = BytesIO()
+            out.save(buffer, pil_format, quality=QUALITY)
+            path = derivative_name(name, target, fmt)
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(buffer.getvalue()))
+    return width, height
+
+
+def record_dimensions(model, pk, name, width, height):
+    """Store the original's size, unless the image was replaced in the meantime"""
+    field, width_field, height_field = IMAGE_FIELDS[model]
+    return model.objects.filter(pk=pk, **{field: name}).update(**{width_field: width, height_field: height})
+
+
+def process_image(model, pk, name):
+    """Generate derivatives for one stored image and record its dimensions"""
+    try:
+        width, height = generate_derivatives(name)
+        record_dimensions(model, pk, name, width, height)
+    except Exception as e:
+        print(f"Warning: Could not generate image derivatives for {name}: {e}")
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PIPELINE_WORKERS', 2),
+            thread_name_prefix='image-pipeline',
+        )
+    return _executor
+
+
+def shutdown_executor():
+    """Wait for queued derivatives to be generated (a stopping server worker)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _run_in_worker(model, pk, name):
+    try:
+        process_image(model, pk, name)
+    finally:
+        # Worker threads have their own DB connections
+        close_old_connections()
+
+
+def schedule_derivatives(instance):
+    """Queue derivative generation for an instance's image once it is committed"""
+    field = IMAGE_FIELDS[type(instance)][0]
+    name = getattr(instance, field).name
+    if not name:
+        return
+    model, pk = type(instance), instance.pk
+
+    def submit():
+        if getattr(settings, 'IMAGE_PIPELINE_WORKERS', 2) == 0:
+            # Synchronous mode (tests, management shells)
+            process_image(model, pk, name)
+        else:
+            get_executor().submit(_run_in_worker, model, pk, name)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,178 @@
+"""
+Intent matching for AuroBot (``aurabot_reply``).
+
+Intents live in a JSON file (``AURABOT_INTENTS_FILE``, by default
+``storefront/data/intents.json``). Each has a name, a priority, keyword or
+phrase patterns, and a reply. ``{message}`` in the fallback reply is replaced
+with the user's message. Intents with ``"search": false`` (greetings,
+goodbyes) answer on their own; for the others, and for unmatched messages,
+the view also looks for products (``storefront.product_search``).
+
+The patterns are compiled once into a trie over words. A message is split
+into lowercase words and walked through the trie from each word, so matching
+costs O(words in the message x words in the longest phrase), however large
+the table is. Patterns only match whole words: "hi" does not fire inside
+"shipping", nor "no" inside "know". When several intents match, the highest
+priority wins, then the longest phrase, then the earliest one in the message.
+
+The file is checked for changes at most every ``AURABOT_INTENTS_RELOAD_INTERVAL``
+seconds and recompiled when it changes. A broken file is logged and the
+previous table stays in use.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger('storefront.intents')
+
+WORD_RE = re.compile(r'\w+')
+# Trie key holding (priority, length, intent) for the phrase ending at that node
+END = ''
+
+
+def words(text):
+    return WORD_RE.findall(text.lower())
+
+
+class Intent:
+    __slots__ = ('name', 'priority', 'patterns', 'reply', 'search')
+
+    def __init__(self, name, priority, patterns, reply, search=True):
+        self.name = name
+        self.priority = priority
+        self.patterns = patterns
+        self.reply = reply
+        self.search = search
+
+    def __repr__(self):
+        return f'<Intent {self.name}>'
+
+
+class IntentTable:
+    """Intents compiled into a word trie"""
+
+    def __init__(self, intents, fallback=''):
+        self.intents = intents
+        self.fallback = fallback
+        self.trie = {}
+        for intent in intents:
+            for pattern in intent.patterns:
+                tokens = words(pattern)
+                if not tokens:
+                    continue
+                node = self.trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                # The same phrase in two intents: the higher priority keeps it
+                candidate = (intent.priority, len(tokens), intent)
+                if END not in node or candidate[:2] > node[END][:2]:
+                    node[END] = candidate
+
+    @classmethod
+    def from_dict(cls, data):
+        intents = []
+        for entry in data['intents']:
+            if not entry.get('patterns') or 'reply' not in entry:
+                raise ValueError(f"Intent {entry.get('name', '?')!r} needs patterns and a reply")
+            intents.append(Intent(
+                entry['name'], int(entry.get('priority', 0)), list(entry['patterns']), entry['reply'],
+                bool(entry.get('search', True)),
+            ))
+        return cls(intents, data.get('fallback', ''))
+
+    def match(self, message):
+        """The best matching Intent, or None"""
+        tokens = words(message)
+        best = None
+        best_key = None
+        for start in range(len(tokens)):
+            node = self.trie
+            for token in tokens[start:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                found = node.get(END)
+                if found is not None:
+                    key = (found[0], found[1], -start)
+                    if best_key is None or key > best_key:
+                        best, best_key = found[2], key
+        return best
+
+    def reply(self, message):
+        intent = self.match(message)
+        if intent is not None:
+            return intent.reply
+        return self.fallback_reply(message)
+
+    def fallback_reply(self, message):
+        return self.fallback.replace('{message}', message)
+
+
+class IntentEngine:
+    """An IntentTable loaded from a file and reloaded when the file changes"""
+
+    def __init__(self, path, reload_interval=2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.table = IntentTable([])
+        self.mtime = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Recompile the table if the file changed; returns True if it was reloaded"""
+        with self.lock:
+            self.checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                logger.warning('Cannot read intents file %s: %s', self.path, e)
+                return False
+            if mtime == self.mtime:
+                return False
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    table = IntentTable.from_dict(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.warning('Keeping the previous intents: %s is invalid: %s', self.path, e)
+                # Do not retry the same broken file on every message
+                self.mtime = mtime
+                return False
+            self.table, self.mtime = table, mtime
+            return True
+
+    def current(self):
+        """The table, reloaded first if the file may have changed"""
+        if time.monotonic() - self.checked_at >= self.reload_interval:
+            self.reload()
+        return self.table
+
+    def match(self, message):
+        return self.current().match(message)
+
+    def reply(self, message):
+        return self.current().reply(message)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = IntentEngine(
+                    getattr(settings, 'AURABOT_INTENTS_FILE',
+                            os.path.join(settings.BASE_DIR, 'storefront', 'data', 'intents.json')),
+                    getattr(settings, 'AURABOT_INTENTS_RELOAD_INTERVAL', 2.0),
+                )
+    return _engine
@@ -0,0 +1,60 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from storefront.models import Order, OrderSummary
+from storefront.order_summary import build_summaries, save_summaries
+from storefront.restock import chunked
+
+
+def _init_worker():
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auroramart.settings')
+    django.setup()
+
+
+def build_batch(order_ids):
+    """(order_id, data) for one batch (runs in a worker process)"""
+    return [(summary.order_id, summary.data) for summary in build_summaries(order_ids)]
+
+
+class Command(BaseCommand):
+    help = 'Write the summary snapshot of every order that does not have one yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders per batch')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        missing = Order.objects.filter(summary__isnull=True).order_by('id').values_list('id', flat=True)
+        batches = list(chunked(missing.iterator(), options['batch_size']))
+        total = sum(len(batch) for batch in batches)
+        self.stdout.write(f"{total:,} orders without a summary, {len(batches)} batch(es), "
+                          f"{options['workers']} worker(s)")
+        started = time.perf_counter()
+        written = 0
+
+        def save(rows):
+            # Workers only read; this process does all the writing, so SQLite never has two writers
+            nonlocal written
+            save_summaries([OrderSummary(order_id=order_id, data=data) for order_id, data in rows])
+            written += len(rows)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {written:,}/{total:,}')
+
+        if options['workers'] > 1 and len(batches) > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                for rows in pool.map(build_batch, batches):
+                    save(rows)
+        else:
+            for batch in batches:
+                save(build_batch(batch))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written:,} order summaries in {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f}/sec)'
+        ))
@@ -0,0 +1,237 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+
+from storefront.db import apply_sqlite_pragmas
+from storefront.management.commands.snapshot_replicas import snapshot_sqlite
+from storefront.models import Customer, Order, OrderItem, Product
+
+ALIAS = 'benchmark'
+REPLICA_ALIAS = 'benchmark_replica'
+
+# SQLite's own defaults, pinned so the baseline does not depend on the state of the file
+BASELINE_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'cache_size': -2000,
+    'mmap_size': 0,
+    'busy_timeout': 5000,
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Command(BaseCommand):
+    help = ('Mixed browse/checkout concurrency benchmark comparing default SQLite settings '
+            'with the SQLITE_PRAGMAS profile and, with --replica, tuned plus a snapshotted read replica '
+            '(runs against copies of the database)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per profile')
+        parser.add_argument('--checkout-ratio', type=float, default=0.1,
+                            help='Fraction of operations that place an order')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--replica', action='store_true',
+                            help='Also run the tuned profile with browse reads on a snapshotted replica')
+        parser.add_argument('--snapshot-interval', type=float, default=1.0,
+                            help='Seconds between replica snapshots during the --replica run')
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('benchmark_db only supports SQLite databases')
+        tuned = getattr(settings, 'SQLITE_PRAGMAS', None)
+        if not tuned:
+            raise CommandError('SQLITE_PRAGMAS is not set; run with --settings=auroramart.settings_production')
+
+        workdir = tempfile.mkdtemp(prefix='auroramart-bench-')
+        try:
+            profiles = [
+                ('default', BASELINE_PRAGMAS, False, False),
+                ('tuned', tuned, True, False),
+            ]
+            if options['replica']:
+                profiles.append(('replica', tuned, True, True))
+
+            results = []
+            for label, pragmas, persistent, replica in profiles:
+                # Fresh copy per profile so all start from the same data
+                path = os.path.join(workdir, f'{label}.sqlite3')
+                snapshot_sqlite(database['NAME'], path)
+                aliases = [ALIAS]
+                self.register_alias(ALIAS, path, persistent)
+                if replica:
+                    replica_path = os.path.join(workdir, f'{label}-replica.sqlite3')
+                    snapshot_sqlite(path, replica_path)
+                    self.register_alias(REPLICA_ALIAS, replica_path, persistent)
+                    aliases.append(REPLICA_ALIAS)
+                try:
+                    products, customers = self.load_ids()
+                    if not products or not customers:
+                        raise CommandError('The database needs products and customers (see load_initial_data.py)')
+                    result = self.run_profile(
+                        label, pragmas, persistent, products, customers, options,
+                        replica_path=replica_path if replica else None, primary_path=path,
+                    )
+                finally:
+                    for alias in aliases:
+                        connections[alias].close()
+                        del connections[alias]
+                        del connections.settings[alias]
+                results.append(result)
+                self.report(result)
+
+            base = results[0]
+            for result in results[1:]:
+                if base['ops_per_sec']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{result['label']} vs default: {result['ops_per_sec'] / base['ops_per_sec']:.2f}x "
+                        f"({base['ops_per_sec']:,.0f} -> {result['ops_per_sec']:,.0f} ops/sec)"
+                    ))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def register_alias(self, alias, path, persistent):
+        config = dict(connections.settings['default'])
+        config.update({
+            'NAME': path,
+            'CONN_MAX_AGE': None if persistent else 0,
+            'OPTIONS': dict(config.get('OPTIONS', {})),
+            'TEST': {},
+        })
+        if not persistent:
+            config['OPTIONS'].pop('transaction_mode', None)
+        connections.settings[alias] = config
+
+    def load_ids(self):
+        products = list(Product.objects.using(ALIAS).values_list('id', 'category', 'price'))
+        customers = list(Customer.objects.using(ALIAS).values_list('id', flat=True)[:1000])
+        return products, customers
+
+    def run_profile(self, label, pragmas, persistent, products, customers, options,
+                    replica_path=None, primary_path=None):
+        categories = sorted({category for _, category, _ in products})
+        read_alias = REPLICA_ALIAS if replica_path else ALIAS
+        lock = threading.Lock()
+        stats = {'browse': [], 'checkout': [], 'errors': 0, 'snapshots': 0}
+        stop = threading.Event()
+
+        def configure(sender, connection, **kwargs):
+            # Connected after storefront.db's hook, so the profile's pragmas win
+            if connection.alias in (ALIAS, REPLICA_ALIAS):
+                apply_sqlite_pragmas(connection, pragmas)
+
+        def browse(rng):
+            category = rng.choice(categories)
+            list(Product.objects.using(read_alias).filter(category=category, stock__gt=0).order_by('-rating')[:12])
+            product_id = rng.choice(products)[0]
+            product = Product.objects.using(read_alias).get(id=product_id)
+            list(Product.objects.using(read_alias).filter(category=product.category).exclude(id=product_id)[:4])
+
+        def snapshotter():
+            # Stand-in for `manage.py snapshot_replicas --interval N`
+            while not stop.wait(options['snapshot_interval']):
+                try:
+                    snapshot_sqlite(primary_path, replica_path)
+                    stats['snapshots'] += 1
+                except sqlite3.OperationalError:
+                    pass
+
+        def checkout(rng):
+            lines = rng.sample(products, k=min(len(products), rng.randint(1, 3)))
+            with transaction.atomic(using=ALIAS):
+                order = Order.objects.using(ALIAS).create(
+                    customer_id=rng.choice(customers),
+                    total_amount=sum((price for _, _, price in lines), Decimal('0')),
+                )
+                OrderItem.objects.using(ALIAS).bulk_create([
+                    OrderItem(order=order, product_id=product_id, quantity=1, price=price)
+                    for product_id, _, price in lines
+                ])
+                for product_id, _, _ in lines:
+                    Product.objects.using(ALIAS).filter(id=product_id, stock__gt=0).update(stock=F('stock') - 1)
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            browse_times, checkout_times, errors = [], [], 0
+            try:
+                while time.perf_counter() < deadline:
+                    kind = 'checkout' if rng.random() < options['checkout_ratio'] else 'browse'
+                    started = time.perf_counter()
+                    try:
+                        (checkout if kind == 'checkout' else browse)(rng)
+                    except OperationalError:
+                        # "database is locked" once busy_timeout runs out
+                        errors += 1
+                        continue
+                    finally:
+                        if not persistent:
+                            # CONN_MAX_AGE=0: a new connection for every request
+                            connections.close_all()
+                    elapsed = time.perf_counter() - started
+                    (checkout_times if kind == 'checkout' else browse_times).append(elapsed)
+            finally:
+                connections.close_all()
+            with lock:
+                stats['browse'].extend(browse_times)
+                stats['checkout'].extend(checkout_times)
+                stats['errors'] += errors
+
+        connections[ALIAS].close()
+        connection_created.connect(configure)
+        try:
+            started = time.perf_counter()
+            deadline = started + options['duration']
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+            if replica_path:
+                threads.append(threading.Thread(target=snapshotter))
+            for thread in threads:
+                thread.start()
+            for thread in threads[:options['threads']]:
+                thread.join()
+            stop.set()
+            for thread in threads[options['threads']:]:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(configure)
+
+        completed = len(stats['browse']) + len(stats['checkout'])
+        return {
+            'label': label,
+            'threads': options['threads'],
+            'elapsed': elapsed,
+            'ops_per_sec': completed / elapsed,
+            'browse_per_sec': len(stats['browse']) / elapsed,
+            'checkout_per_sec': len(stats['checkout']) / elapsed,
+            'browse_p95_ms': percentile(stats['browse'], 95) * 1000,
+            'checkout_p95_ms': percentile(stats['checkout'], 95) * 1000,
+            'errors': stats['errors'],
+            'snapshots': stats['snapshots'],
+        }
+
+    def report(self, result):
+        self.stdout.write(
+            f"{result['label']:>8}: {result['ops_per_sec']:,.0f} ops/sec "
+            f"(browse {result['browse_per_sec']:,.0f}/s p95 {result['browse_p95_ms']:.1f}ms, "
+            f"checkout {result['checkout_per_sec']:,.0f}/s p95 {result['checkout_p95_ms']:.1f}ms, "
+            f"{result['errors']} lock errors"
+            + (f", {result['snapshots']} snapshots)" if result['label'] == 'replica' else ')')
+        )
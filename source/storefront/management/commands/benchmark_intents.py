@@ -0,0 +1,69 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from storefront.intents import Intent, IntentTable, get_engine
+
+
+def naive_reply(intents, message, fallback):
+    """The old matcher: substring checks in priority order (``intents`` sorted by priority)"""
+    lowered = message.lower()
+    for intent in intents:
+        for pattern in intent.patterns:
+            if pattern in lowered:
+                return intent.reply
+    return fallback
+
+
+class Command(BaseCommand):
+    help = 'Messages per second of the compiled AuroBot intent matcher, against naive substring matching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intents', type=int, default=5000, help='Synthetic intents to add to the real table')
+        parser.add_argument('--patterns', type=int, default=4, help='Patterns per synthetic intent')
+        parser.add_argument('--messages', type=int, default=20000)
+        parser.add_argument('--naive-messages', type=int, default=500,
+                            help='Messages for the (much slower) naive matcher')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        syllables = ['ka', 'lo', 'mi', 'ra', 'tu', 'ne', 'so', 'vi', 'pe', 'zu', 'da', 'fo']
+        vocabulary = sorted({''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(20000)})
+
+        base = get_engine().table
+        intents = list(base.intents)
+        for n in range(options['intents']):
+            patterns = [' '.join(rng.choices(vocabulary, k=rng.randint(1, 3))) for _ in range(options['patterns'])]
+            intents.append(Intent(f'synthetic-{n}', rng.randint(0, 99), patterns, f'reply {n}'))
+
+        started = time.perf_counter()
+        table = IntentTable(intents, base.fallback)
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        real_words = [p for intent in base.intents for p in intent.patterns]
+        messages = []
+        for _ in range(options['messages']):
+            text = rng.choices(vocabulary, k=rng.randint(4, 16))
+            if rng.random() < 0.5:
+                text.insert(rng.randrange(len(text) + 1), rng.choice(real_words))
+            messages.append(' '.join(text))
+
+        started = time.perf_counter()
+        matched = sum(1 for message in messages if table.match(message) is not None)
+        compiled_rate = len(messages) / (time.perf_counter() - started)
+
+        sample = messages[:options['naive_messages']]
+        by_priority = sorted(intents, key=lambda i: -i.priority)
+        started = time.perf_counter()
+        for message in sample:
+            naive_reply(by_priority, message, base.fallback)
+        naive_rate = len(sample) / (time.perf_counter() - started)
+
+        self.stdout.write(
+            f'{len(intents):,} intents ({sum(len(i.patterns) for i in intents):,} patterns) compiled in {compile_ms:.0f}ms'
+        )
+        self.stdout.write(f'compiled: {compiled_rate:,.0f} messages/sec ({matched:,} of {len(messages):,} matched)')
+        self.stdout.write(f'   naive: {naive_rate:,.0f} messages/sec')
+        self.stdout.write(self.style.SUCCESS(f'compiled vs naive: {compiled_rate / naive_rate:,.0f}x'))
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import resolve, reverse
+
+from storefront.ratelimit import RateLimitMiddleware
+
+
+class Command(BaseCommand):
+    help = ('Per-request overhead of the rate-limit middleware with each bucket store: '
+            'in-process cache, file cache and the shared-memory table')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--clients', type=int, default=1000, help='Distinct client addresses')
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp()
+        try:
+            # As configured in settings, and as the file cache would be in production
+            cache_options = {'OPTIONS': {'MAX_ENTRIES': 50000}}
+            stores = {
+                'locmem': ({'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                            'LOCATION': 'bench-ratelimit', **cache_options}, None),
+                'file': ({'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                          'LOCATION': os.path.join(workdir, 'cache'), **cache_options}, None),
+                'shared': ({'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                           os.path.join(workdir, 'ratelimit.buckets')),
+            }
+            self.stdout.write(f"{'store':<8} {'case':<28} {'us/request':>10}")
+            for name, (backend, shared_file) in stores.items():
+                with override_settings(CACHES={'default': backend}, RATE_LIMIT_CACHE='default',
+                                       RATE_LIMIT_SHARED_FILE=shared_file, RATE_LIMITS={
+                                           'storefront:aurabot_reply': {'rate': '1000/s', 'burst': 10 ** 9},
+                                           'storefront:confirm_order': {'rate': '1/h', 'burst': 1},
+                                       }):
+                    caches['default'].clear()
+                    for case, url in [
+                        ('unlimited view', reverse('storefront:index')),
+                        ('limited view, allowed', reverse('storefront:aurabot_reply')),
+                        ('limited view, 429', reverse('storefront:confirm_order')),
+                    ]:
+                        us = self.time_requests(url, options)
+                        self.stdout.write(f'{name:<8} {case:<28} {us:>10.1f}')
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def time_requests(self, url, options):
+        factory = RequestFactory()
+        middleware = RateLimitMiddleware(lambda request: HttpResponse())
+        match = resolve(url)
+        requests = []
+        for n in range(options['requests']):
+            request = factory.post(url, REMOTE_ADDR=f'10.0.{n % options["clients"] // 256}.{n % 256}')
+            request.user = AnonymousUser()
+            request.resolver_match = match
+            requests.append(request)
+
+        # The middleware's own work: the in-flight count around the request and the check before the view
+        started = time.perf_counter()
+        for request in requests:
+            middleware.enter()
+            middleware.process_view(request, match.func, match.args, match.kwargs)
+            middleware.leave()
+        return (time.perf_counter() - started) / len(requests) * 1e6
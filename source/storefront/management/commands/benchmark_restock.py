@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from storefront import restock
+from storefront.models import Favorite, Product
+
+
+class Command(BaseCommand):
+    help = ('Restock one product with many subscribers in a scratch database: how long the save takes, '
+            'and how long the notifier then needs to send every email')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=100000)
+        parser.add_argument('--chunk', type=int, default=500, help='RESTOCK_EMAIL_CHUNK')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('benchmark_restock only supports SQLite databases')
+        workdir = tempfile.mkdtemp(prefix='auroramart-restock-')
+        test_settings = connections.settings['default'].setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        test_settings['NAME'] = os.path.join(workdir, 'restock.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Emails are kept in memory (mail.outbox) rather than sent
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                                   RESTOCK_EMAIL_CHUNK=options['chunk'], RESTOCK_NOTIFY_WORKERS=1):
+                self.run(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if previous_test_name is None:
+                test_settings.pop('NAME', None)
+            else:
+                test_settings['NAME'] = previous_test_name
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run(self, options):
+        count = options['subscribers']
+        started = time.perf_counter()
+        product = Product.objects.create(sku='RESTOCK', name='Popular Kettle', category='Home & Kitchen',
+                                         price=Decimal('49.00'), stock=0)
+        User.objects.bulk_create(
+            (User(username=f'fan{n}', email=f'fan{n}@example.com', first_name='Fan') for n in range(count)),
+            batch_size=5000,
+        )
+        Favorite.objects.bulk_create(
+            (Favorite(user_id=pk, product=product, notify_when_available=True)
+             for pk in User.objects.filter(username__startswith='fan').values_list('id', flat=True).iterator()),
+            batch_size=5000,
+        )
+        self.stdout.write(f'{count:,} subscribers created in {time.perf_counter() - started:.1f}s')
+
+        mail.outbox = []
+        done = threading.Event()
+        run_in_worker = restock._run_in_worker
+
+        def timed_worker(product_ids):
+            worker_started = time.perf_counter()
+            with CaptureQueriesContext(connections['default']) as queries:
+                run_in_worker(product_ids)
+            self.worker_s = time.perf_counter() - worker_started
+            self.worker_queries = queries.captured_queries
+            done.set()
+
+        restock._run_in_worker = timed_worker
+        try:
+            product = Product.objects.get(pk=product.pk)
+            started = time.perf_counter()
+            with transaction.atomic():
+                product.stock = 25
+                product.save()
+            save_ms = (time.perf_counter() - started) * 1000
+            done.wait()
+        finally:
+            restock._run_in_worker = run_in_worker
+
+        sent = len(mail.outbox)
+        subscriber_reads = sum(1 for q in self.worker_queries
+                               if q['sql'].startswith('SELECT') and 'storefront_favorite' in q['sql'])
+        self.stdout.write(f'admin save (restock to 25): {save_ms:.1f}ms, returns before any email is sent')
+        self.stdout.write(
+            f'notifier: {sent:,} emails in {self.worker_s:.1f}s ({sent / self.worker_s:,.0f}/sec), '
+            f'{len(self.worker_queries)} queries ({subscriber_reads} subscriber read, '
+            f"{len(self.worker_queries) - subscriber_reads - 1} chunk updates of {settings.RESTOCK_EMAIL_CHUNK})"
+        )
+        waiting = Favorite.objects.filter(notify_when_available=True).count()
+        if sent != count or waiting:
+            raise CommandError(f'Expected {count:,} emails and nobody left waiting; got {sent:,} and {waiting:,}')
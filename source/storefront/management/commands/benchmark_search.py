@@ -0,0 +1,87 @@
+import itertools
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from storefront.product_search import ProductIndex
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class Command(BaseCommand):
+    help = 'Build, query and update time of the AuroBot product search index on a synthetic catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=200000)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--brute-force-queries', type=int, default=200,
+                            help='Queries for the (much slower) score-every-product baseline')
+        parser.add_argument('--updates', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        rng = random.Random(options['seed'])
+        syllables = ['ka', 'lo', 'mi', 'ra', 'tu', 'ne', 'so', 'vi', 'pe', 'zu', 'da', 'fo', 'gri', 'bel']
+        vocabulary = sorted({''.join(rng.choices(syllables, k=rng.randint(2, 4))) for _ in range(40000)})
+        # Zipf-like word frequencies, as in real product copy
+        weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+        categories = [f'category {n}' for n in range(30)]
+
+        def product(pid):
+            name = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(2, 5)))
+            description = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(20, 60)))
+            return pid, name, description, rng.choice(categories)
+
+        rows = [product(pid) for pid in range(1, options['products'] + 1)]
+        started = time.perf_counter()
+        index = ProductIndex.build(rows)
+        build_s = time.perf_counter() - started
+
+        queries = [
+            ' '.join(rng.choices(rows[rng.randrange(len(rows))][1].split(), k=2) + rng.choices(vocabulary, cum_weights=weights, k=rng.randint(1, 6)))
+            for _ in range(options['queries'])
+        ]
+
+        def timed(search, queries=queries):
+            samples = []
+            for query in queries:
+                started = time.perf_counter()
+                search(query)
+                samples.append((time.perf_counter() - started) * 1000)
+            return samples
+
+        indexed = timed(lambda query: index.search(query, k=5))
+
+        # Scoring every product, as a dense matrix-vector product would
+        def brute_force(query):
+            scores = (index.matrix @ index.vectorizer.transform([query]).T).toarray().ravel()
+            return np.argpartition(-scores, 5)[:5]
+
+        brute = timed(brute_force, queries[:options['brute_force_queries']])
+
+        samples = []
+        for _ in range(options['updates']):
+            pid = rng.randint(1, len(rows) + options['updates'])
+            started = time.perf_counter()
+            index.update([product(pid)])
+            samples.append((time.perf_counter() - started) * 1000)
+        after_updates = timed(lambda query: index.search(query, k=5))
+
+        self.stdout.write(
+            f'{len(rows):,} products, {len(index.vectorizer.vocabulary_):,} terms, '
+            f'{index.matrix.nnz:,} non-zeros; built in {build_s:.1f}s'
+        )
+        self.stdout.write(f"{'':<28} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, times in [
+            ('search (postings)', indexed),
+            ('search (all products)', brute),
+            ('update (1 product)', samples),
+            (f"search after {options['updates']} updates", after_updates),
+        ]:
+            self.stdout.write(f'{label:<28} {percentile(times, 0.5):>8.2f} {percentile(times, 0.99):>8.2f}')
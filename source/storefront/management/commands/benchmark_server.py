@@ -0,0 +1,192 @@
+import os
+import random
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from storefront.management.commands.benchmark_db import percentile
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name may contain spaces; the parent pid follows it
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return sorted(children)
+
+
+def memory(pid):
+    """(rss, pss, private) in MB from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[name] = int(rest.split()[0]) / 1024
+    return values['Rss'], values['Pss'], values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+
+
+class Command(BaseCommand):
+    help = ('Requests/sec and memory per process of runserver against the pre-fork server '
+            '(manage.py serve), both on the same scratch database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent client threads')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per server')
+        parser.add_argument('--workers', type=int, default=0, help='serve workers (0 = one per CPU)')
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--asgi', action='store_true', help='Also measure serve --asgi (needs uvicorn)')
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise CommandError('benchmark_server reads memory use from /proc and needs Linux')
+        workdir = tempfile.mkdtemp(prefix='auroramart-server-')
+        # The servers are separate processes: point them at the scratch database
+        self.env = {**os.environ, 'DJANGO_DB_NAME': os.path.join(workdir, 'server.sqlite3'),
+                    'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'PYTHONUNBUFFERED': '1'}
+        self.workdir = workdir
+        try:
+            self.manage('migrate', '-v', '0')
+            self.manage('generate_synthetic_data', '--seed', '0', '--products', str(options['products']),
+                        '--customers', '200', '--orders', '1000')
+            urls = self.urls()
+            servers = [('runserver', ['runserver', '--noreload']),
+                       ('serve', ['serve', '--workers', str(options['workers'])])]
+            if options['asgi']:
+                servers.append(('serve --asgi', ['serve', '--asgi', '--workers', str(options['workers'])]))
+            results = [self.measure(label, command, urls, options) for label, command in servers]
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        self.report(results)
+
+    def manage(self, *args):
+        subprocess.run([sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), *args],
+                       env=self.env, check=True, stdout=subprocess.DEVNULL)
+
+    def urls(self):
+        with sqlite3.connect(self.env['DJANGO_DB_NAME']) as db:
+            products = db.execute('SELECT id, category FROM storefront_product WHERE stock > 0 LIMIT 200').fetchall()
+        if not products:
+            raise CommandError('The scratch database has no products in stock')
+        categories = sorted({category for _, category in products})
+        return ([reverse('storefront:index'), reverse('storefront:category_list')]
+                + [reverse('storefront:category_products', args=[c]) for c in categories]
+                + [reverse('storefront:product_detail', args=[pk]) for pk, _ in products])
+
+    def measure(self, label, command, urls, options):
+        port = free_port()
+        base = f'http://127.0.0.1:{port}'
+        with open(os.path.join(self.workdir, f'{label.replace(" ", "-")}.log'), 'w') as log:
+            process = subprocess.Popen(
+                [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), *command, f'127.0.0.1:{port}'],
+                env=self.env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            try:
+                started = time.perf_counter()
+                self.wait_until_up(process, base + urls[0])
+                startup_s = time.perf_counter() - started
+                # Every page once, so lazy loading is not counted against either server
+                for url in urls:
+                    self.fetch(base + url)
+                samples, errors, elapsed = self.drive(base, urls, options)
+                processes = [('server' if label == 'runserver' else 'master', process.pid)]
+                processes += [('worker', pid) for pid in child_pids(process.pid)]
+                memory_rows = [(role, pid, *memory(pid)) for role, pid in processes]
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+        return {
+            'label': label, 'startup_s': startup_s, 'requests': len(samples), 'errors': errors,
+            'rps': len(samples) / elapsed, 'p50': percentile(samples, 50), 'p95': percentile(samples, 95),
+            'memory': memory_rows,
+        }
+
+    def wait_until_up(self, process, url, timeout=120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'The server exited with {process.returncode}; see its log')
+            try:
+                self.fetch(url)
+                return
+            except (OSError, urllib.error.URLError):
+                time.sleep(0.2)
+        raise CommandError(f'The server did not answer within {timeout}s')
+
+    @staticmethod
+    def fetch(url):
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            return response.status
+
+    def drive(self, base, urls, options):
+        samples = []
+        errors = [0]
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + options['duration']
+
+        def client(seed):
+            rng = random.Random(seed)
+            local = []
+            failed = 0
+            while time.perf_counter() < stop_at:
+                started = time.perf_counter()
+                try:
+                    self.fetch(base + rng.choice(urls))
+                    local.append((time.perf_counter() - started) * 1000)
+                except (OSError, urllib.error.URLError):
+                    failed += 1
+            with lock:
+                samples.extend(local)
+                errors[0] += failed
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, errors[0], time.perf_counter() - started
+
+    def report(self, results):
+        self.stdout.write(f"\n{'server':<14} {'startup s':>9} {'reqs':>7} {'err':>4} {'req/s':>8} "
+                          f"{'p50 ms':>8} {'p95 ms':>8}")
+        for r in results:
+            self.stdout.write(f"{r['label']:<14} {r['startup_s']:>9.1f} {r['requests']:>7} {r['errors']:>4} "
+                              f"{r['rps']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f}")
+
+        # PSS splits shared pages between the processes sharing them; private pages are the process's own
+        self.stdout.write(f"\n{'server':<14} {'process':<8} {'pid':>7} {'RSS MB':>8} {'PSS MB':>8} {'private MB':>11}")
+        for r in results:
+            for role, pid, rss, pss, private in r['memory']:
+                self.stdout.write(f"{r['label']:<14} {role:<8} {pid:>7} {rss:>8.1f} {pss:>8.1f} {private:>11.1f}")
+            total = sum(row[3] for row in r['memory'])
+            self.stdout.write(f"{r['label']:<14} {'total':<8} {'':>7} {'':>8} {total:>8.1f}")
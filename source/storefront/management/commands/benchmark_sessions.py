@@ -0,0 +1,63 @@
+import random
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from storefront.models import Product
+
+ENGINES = [
+    ('db', 'django.contrib.sessions.backends.db'),
+    ('coalescing', 'storefront.sessions'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare session-table writes per request for the db and write-coalescing session engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--visitors', type=int, default=20)
+        parser.add_argument('--pages', type=int, default=25, help='Page views per visitor')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.filter(stock__gt=0).exclude(image='').values_list('id', 'category')[:500])
+        if not products:
+            raise CommandError('No in-stock products with images (see load_initial_data.py or generate_synthetic_data)')
+
+        for label, engine in ENGINES:
+            rng = random.Random(options['seed'])
+            writes = []
+            sessions = set()
+
+            def record(execute, sql, params, many, context):
+                if 'django_session' in sql and sql.lstrip().upper().startswith(('INSERT', 'UPDATE')):
+                    writes.append(sql)
+                return execute(sql, params, many, context)
+
+            with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['testserver'], DEBUG=False):
+                start = time.perf_counter()
+                requests = 0
+                with connection.execute_wrapper(record):
+                    for _ in range(options['visitors']):
+                        client = Client()
+                        for _ in range(options['pages']):
+                            product_id, category = rng.choice(products)
+                            if rng.random() < 0.5:
+                                url = reverse('storefront:category_products', args=[category])
+                            else:
+                                url = reverse('storefront:product_detail', args=[product_id])
+                            client.get(url)
+                            requests += 1
+                        if 'sessionid' in client.cookies:
+                            sessions.add(client.cookies['sessionid'].value)
+                elapsed = time.perf_counter() - start
+
+            Session.objects.filter(session_key__in=sessions).delete()
+            self.stdout.write(
+                f"{label:>10}: {len(writes)} session writes / {requests} requests "
+                f"({len(writes) / requests:.2f} per request), {requests / elapsed:,.0f} req/sec"
+            )
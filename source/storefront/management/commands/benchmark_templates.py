@@ -0,0 +1,71 @@
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory, override_settings
+
+from storefront.management.commands.benchmark_db import percentile
+from storefront.models import Product
+
+LOADERS = ['django.template.loaders.filesystem.Loader', 'django.template.loaders.app_directories.Loader']
+
+
+def template_settings(cached):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', LOADERS)] if cached else LOADERS
+    return templates
+
+
+class Command(BaseCommand):
+    help = 'Time rendering a category page of product cards with and without the cached loader and card fragment cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=50)
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.filter(stock__gt=0).exclude(image='').order_by('-rating')[:options['cards']])
+        if len(products) < options['cards']:
+            raise CommandError(f"Need {options['cards']} in-stock products with images (see generate_synthetic_data)")
+        request = RequestFactory().get('/category/benchmark/')
+        request.user = AnonymousUser()
+        context = {
+            'category': products[0].category,
+            'products': products,
+            'recommendations': [],
+            'search_query': '',
+            'sort_by': 'recommended',
+        }
+        no_fragments = dict(settings.CACHES, template_fragments={
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        })
+
+        profiles = [
+            ('no cached loader', template_settings(False), no_fragments),
+            ('cached loader', template_settings(True), no_fragments),
+            ('+ card fragments', template_settings(True), settings.CACHES),
+        ]
+        results = []
+        for label, templates, cache_settings in profiles:
+            with override_settings(TEMPLATES=templates, CACHES=cache_settings):
+                caches['template_fragments'].clear()
+                # Warm up: compile (cached loader) and fill the fragment cache
+                render_to_string('storefront/category_products.html', context, request=request)
+                times = []
+                for _ in range(options['iterations']):
+                    started = time.perf_counter()
+                    render_to_string('storefront/category_products.html', context, request=request)
+                    times.append(time.perf_counter() - started)
+            result = (label, percentile(times, 50) * 1000, percentile(times, 95) * 1000)
+            results.append(result)
+            self.stdout.write(f'{label:>17}: p50 {result[1]:.2f}ms, p95 {result[2]:.2f}ms '
+                              f"({options['cards']} cards, {options['iterations']} renders)")
+
+        base = results[0][1]
+        for label, p50, _ in results[1:]:
+            self.stdout.write(self.style.SUCCESS(f'{label} vs no cached loader: {base / p50:.1f}x faster (p50)'))
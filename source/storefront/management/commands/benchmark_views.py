@@ -0,0 +1,113 @@
+import asyncio
+import random
+import threading
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from storefront.management.commands.benchmark_db import percentile
+from storefront.models import Customer, Product
+
+
+class Command(BaseCommand):
+    help = ('Latency of the async home and product pages with concurrent clients, '
+            'served the ASGI way (one event loop) and the WSGI way (one thread per client)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Simultaneous clients')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per client')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.filter(stock__gt=0).exclude(image='').values_list('id', flat=True)[:500])
+        users = [c.user for c in Customer.objects.select_related('user')[:options['concurrency']]]
+        if not products or not users:
+            raise CommandError('The database needs products and customers (see load_initial_data.py)')
+        self.products = products
+        self.users = users
+        self.sessions = set()
+
+        results = []
+        with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            for label, run in [('wsgi', self.run_wsgi), ('asgi', self.run_asgi)]:
+                started = time.perf_counter()
+                times = run(options)
+                elapsed = time.perf_counter() - started
+                result = {
+                    'label': label,
+                    'req_per_sec': len(times) / elapsed,
+                    'p50_ms': percentile(times, 50) * 1000,
+                    'p99_ms': percentile(times, 99) * 1000,
+                }
+                results.append(result)
+                self.stdout.write(
+                    f"{label:>5}: {result['req_per_sec']:,.0f} req/sec, "
+                    f"p50 {result['p50_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms "
+                    f"({options['concurrency']} clients x {options['requests']} requests)"
+                )
+        Session.objects.filter(session_key__in=self.sessions).delete()
+
+        wsgi, asgi = results
+        if asgi['p50_ms']:
+            self.stdout.write(self.style.SUCCESS(
+                f"asgi vs wsgi: p50 {wsgi['p50_ms'] / asgi['p50_ms']:.2f}x, "
+                f"p99 {wsgi['p99_ms'] / asgi['p99_ms']:.2f}x, "
+                f"throughput {asgi['req_per_sec'] / wsgi['req_per_sec']:.2f}x"
+            ))
+
+    def urls(self, rng, count):
+        for _ in range(count):
+            if rng.random() < 0.3:
+                yield reverse('storefront:index')
+            else:
+                yield reverse('storefront:product_detail', args=[rng.choice(self.products)])
+
+    def run_wsgi(self, options):
+        times = []
+        lock = threading.Lock()
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            client = Client()
+            client.force_login(self.users[index % len(self.users)])
+            elapsed = []
+            try:
+                for url in self.urls(rng, options['requests']):
+                    started = time.perf_counter()
+                    client.get(url)
+                    elapsed.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+            with lock:
+                times.extend(elapsed)
+                self.sessions.add(client.cookies['sessionid'].value)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return times
+
+    def run_asgi(self, options):
+        async def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            client = AsyncClient()
+            await client.aforce_login(self.users[index % len(self.users)])
+            elapsed = []
+            for url in self.urls(rng, options['requests']):
+                started = time.perf_counter()
+                await client.get(url)
+                elapsed.append(time.perf_counter() - started)
+            self.sessions.add(client.cookies['sessionid'].value)
+            return elapsed
+
+        async def main():
+            results = await asyncio.gather(*(worker(i) for i in range(options['concurrency'])))
+            return [t for elapsed in results for t in elapsed]
+
+        return asyncio.run(main())
@@ -0,0 +1,30 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from storefront.product_search import build_index, index_path
+
+
+class Command(BaseCommand):
+    help = 'Build the AuroBot product search index and save it to PRODUCT_SEARCH_INDEX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Write the index here instead of PRODUCT_SEARCH_INDEX')
+
+    def handle(self, *args, **options):
+        path = str(options['output'] or index_path())
+        started = time.perf_counter()
+        index = build_index()
+        if index is None:
+            raise CommandError('No products to index')
+        build_s = time.perf_counter() - started
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Write then rename, so a worker loading the index never reads half a file
+        index.save(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(index):,} products ({len(index.vectorizer.vocabulary_):,} terms) '
+            f'in {build_s:.1f}s -> {path} ({os.path.getsize(path) / 1e6:.1f} MB)'
+        ))
@@ -0,0 +1,65 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from storefront.images import IMAGE_FIELDS, generate_derivatives, record_dimensions
+from storefront.models import Product, Customer
+
+MODELS = {'product': Product, 'customer': Customer}
+
+
+def _init_worker():
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auroramart.settings')
+    django.setup()
+
+
+def resize(task):
+    """Generate derivatives for one image (runs in a worker process)"""
+    label, pk, name = task
+    try:
+        width, height = generate_derivatives(name)
+        return label, pk, name, width, height, None
+    except Exception as e:
+        return label, pk, name, None, None, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG copies of existing product images and profile pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate images that already have derivatives')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        tasks = []
+        for label, model in MODELS.items():
+            field, width_field, _ = IMAGE_FIELDS[model]
+            qs = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            if not options['force']:
+                qs = qs.filter(**{f'{width_field}__isnull': True})
+            tasks += [(label, pk, name) for pk, name in qs.values_list('pk', field)]
+
+        self.stdout.write(f"Processing {len(tasks)} images with {options['workers']} worker(s)...")
+        start = time.perf_counter()
+        if options['workers'] > 1 and len(tasks) > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                results = list(pool.map(resize, tasks, chunksize=8))
+        else:
+            results = [resize(task) for task in tasks]
+
+        done = 0
+        for label, pk, name, width, height, error in results:
+            if error:
+                self.stderr.write(f"  ⚠ {name}: {error}")
+                continue
+            done += record_dimensions(MODELS[label], pk, name, width, height)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated derivatives for {done}/{len(tasks)} images in {time.perf_counter() - start:.1f}s"
+        ))
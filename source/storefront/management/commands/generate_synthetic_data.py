@@ -0,0 +1,371 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from storefront.models import Product, Customer, Cart, CartItem, Order, OrderItem, Favorite
+from storefront.signals import bump_sales_version
+
+USERNAME_PREFIX = 'synth_'
+SKU_PREFIX = 'SYN-'
+
+# Category -> (product nouns, median price in SGD, relative share of the catalog)
+CATEGORIES = {
+    'Beauty & Personal Care': (['Serum', 'Cleanser', 'Lipstick', 'Moisturiser', 'Shampoo'], 28, 12),
+    'Home & Kitchen': (['Kettle', 'Cookware Set', 'Blender', 'Lamp', 'Knife Block'], 55, 12),
+    'Fashion - Women': (['Dress', 'Blouse', 'Handbag', 'Scarf'], 45, 10),
+    'Fashion - Men': (['Shirt', 'Chinos', 'Jacket', 'Sneakers'], 45, 10),
+    'Electronics': (['Headphones', 'Charger', 'Smartwatch', 'Speaker'], 120, 10),
+    'Sports & Outdoors': (['Tent', 'Running Shoes', 'Water Bottle', 'Backpack'], 60, 8),
+    'Health & Wellness': (['Vitamins', 'Yoga Mat', 'Protein Powder'], 35, 8),
+    'Books': (['Novel', 'Cookbook', 'Biography', 'Children Book'], 18, 10),
+    'Groceries & Gourmet': (['Coffee Beans', 'Olive Oil', 'Snack Pack'], 12, 8),
+    'Toys & Games': (['Puzzle', 'Building Set', 'Board Game'], 30, 5),
+    'Pet Supplies': (['Dog Food', 'Cat Litter', 'Pet Bed'], 25, 4),
+    'Automotive': (['Car Charger', 'Seat Cover', 'Dash Cam'], 40, 3),
+}
+BRANDS = ['Aurora', 'Nordica', 'BlueCedar', 'PlaySmith', 'ChefMate', 'MaplePress', 'Velour',
+          'Snackify', 'SunriseHouse', 'Everpeak', 'UrbanLeaf', 'Kinetic']
+VARIANTS = ['Classic', 'Pro', 'Lite', 'Plus', 'Essential', 'Family Pack', 'Deluxe', 'Mini']
+
+GENDERS = np.array(['M', 'F', 'P'])
+EMPLOYMENT = np.array(['Employed', 'Self-Employed', 'Unemployed', 'Student'])
+INCOME = np.array(['Below 30k', '30k-60k', '60k-100k', 'Above 100k'])
+
+# Relative order volume by hour of day (UTC+8 shoppers: lunch and evening peaks)
+HOURLY_WEIGHTS = np.array([2, 1, 1, 1, 1, 1, 2, 3, 4, 5, 5, 6, 8, 7, 5, 5, 5, 6, 7, 9, 11, 12, 9, 5], dtype=float)
+
+DELIVERY_FEE_CENTS = 499
+FREE_DELIVERY_CENTS = 15000
+
+# Worker-process state, set by _init_worker
+_STATE = {}
+
+
+def zipf_cdf(n, s):
+    """CDF of a Zipf(s) distribution over n ranks"""
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def sample(rng, cdf, size):
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side='right'), len(cdf) - 1)
+
+
+def day_cdf(start, days):
+    """Seasonal order volume per day: year-end peak, weekend lift and 11.11 / 12.12 sales"""
+    dates = np.datetime64(start, 'D') + np.arange(days)
+    day_of_year = (dates - dates.astype('datetime64[Y]')).astype(int) + 1
+    weekday = (dates.astype(int) + 3) % 7  # 0 = Monday
+    weights = 1 + 0.35 * np.cos(2 * np.pi * (day_of_year - 350) / 365.25)
+    weights += np.where(weekday >= 5, 0.15, 0)
+    month = dates.astype('datetime64[M]').astype(int) % 12 + 1
+    day_of_month = (dates - dates.astype('datetime64[M]')).astype(int) + 1
+    weights *= np.where((month == day_of_month) & (month >= 11), 3.0, 1.0)
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def db_datetimes(values):
+    """Convert a datetime64 array (UTC) to values the database backend accepts"""
+    if connection.vendor == 'sqlite':
+        return np.char.replace(np.datetime_as_string(values, unit='us'), 'T', ' ').tolist()
+    adapt = connection.ops.adapt_datetimefield_value
+    return [adapt(value.replace(tzinfo=dt_timezone.utc)) for value in values.astype('datetime64[us]').tolist()]
+
+
+def money(cents):
+    return (cents / 100).round(2).tolist()
+
+
+def insert_rows(model, fields, rows):
+    """Raw multi-row insert (no model instances, no signals)"""
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = f'INSERT INTO {qn(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+
+
+def _init_worker(state):
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auroramart.settings')
+    django.setup()
+    _STATE.update(state)
+
+
+def generate_orders(task):
+    """Build order and order item rows for one chunk of orders (runs in a worker process)"""
+    first_order_id, count, seed = task
+    state = _STATE
+    rng = np.random.default_rng(seed)
+
+    order_ids = np.arange(first_order_id, first_order_id + count)
+    customers = state['customer_ids'][sample(rng, state['customer_cdf'], count)]
+    days = sample(rng, state['day_cdf'], count)
+    hours = sample(rng, state['hour_cdf'], count)
+    seconds = rng.integers(0, 3600, count)
+    # Hours are local (UTC+8) shopping hours
+    created = (np.datetime64(state['start'], 's') + days * 86400 + (hours - 8) * 3600 + seconds)
+
+    # Items per order: 1 + Poisson, products by Zipf popularity
+    per_order = 1 + rng.poisson(state['items_per_order'] - 1, count)
+    item_order = np.repeat(np.arange(count), per_order)
+    products = state['popularity_order'][sample(rng, state['product_cdf'], len(item_order))]
+    quantities = 1 + rng.poisson(0.3, len(item_order))
+    prices = state['price_cents'][products]
+
+    subtotal = np.bincount(item_order, weights=prices * quantities, minlength=count).astype(np.int64)
+    totals = subtotal + np.where(subtotal >= FREE_DELIVERY_CENTS, 0, DELIVERY_FEE_CENTS)
+
+    # Recent orders are still in progress; a few are cancelled
+    age_days = state['days'] - days
+    status = np.where(age_days > 7, 'Delivered', np.where(age_days > 2, 'Shipped', 'Pending'))
+    status = np.where(rng.random(count) < 0.03, 'Cancelled', status).tolist()
+
+    created = db_datetimes(created)
+    orders = list(zip(order_ids.tolist(), customers.tolist(), status, money(totals), created, created))
+    items = list(zip(order_ids[item_order].tolist(), state['product_ids'][products].tolist(),
+                     quantities.tolist(), money(prices)))
+    return orders, items
+
+
+class Command(BaseCommand):
+    help = ('Generate a deterministic synthetic dataset (catalog, customers, carts, favorites, orders) '
+            'for load testing')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=50000,
+                            help='Orders to create (order items ~ orders x --items-per-order; '
+                                 'e.g. 3500000 orders for ~10M items)')
+        parser.add_argument('--items-per-order', type=float, default=2.8)
+        parser.add_argument('--cart-rate', type=float, default=0.3, help='Share of customers with a non-empty cart')
+        parser.add_argument('--favorites-per-customer', type=float, default=2.0)
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent for product popularity')
+        parser.add_argument('--start', default='2024-01-01', help='First order date (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=365, help='Days of order history')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Orders per worker task / transaction')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        if options['products'] < 1 or options['customers'] < 1:
+            raise CommandError('--products and --customers must be at least 1')
+        if options['items_per_order'] < 1:
+            raise CommandError('--items-per-order must be at least 1')
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists() or \
+                Product.objects.filter(sku__startswith=SKU_PREFIX).exists():
+            raise CommandError('Synthetic data already exists - generate into a fresh database '
+                               'so the output stays deterministic')
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m-%d')
+        except ValueError:
+            raise CommandError('--start must be YYYY-MM-DD')
+
+        # Independent, reproducible streams: catalog, customers, carts, favorites, then one per order chunk
+        seeds = np.random.SeedSequence(options['seed'])
+        catalog_seed, customer_seed, cart_seed, favorite_seed, orders_seed = seeds.spawn(5)
+
+        self.started = time.perf_counter()
+        product_ids, price_cents, popularity_order = self.create_products(options, catalog_seed, start)
+        customer_ids, user_ids = self.create_customers(options, customer_seed, start)
+        product_cdf = zipf_cdf(len(product_ids), options['zipf'])
+        self.create_carts(options, cart_seed, customer_ids, product_ids, popularity_order, product_cdf, start)
+        self.create_favorites(options, favorite_seed, user_ids, product_ids, popularity_order, product_cdf, start)
+
+        state = {
+            'start': np.datetime64(start, 's'),
+            'days': options['days'],
+            'items_per_order': options['items_per_order'],
+            'product_ids': product_ids,
+            'price_cents': price_cents,
+            'popularity_order': popularity_order,
+            'product_cdf': product_cdf,
+            'customer_ids': customer_ids,
+            'customer_cdf': zipf_cdf(len(customer_ids), 0.6),
+            'day_cdf': day_cdf(start, options['days']),
+            'hour_cdf': np.cumsum(HOURLY_WEIGHTS) / HOURLY_WEIGHTS.sum(),
+        }
+        self.create_orders(options, orders_seed, state)
+
+        self.reset_sequences()
+        bump_sales_version()
+        self.stdout.write(self.style.SUCCESS(f"Done in {time.perf_counter() - self.started:.1f}s"))
+
+    def report(self, label, rows, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"  {label}: {rows:,} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:,.0f} rows/sec)")
+
+    def create_products(self, options, seed, start):
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        n = options['products']
+        names = list(CATEGORIES)
+        shares = np.array([CATEGORIES[c][2] for c in names], dtype=float)
+        category = rng.choice(len(names), n, p=shares / shares.sum())
+
+        nouns = [CATEGORIES[c][0] for c in names]
+        medians = np.array([CATEGORIES[c][1] for c in names], dtype=float)
+        price_cents = np.maximum(199, (rng.lognormal(np.log(medians[category]), 0.5) * 100).round()).astype(np.int64)
+        brand = rng.integers(0, len(BRANDS), n)
+        variant = rng.integers(0, len(VARIANTS), n)
+        noun = [nouns[c][i % len(nouns[c])] for c, i in zip(category.tolist(), rng.integers(0, 100, n).tolist())]
+        stock = np.where(rng.random(n) < 0.05, 0, rng.integers(1, 500, n))
+        rating = (rng.beta(5, 1.5, n) * 4 + 1).round(1)
+        on_sale = rng.random(n) < 0.1
+        discount = np.where(on_sale, rng.choice([10, 15, 20, 25, 30], n), 0)
+        created = np.datetime64(start, 's') - rng.integers(0, 365 * 86400, n)
+
+        # Reuse the shipped product photos so synthetic products show up on image-only listings
+        media_dir = os.path.join(settings.MEDIA_ROOT, 'products')
+        images = sorted(os.listdir(media_dir)) if os.path.isdir(media_dir) else []
+        image = [f'products/{images[i % len(images)]}' for i in rng.integers(0, 1 << 30, n).tolist()] if images else [''] * n
+
+        first_id = next_id(Product)
+        product_ids = np.arange(first_id, first_id + n)
+        created = db_datetimes(created)
+        rows = [
+            (pid, f'{SKU_PREFIX}{options["seed"]}-{pid:08d}', f'{BRANDS[b]} {nn} {VARIANTS[v]}',
+             f'{BRANDS[b]} {nn} ({VARIANTS[v]}) - synthetic catalog item.', names[c], p, s, 10, r, img,
+             ts, ts, sale, d if sale else None)
+            for pid, b, nn, v, c, p, s, r, img, ts, sale, d in zip(
+                product_ids.tolist(), brand.tolist(), noun, variant.tolist(), category.tolist(),
+                money(price_cents), stock.tolist(), rating.tolist(), image, created,
+                on_sale.tolist(), discount.tolist(),
+            )
+        ]
+        with transaction.atomic():
+            insert_rows(Product, ['id', 'sku', 'name', 'description', 'category', 'price', 'stock',
+                                  'reorder_threshold', 'rating', 'image', 'created_at', 'updated_at',
+                                  'is_on_sale', 'discount_percentage'], rows)
+        self.report('Products', n, started)
+        # Popularity rank -> product index, shuffled so ids are not ranked
+        return product_ids, price_cents, rng.permutation(n)
+
+    def create_customers(self, options, seed, start):
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        n = options['customers']
+        first_user_id = next_id(User)
+        first_customer_id = next_id(Customer)
+        user_ids = np.arange(first_user_id, first_user_id + n)
+        customer_ids = np.arange(first_customer_id, first_customer_id + n)
+        joined = db_datetimes(np.datetime64(start, 's') - rng.integers(0, 2 * 365 * 86400, n))
+        age = rng.integers(16, 75, n)
+        gender = GENDERS[rng.choice(3, n, p=[0.48, 0.48, 0.04])]
+        employment = EMPLOYMENT[rng.choice(4, n, p=[0.65, 0.1, 0.05, 0.2])]
+        income = INCOME[rng.choice(4, n, p=[0.25, 0.3, 0.3, 0.15])]
+        categories = np.array(list(CATEGORIES))
+        preferred = categories[rng.integers(0, len(categories), n)]
+
+        chunk = options['chunk_size']
+        for lo in range(0, n, chunk):
+            hi = min(lo + chunk, n)
+            users = [
+                # '!' marks the password unusable; a fixed suffix keeps the output deterministic
+                (uid, '!synthetic', False, f'{USERNAME_PREFIX}{uid}', f'Synthetic {uid}', '',
+                 f'{USERNAME_PREFIX}{uid}@example.com', False, True, ts)
+                for uid, ts in zip(user_ids[lo:hi].tolist(), joined[lo:hi])
+            ]
+            customers = list(zip(customer_ids[lo:hi].tolist(), user_ids[lo:hi].tolist(), age[lo:hi].tolist(),
+                                 gender[lo:hi].tolist(), employment[lo:hi].tolist(), income[lo:hi].tolist(),
+                                 preferred[lo:hi].tolist(), joined[lo:hi]))
+            with transaction.atomic():
+                insert_rows(User, ['id', 'password', 'is_superuser', 'username', 'first_name', 'last_name',
+                                   'email', 'is_staff', 'is_active', 'date_joined'], users)
+                insert_rows(Customer, ['id', 'user', 'age', 'gender', 'employment_status', 'income_range',
+                                       'preferred_category', 'created_at'], customers)
+        self.report('Customers', n, started)
+        return customer_ids, user_ids
+
+    def create_carts(self, options, seed, customer_ids, product_ids, popularity_order, product_cdf, start):
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        with_cart = customer_ids[rng.random(len(customer_ids)) < options['cart_rate']]
+        first_id = next_id(Cart)
+        cart_ids = np.arange(first_id, first_id + len(with_cart))
+        now = db_datetimes(np.array([np.datetime64(start, 's') + options['days'] * 86400]))[0]
+
+        per_cart = rng.integers(1, 5, len(cart_ids))
+        item_cart = np.repeat(cart_ids, per_cart)
+        products = product_ids[popularity_order[sample(rng, product_cdf, len(item_cart))]]
+        # One row per (cart, product)
+        pairs = np.unique(np.stack([item_cart, products], axis=1), axis=0)
+        quantities = rng.integers(1, 4, len(pairs))
+
+        with transaction.atomic():
+            insert_rows(Cart, ['id', 'customer', 'created_at', 'updated_at'],
+                        [(cid, cust, now, now) for cid, cust in zip(cart_ids.tolist(), with_cart.tolist())])
+            insert_rows(CartItem, ['cart', 'product', 'quantity', 'added_at'],
+                        [(c, p, q, now) for (c, p), q in zip(pairs.tolist(), quantities.tolist())])
+        self.report('Carts', len(cart_ids) + len(pairs), started)
+
+    def create_favorites(self, options, seed, user_ids, product_ids, popularity_order, product_cdf, start):
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        per_user = rng.poisson(options['favorites_per_customer'], len(user_ids))
+        fav_user = np.repeat(user_ids, per_user)
+        products = product_ids[popularity_order[sample(rng, product_cdf, len(fav_user))]]
+        pairs = np.unique(np.stack([fav_user, products], axis=1), axis=0)
+        notify = (rng.random(len(pairs)) < 0.2).tolist()
+        created = db_datetimes(np.datetime64(start, 's') + rng.integers(0, options['days'] * 86400, len(pairs)))
+        with transaction.atomic():
+            insert_rows(Favorite, ['user', 'product', 'notify_when_available', 'created_at'],
+                        [(u, p, nf, ts) for (u, p), nf, ts in zip(pairs.tolist(), notify, created)])
+        self.report('Favorites', len(pairs), started)
+
+    def create_orders(self, options, seed, state):
+        started = time.perf_counter()
+        total = options['orders']
+        chunk = options['chunk_size']
+        first_id = next_id(Order)
+        chunk_seeds = seed.spawn((total + chunk - 1) // chunk)
+        tasks = [(first_id + i * chunk, min(chunk, total - i * chunk), chunk_seeds[i])
+                 for i in range(len(chunk_seeds))]
+
+        def write(results):
+            orders_done = items_done = 0
+            for orders, items in results:
+                with transaction.atomic():
+                    insert_rows(Order, ['id', 'customer', 'status', 'total_amount', 'created_at', 'updated_at'], orders)
+                    insert_rows(OrderItem, ['order', 'product', 'quantity', 'price'], items)
+                orders_done += len(orders)
+                items_done += len(items)
+                self.report(f'Orders {orders_done:,}/{total:,}, items', items_done, started)
+
+        if options['workers'] > 1 and len(tasks) > 1:
+            # Workers only generate rows; this process does all writes, in chunk order
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker,
+                                     initargs=(state,)) as pool:
+                write(pool.map(generate_orders, tasks))
+        else:
+            _STATE.update(state)
+            write(generate_orders(task) for task in tasks)
+
+    def reset_sequences(self):
+        """Explicit ids were inserted; move backend sequences past them (no-op on SQLite)"""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Product, User, Customer, Cart, Order]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
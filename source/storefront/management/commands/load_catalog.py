@@ -0,0 +1,124 @@
+import time
+from decimal import Decimal
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from storefront import product_search
+from storefront.models import Product
+from storefront.product_cache import invalidate_products
+from storefront.restock import notify_restocked
+
+# CSV column -> Product field
+COLUMNS = {
+    'SKU code': 'sku',
+    'Product name': 'name',
+    'Product description': 'description',
+    'Product Category': 'category',
+    'Unit price': 'price',
+    'Quantity on hand': 'stock',
+    'Reorder Quantity': 'reorder_threshold',
+    'Product rating': 'rating',
+}
+
+# Fields refreshed when a SKU already exists. Stock is live inventory, so a
+# re-run only sets it for new products unless --update-stock is given.
+UPDATE_FIELDS = ['name', 'description', 'category', 'price', 'reorder_threshold', 'rating', 'updated_at']
+
+
+def to_decimal(value):
+    return None if pd.isna(value) else Decimal(str(value))
+
+
+class Command(BaseCommand):
+    help = 'Bulk load (upsert by SKU) the product catalog from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', nargs='?', default='b2c_products_500.csv')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows read and written per transaction')
+        parser.add_argument('--update-stock', action='store_true',
+                            help='Also overwrite stock levels of existing products')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        update_fields = UPDATE_FIELDS + (['stock'] if options['update_stock'] else [])
+
+        try:
+            reader = pd.read_csv(options['csv_path'], usecols=list(COLUMNS), chunksize=chunk_size)
+        except FileNotFoundError:
+            raise CommandError(f"{options['csv_path']} not found")
+        except ValueError as e:
+            raise CommandError(f"Unexpected CSV columns: {e}")
+
+        # Products loaded before SKUs existed are matched once by name so
+        # re-running over an old database does not duplicate them
+        legacy_ids = dict(Product.objects.filter(sku__isnull=True).values_list('name', 'id'))
+
+        before = Product.objects.count()
+        start = time.perf_counter()
+        rows = 0
+        for chunk in reader:
+            chunk = chunk.rename(columns=COLUMNS)
+            chunk = chunk.dropna(subset=['sku', 'name']).drop_duplicates('sku', keep='last')
+            chunk['stock'] = pd.to_numeric(chunk['stock'], errors='coerce').fillna(0).astype(int)
+            chunk['reorder_threshold'] = pd.to_numeric(chunk['reorder_threshold'], errors='coerce').fillna(10).astype(int)
+            chunk['price'] = pd.to_numeric(chunk['price'], errors='coerce').fillna(0)
+            chunk['rating'] = pd.to_numeric(chunk['rating'], errors='coerce')
+            chunk['description'] = chunk['description'].where(chunk['description'].notna(), None)
+
+            products = [
+                Product(
+                    sku=sku, name=name, description=description, category=category,
+                    price=to_decimal(price), stock=stock, reorder_threshold=reorder,
+                    rating=to_decimal(rating),
+                )
+                for sku, name, description, category, price, stock, reorder, rating in zip(
+                    chunk['sku'], chunk['name'], chunk['description'], chunk['category'],
+                    chunk['price'], chunk['stock'], chunk['reorder_threshold'], chunk['rating'],
+                )
+            ]
+
+            with transaction.atomic():
+                if legacy_ids:
+                    self.adopt_legacy(products, legacy_ids)
+                skus = list(chunk['sku'])
+                out_of_stock = []
+                if options['update_stock']:
+                    out_of_stock = list(Product.objects.filter(sku__in=skus, stock__lte=0).values_list('id', flat=True))
+                Product.objects.bulk_create(
+                    products,
+                    update_conflicts=True,
+                    unique_fields=['sku'],
+                    update_fields=update_fields,
+                )
+                # Bulk upserts send no signals; drop cached copies of the rows just written
+                invalidate_products(Product.objects.filter(sku__in=skus).values_list('id', flat=True))
+                # and let running servers' search indexes catch up on the new text
+                transaction.on_commit(product_search.bump_version)
+                if out_of_stock:
+                    notify_restocked(Product.objects.filter(pk__in=out_of_stock, stock__gt=0).values_list('id', flat=True))
+
+            rows += len(products)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"  Progress: {rows} rows ({rows / elapsed:,.0f} rows/sec)")
+
+        elapsed = time.perf_counter() - start
+        created = Product.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {rows} products ({created} new, {rows - created} updated) "
+            f"in {elapsed:.1f}s - {rows / elapsed if elapsed else 0:,.0f} rows/sec"
+        ))
+
+    def adopt_legacy(self, products, legacy_ids):
+        """Give SKU-less products matching by name the SKU from the CSV"""
+        candidates = {p.sku: p.name for p in products if p.name in legacy_ids}
+        if not candidates:
+            return
+        taken = set(Product.objects.filter(sku__in=list(candidates)).values_list('sku', flat=True))
+        adopted = []
+        for sku, name in candidates.items():
+            if sku not in taken and name in legacy_ids:
+                adopted.append(Product(id=legacy_ids.pop(name), sku=sku))
+        Product.objects.bulk_update(adopted, ['sku'])
@@ -0,0 +1,158 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from storefront.models import Customer
+
+GENDER_MAP = {'Male': 'M', 'Female': 'F'}
+
+# CSV employment values -> Customer.EMPLOYMENT_CHOICES
+EMPLOYMENT_MAP = {
+    'Full-time': 'Employed',
+    'Part-time': 'Employed',
+    'Employed': 'Employed',
+    'Self-employed': 'Self-Employed',
+    'Self-Employed': 'Self-Employed',
+    'Student': 'Student',
+    'Unemployed': 'Unemployed',
+    'Retired': 'Unemployed',
+}
+
+# Annual income bands matching Customer.INCOME_CHOICES
+INCOME_BINS = [-np.inf, 30000, 60000, 100000, np.inf]
+INCOME_LABELS = ['Below 30k', '30k-60k', '60k-100k', 'Above 100k']
+
+
+def derive_customer_fields(df):
+    """Map raw customer CSV rows to User/Customer field values in one vectorized pass"""
+    # Row numbers follow the CSV (chunks keep a continuous index)
+    number = pd.Series(df.index + 1, index=df.index).astype(str)
+    annual_income = pd.to_numeric(df['monthly_income_sgd'], errors='coerce') * 12
+    age = pd.to_numeric(df['age'], errors='coerce')
+
+    out = pd.DataFrame(index=df.index)
+    out['username'] = 'customer_' + number
+    out['email'] = 'customer' + number + '@auroramart.com'
+    out['first_name'] = 'Customer ' + number
+    out['age'] = age.round().astype('Int64').astype(object).where(age.notna(), None)
+    out['gender'] = df['gender'].map(GENDER_MAP).fillna('P')
+    out['employment_status'] = df['employment_status'].map(EMPLOYMENT_MAP).fillna('Employed')
+    out['income_range'] = (
+        pd.cut(annual_income, bins=INCOME_BINS, labels=INCOME_LABELS, right=False)
+        .astype(object)
+        .where(annual_income.notna(), 'Below 30k')
+    )
+    out['preferred_category'] = df['preferred_category'].astype(object).where(df['preferred_category'].notna(), None)
+    return out
+
+
+def _init_worker():
+    # Needed when worker processes are spawned rather than forked
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auroramart.settings')
+    django.setup()
+
+
+def hash_passwords(passwords):
+    """Hash a batch of raw passwords (runs in a worker process)"""
+    return [make_password(password) for password in passwords]
+
+
+class Command(BaseCommand):
+    help = 'Bulk load customers (users + customer profiles) from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', nargs='?', default='b2c_customers_100.csv')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Rows read and written per transaction')
+        parser.add_argument('--password', default=None,
+                            help='Give every imported user this password (individually salted). '
+                                 'Without it, passwords are marked unusable.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes used for password hashing')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        password = options['password']
+
+        try:
+            reader = pd.read_csv(options['csv_path'], chunksize=chunk_size)
+        except FileNotFoundError:
+            raise CommandError(f"{options['csv_path']} not found")
+
+        pool = None
+        if password is not None and options['workers'] > 1:
+            pool = ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker)
+
+        start = time.perf_counter()
+        rows = users_created = customers_created = 0
+        try:
+            for chunk in reader:
+                fields = derive_customer_fields(chunk)
+                new_users, new_customers = self.load_chunk(fields, password, pool, options['workers'])
+                rows += len(fields)
+                users_created += new_users
+                customers_created += new_customers
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"  Progress: {rows} rows ({rows / elapsed:,.0f} rows/sec)")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {rows} customers ({users_created} new users, {customers_created} new profiles) "
+            f"in {elapsed:.1f}s - {rows / elapsed if elapsed else 0:,.0f} rows/sec"
+        ))
+
+    def hash_chunk(self, count, password, pool, workers):
+        """One salted hash per new user (or unusable markers when no password is given)"""
+        if password is None:
+            return [make_password(None) for _ in range(count)]
+        if pool is None:
+            return hash_passwords([password] * count)
+        batch = max(1, count // (workers * 4))
+        batches = [[password] * min(batch, count - i) for i in range(0, count, batch)]
+        return [hashed for result in pool.map(hash_passwords, batches) for hashed in result]
+
+    def load_chunk(self, fields, password, pool, workers):
+        usernames = list(fields['username'])
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        new_rows = fields[~fields['username'].isin(existing)]
+
+        # Hash outside the transaction so the database is not held during CPU work
+        hashes = self.hash_chunk(len(new_rows), password, pool, workers)
+        users = [
+            User(username=username, email=email, first_name=first_name, password=hashed)
+            for username, email, first_name, hashed in zip(
+                new_rows['username'], new_rows['email'], new_rows['first_name'], hashes
+            )
+        ]
+
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            user_ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+            with_profile = set(
+                Customer.objects.filter(user_id__in=user_ids.values()).values_list('user_id', flat=True)
+            )
+            customers = [
+                Customer(
+                    user_id=user_ids[username], age=age, gender=gender,
+                    employment_status=employment, income_range=income,
+                    preferred_category=category,
+                )
+                for username, age, gender, employment, income, category in zip(
+                    fields['username'], fields['age'], fields['gender'],
+                    fields['employment_status'], fields['income_range'], fields['preferred_category'],
+                )
+                if user_ids[username] not in with_profile
+            ]
+            Customer.objects.bulk_create(customers)
+        return len(users), len(customers)
@@ -0,0 +1,285 @@
+import json
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from storefront.management.commands.benchmark_db import percentile
+from storefront.models import Product
+
+# Pages every journey records, in journey order
+VIEWS = ['register', 'login', 'onboarding', 'category_products', 'product_detail',
+         'add_to_cart', 'checkout', 'confirm_order', 'dashboard']
+
+# Catalogue size at --scale 1
+BASE_SCALE = {'products': 2000, 'customers': 1000, 'orders': 5000}
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def summarize(samples, elapsed):
+    """Per-view results from {view: [(seconds, queries or None, ok)]}"""
+    views = {}
+    for view in VIEWS:
+        rows = samples.get(view)
+        if not rows:
+            continue
+        times = [seconds for seconds, _, _ in rows]
+        queries = [count for _, count, _ in rows if count is not None]
+        views[view] = {
+            'requests': len(rows),
+            'errors': sum(1 for _, _, ok in rows if not ok),
+            'throughput_rps': round(len(rows) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(times, 50) * 1000, 2),
+            'p95_ms': round(percentile(times, 95) * 1000, 2),
+            'p99_ms': round(percentile(times, 99) * 1000, 2),
+            'queries_avg': round(sum(queries) / len(queries), 2) if queries else None,
+            'queries_max': max(queries) if queries else None,
+        }
+    requests = sum(view['requests'] for view in views.values())
+    return {
+        'elapsed_sec': round(elapsed, 3),
+        'requests': requests,
+        'errors': sum(view['errors'] for view in views.values()),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else 0.0,
+        'views': views,
+    }
+
+
+def compare_results(baseline, current, threshold=0.25, min_ms=5.0, query_threshold=0.5):
+    """Regressions of ``current`` against ``baseline``, as messages (empty if none)
+
+    A view regresses when its p95 grows by more than ``threshold`` (a fraction)
+    and by more than ``min_ms``, when its average query count grows by more
+    than ``query_threshold``, or when it starts failing requests.
+    """
+    regressions = []
+    for view, base in baseline['views'].items():
+        new = current['views'].get(view)
+        if new is None:
+            continue
+        if new['p95_ms'] > base['p95_ms'] * (1 + threshold) and new['p95_ms'] - base['p95_ms'] > min_ms:
+            regressions.append(f"{view}: p95 {base['p95_ms']:.1f}ms -> {new['p95_ms']:.1f}ms")
+        if base['queries_avg'] is not None and new['queries_avg'] is not None \
+                and new['queries_avg'] - base['queries_avg'] > query_threshold:
+            regressions.append(f"{view}: queries {base['queries_avg']:.1f} -> {new['queries_avg']:.1f} per request")
+        if new['errors'] > base['errors']:
+            regressions.append(f"{view}: errors {base['errors']} -> {new['errors']}")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = ('Seed a scaled database, run concurrent register -> browse -> cart -> checkout journeys '
+            '(plus staff on the dashboard) and report latency and query counts per view')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent shoppers')
+        parser.add_argument('--journeys', type=int, default=3, help='Journeys per shopper')
+        parser.add_argument('--staff', type=int, default=1, help='Concurrent staff polling the dashboard')
+        parser.add_argument('--staff-interval', type=float, default=0.5, help='Seconds between dashboard loads')
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help=f"Dataset size multiplier ({', '.join(f'{v} {k}' for k, v in BASE_SCALE.items())} at 1.0)")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', metavar='BASELINE', help='Fail if any view regressed against this results file')
+        parser.add_argument('--results', help='Compare this existing results file instead of running the load test')
+        parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p95 growth (fraction)')
+        parser.add_argument('--min-ms', type=float, default=5.0, help='Ignore p95 growth smaller than this')
+        parser.add_argument('--query-threshold', type=float, default=0.5,
+                            help='Allowed growth in average queries per request')
+
+    def handle(self, *args, **options):
+        if options['results']:
+            if not options['compare']:
+                raise CommandError('--results needs --compare')
+            results = self.load(options['results'])
+        else:
+            results = self.run(options)
+            self.report(results)
+            if options['output']:
+                with open(options['output'], 'w') as f:
+                    json.dump(results, f, indent=2)
+                self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            regressions = compare_results(
+                self.load(options['compare']), results,
+                threshold=options['threshold'], min_ms=options['min_ms'],
+                query_threshold=options['query_threshold'],
+            )
+            if regressions:
+                raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read results file {path}: {e}')
+
+    def run(self, options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('loadtest only supports SQLite databases')
+        workdir = tempfile.mkdtemp(prefix='auroramart-loadtest-')
+        # Keep the real caches and replicas out of it: ids in the scratch database collide with real ones
+        caches = {
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'loadtest-{alias}',
+                    **{k: v for k, v in config.items() if k in ('TIMEOUT', 'OPTIONS')}}
+            for alias, config in settings.CACHES.items()
+        }
+        test_settings = connections.settings['default'].setdefault('TEST', {})
+        previous_test_name = test_settings.get('NAME')
+        test_settings['NAME'] = os.path.join(workdir, 'loadtest.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Every virtual user comes from one address: measure the app, not its rate limits
+            # Query counts are read from the Server-Timing header, whoever the user is
+            with override_settings(CACHES=caches, DATABASE_REPLICAS=[], ALLOWED_HOSTS=['testserver'], DEBUG=False,
+                                   RATE_LIMITS={}, LOAD_SHED_LIMITS={}, PERF_SERVER_TIMING=True):
+                self.seed(options)
+                return self.drive(options)
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = previous_test_name
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def seed(self, options):
+        sizes = {name: max(1, int(size * options['scale'])) for name, size in BASE_SCALE.items()}
+        started = time.perf_counter()
+        call_command('generate_synthetic_data', seed=options['seed'], workers=1, stdout=StringIO(), **sizes)
+        User.objects.create_user('loadtest_staff', password='loadtest-staff-1', is_staff=True)
+        self.stdout.write(
+            f"Seeded {', '.join(f'{v:,} {k}' for k, v in sizes.items())} in {time.perf_counter() - started:.1f}s"
+        )
+        self.sizes = sizes
+
+    def drive(self, options):
+        products = list(Product.objects.filter(stock__gte=50).values_list('id', 'category'))
+        if not products:
+            raise CommandError('The seeded catalogue has no products in stock')
+        categories = sorted({category for _, category in products})
+        staff = User.objects.get(username='loadtest_staff')
+        samples = defaultdict(list)
+        lock = threading.Lock()
+        stop = threading.Event()
+        connections.close_all()
+
+        def request(client, local, view, method, url, data=None):
+            started = time.perf_counter()
+            try:
+                response = getattr(client, method)(url, data or {})
+                ok = response.status_code < 400
+                match = QUERIES_RE.search(response.get('Server-Timing', ''))
+                queries = int(match.group(1)) if match else None
+            except Exception:
+                ok, queries = False, None
+            local[view].append((time.perf_counter() - started, queries, ok))
+
+        def journey(client, local, rng, username):
+            password = f'Loadtest-{rng.randrange(10 ** 6)}x'
+            request(client, local, 'register', 'post', reverse('accounts:register'), {
+                'username': username, 'email': f'{username}@example.com', 'password': password,
+                'first_name': 'Load', 'last_name': 'Test',
+            })
+            request(client, local, 'login', 'post', reverse('accounts:login'),
+                    {'username': username, 'password': password})
+            request(client, local, 'onboarding', 'post', reverse('storefront:onboarding'), {
+                'age': rng.randint(18, 70), 'gender': rng.choice(['male', 'female', 'other']),
+                'employment': 'Employed', 'income': rng.randrange(20000, 150000, 1000),
+            })
+            for category in rng.sample(categories, k=min(len(categories), rng.randint(1, 3))):
+                request(client, local, 'category_products', 'get',
+                        reverse('storefront:category_products', args=[category]))
+                in_category = [pid for pid, c in products if c == category]
+                for product_id in rng.sample(in_category, k=min(len(in_category), 2)):
+                    request(client, local, 'product_detail', 'get',
+                            reverse('storefront:product_detail', args=[product_id]))
+            for product_id, _ in rng.sample(products, k=min(len(products), rng.randint(1, 3))):
+                request(client, local, 'add_to_cart', 'post',
+                        reverse('storefront:add_to_cart', args=[product_id]), {'quantity': 1})
+            request(client, local, 'checkout', 'get', reverse('storefront:checkout'))
+            request(client, local, 'confirm_order', 'post', reverse('storefront:confirm_order'))
+            client.logout()
+
+        def shopper(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            client = Client()
+            local = defaultdict(list)
+            try:
+                for n in range(options['journeys']):
+                    journey(client, local, rng, f'loadtest_{index}_{n}')
+            finally:
+                connections.close_all()
+            with lock:
+                for view, rows in local.items():
+                    samples[view].extend(rows)
+
+        def staff_member():
+            client = Client()
+            client.force_login(staff)
+            local = defaultdict(list)
+            try:
+                while True:
+                    request(client, local, 'dashboard', 'get', reverse('adminpanel:admin_dashboard'))
+                    if stop.wait(options['staff_interval']):
+                        break
+            finally:
+                connections.close_all()
+            with lock:
+                samples['dashboard'].extend(local['dashboard'])
+
+        shoppers = [threading.Thread(target=shopper, args=(i,)) for i in range(options['clients'])]
+        staff_threads = [threading.Thread(target=staff_member) for _ in range(options['staff'])]
+        started = time.perf_counter()
+        for thread in shoppers + staff_threads:
+            thread.start()
+        for thread in shoppers:
+            thread.join()
+        stop.set()
+        for thread in staff_threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        results = summarize(samples, elapsed)
+        results['meta'] = {
+            'created': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+            'django': django.get_version(),
+            'settings': os.environ.get('DJANGO_SETTINGS_MODULE'),
+            'clients': options['clients'],
+            'journeys': options['journeys'],
+            'staff': options['staff'],
+            'scale': options['scale'],
+            'seed': options['seed'],
+            'dataset': self.sizes,
+        }
+        return results
+
+    def report(self, results):
+        self.stdout.write(f"{'view':>18} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        for view, row in results['views'].items():
+            queries = f"{row['queries_avg']:.1f}" if row['queries_avg'] is not None else '-'
+            self.stdout.write(
+                f"{view:>18} {row['requests']:>6} {row['errors']:>4} {row['p50_ms']:>8.1f} "
+                f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {queries:>8}"
+            )
+        self.stdout.write(
+            f"{results['requests']:,} requests in {results['elapsed_sec']:.1f}s "
+            f"({results['throughput_rps']:,.1f} req/sec, {results['errors']} errors)"
+        )
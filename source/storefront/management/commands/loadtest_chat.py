@@ -0,0 +1,158 @@
+import asyncio
+import json
+import random
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+
+from storefront import chat, product_search
+from storefront.management.commands.benchmark_db import percentile
+
+QUESTIONS = [
+    'Do you have a kettle?',
+    'What products do you have?',
+    'How much is shipping?',
+    'any discounts?',
+    'I need a gift for my dad',
+    'how do I place an order',
+    'wireless headphones',
+    'hello',
+]
+
+
+async def post_stream(app, path, body, disconnect_after=None):
+    """POST to the ASGI app and read the SSE body: {status, first (seconds to the first event), events}"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    started = time.perf_counter()
+    result = {'status': None, 'first': None, 'events': 0}
+    request_sent = False
+    gone = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await gone.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+        elif message['type'] == 'http.response.body' and message.get('body'):
+            if result['first'] is None:
+                result['first'] = time.perf_counter() - started
+            result['events'] += message['body'].count(b'\n\n')
+            if disconnect_after is not None and result['events'] >= disconnect_after:
+                gone.set()
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        gone.set()
+    return result
+
+
+class Command(BaseCommand):
+    help = ('How many concurrent AuroBot conversations one ASGI worker sustains with streamed replies '
+            '(runs the ASGI application in this process)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--levels', type=int, nargs='+', default=[100, 250, 500, 1000],
+                            help='Concurrent conversations to try, in order')
+        parser.add_argument('--messages', type=int, default=2, help='Messages per conversation')
+        parser.add_argument('--think', type=float, default=4.0,
+                            help='Seconds between a reply and the next message (reading and typing)')
+        parser.add_argument('--ramp', type=float, default=4.0, help='Seconds over which conversations start')
+        parser.add_argument('--delay', type=float, default=0.05, help='AURABOT_STREAM_DELAY for the run')
+        parser.add_argument('--disconnect-rate', type=float, default=0.1,
+                            help='Share of replies the client abandons after the first chunk')
+        parser.add_argument('--budget-ms', type=float, default=250,
+                            help='p99 time to first chunk a level must stay under to count as sustained')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        # Build the search index and warm the product cache before timing
+        product_search.get_index()
+        for question in QUESTIONS:
+            chat.answer(question)
+        # Every conversation comes from one address: measure the app, not its rate limits
+        with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False, AURABOT_STREAM_DELAY=options['delay'],
+                               RATE_LIMITS={}, LOAD_SHED_LIMITS={}):
+            app = get_asgi_application()
+            sustained = peak = None
+            for level in options['levels']:
+                result = asyncio.run(self.run_level(app, level, options))
+                ok = not result['errors'] and result['p99_first_ms'] <= options['budget_ms']
+                self.stdout.write(
+                    f"{level:>6} conversations: {result['replies']:,} replies in {result['elapsed']:.1f}s, "
+                    f"first chunk p50 {result['p50_first_ms']:.1f}ms p99 {result['p99_first_ms']:.1f}ms, "
+                    f"full reply p99 {result['p99_total_ms']:.0f}ms, peak {result['peak_streams']} open streams, "
+                    f"{result['abandoned']} abandoned, {result['errors']} errors"
+                    + ('' if ok else '  <- over budget')
+                )
+                if not ok:
+                    break
+                sustained, peak = level, result['peak_streams']
+        if sustained is None:
+            self.stdout.write(self.style.WARNING(f"No level stayed under {options['budget_ms']:.0f}ms"))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"One process sustained {sustained:,} concurrent conversations "
+                f"(p99 first chunk under {options['budget_ms']:.0f}ms) with up to {peak} replies streaming at once "
+                f"on one thread; a thread-per-request server would need a thread for each"
+            ))
+
+    async def run_level(self, app, level, options):
+        path = reverse('storefront:aurabot_stream')
+        first, total = [], []
+        counts = {'replies': 0, 'abandoned': 0, 'errors': 0}
+        peak = 0
+
+        async def conversation(index):
+            rng = random.Random(options['seed'] * 100000 + index)
+            await asyncio.sleep(rng.random() * options['ramp'])
+            for _ in range(options['messages']):
+                body = json.dumps({'message': rng.choice(QUESTIONS)}).encode()
+                abandon = rng.random() < options['disconnect_rate']
+                started = time.perf_counter()
+                result = await post_stream(app, path, body, disconnect_after=1 if abandon else None)
+                if result['status'] != 200 or result['first'] is None:
+                    counts['errors'] += 1
+                    continue
+                first.append(result['first'])
+                if abandon:
+                    counts['abandoned'] += 1
+                else:
+                    total.append(time.perf_counter() - started)
+                    counts['replies'] += 1
+                await asyncio.sleep(options['think'] * rng.uniform(0.5, 1.5))
+
+        async def watch():
+            nonlocal peak
+            while True:
+                peak = max(peak, chat.open_streams())
+                await asyncio.sleep(0.01)
+
+        watcher = asyncio.create_task(watch())
+        started = time.perf_counter()
+        await asyncio.gather(*[conversation(i) for i in range(level)])
+        elapsed = time.perf_counter() - started
+        watcher.cancel()
+        return {
+            **counts,
+            'elapsed': elapsed,
+            'peak_streams': peak,
+            'p50_first_ms': percentile(first, 50) * 1000 if first else 0,
+            'p99_first_ms': percentile(first, 99) * 1000 if first else float('inf'),
+            'p99_total_ms': percentile(total, 99) * 1000 if total else 0,
+        }
@@ -0,0 +1,113 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a worker does before it can serve its first request
+STARTUP_SCRIPT = '''
+import time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+if {preload}:
+    from storefront.ml import preload_models
+    preload_models()
+print("STARTUP_MS=%.1f" % ((time.perf_counter() - started) * 1000))
+'''
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+STARTUP_RE = re.compile(r'^STARTUP_MS=([\d.]+)$', re.MULTILINE)
+
+
+def parse_importtime(output):
+    """[(module, self_us, cumulative_us, depth)] from ``python -X importtime`` output"""
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return modules
+
+
+def by_package(modules):
+    """{top-level package: total self time in us}, largest first"""
+    totals = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        totals[name.split('.')[0]] += self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+class Command(BaseCommand):
+    help = ('Profile a cold start (django.setup, middleware and URLconf in a fresh interpreter): '
+            'import time per module and package, total startup time, and optional budgets for CI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Timed cold starts (the median is reported)')
+        parser.add_argument('--top', type=int, default=15, help='Modules and packages to list')
+        parser.add_argument('--preload', action='store_true', help='Also load the ML models (as with ML_PRELOAD)')
+        parser.add_argument('--budget-ms', type=float, help='Fail if the median startup takes longer')
+        parser.add_argument('--forbid', nargs='+', default=[], metavar='MODULE',
+                            help='Fail if any of these modules is imported at startup (e.g. joblib sklearn)')
+        parser.add_argument('--json', help='Write the profile to this file')
+
+    def start(self, options, importtime=False):
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else [])
+        command += ['-c', STARTUP_SCRIPT.format(preload=options['preload'])]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'auroramart.settings'))
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        match = STARTUP_RE.search(result.stdout)
+        if result.returncode or not match:
+            raise CommandError(f'Startup failed:\n{result.stderr[-2000:]}')
+        return float(match.group(1)), result.stderr
+
+    def handle(self, *args, **options):
+        _, stderr = self.start(options, importtime=True)
+        modules = parse_importtime(stderr)
+        packages = by_package(modules)
+        times = sorted(self.start(options)[0] for _ in range(max(1, options['runs'])))
+        startup_ms = times[len(times) // 2]
+
+        self.stdout.write(f"{'module':<50} {'cumulative ms':>14} {'self ms':>8}")
+        for name, self_us, cumulative_us, depth in sorted(modules, key=lambda m: m[2], reverse=True)[:options['top']]:
+            self.stdout.write(f'{name:<50} {cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}')
+        self.stdout.write(f"\n{'package':<50} {'self ms':>14}")
+        for name, self_us in list(packages.items())[:options['top']]:
+            self.stdout.write(f'{name:<50} {self_us / 1000:>14.1f}')
+        self.stdout.write(
+            f'\n{len(modules)} modules imported; startup {startup_ms:.0f}ms '
+            f"(median of {len(times)}: {', '.join(f'{t:.0f}' for t in times)}ms)"
+        )
+
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump({
+                    'startup_ms': startup_ms,
+                    'runs_ms': times,
+                    'packages_ms': {name: us / 1000 for name, us in packages.items()},
+                    'modules': [
+                        {'module': name, 'self_ms': s / 1000, 'cumulative_ms': c / 1000, 'depth': d}
+                        for name, s, c, d in modules
+                    ],
+                }, f, indent=2)
+
+        failures = []
+        imported = {name for name, _, _, _ in modules}
+        for module in options['forbid']:
+            if module in imported:
+                failures.append(f'{module} is imported at startup')
+        if options['budget_ms'] is not None and startup_ms > options['budget_ms']:
+            failures.append(f"startup took {startup_ms:.0f}ms (budget {options['budget_ms']:.0f}ms)")
+        if failures:
+            raise CommandError('Startup budget exceeded: ' + '; '.join(failures))
+        if options['forbid'] or options['budget_ms'] is not None:
+            self.stdout.write(self.style.SUCCESS('Startup within budget'))
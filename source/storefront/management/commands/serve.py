@@ -0,0 +1,53 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from storefront import prefork
+
+
+class Command(BaseCommand):
+    help = ('Production server: preload the application, ML models and caches, then fork '
+            'workers that share them copy-on-write (see storefront/prefork.py)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('addrport', nargs='?', default=os.environ.get('DJANGO_BIND', '127.0.0.1:8000'),
+                            help='host:port to listen on (default: $DJANGO_BIND or 127.0.0.1:8000)')
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'SERVER_WORKERS', 0),
+                            help='Worker processes (0 = one per CPU)')
+        parser.add_argument('--max-requests', type=int, default=getattr(settings, 'SERVER_MAX_REQUESTS', 5000),
+                            help='Restart a worker after this many requests (0 = never)')
+        parser.add_argument('--asgi', action='store_true', help='Serve the ASGI application with uvicorn workers')
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork'):
+            raise CommandError('serve needs a platform with fork(); use runserver instead')
+        if options['asgi']:
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError('--asgi needs uvicorn: pip install uvicorn')
+        host, _, port = options['addrport'].rpartition(':')
+        try:
+            port = int(port)
+        except ValueError:
+            raise CommandError(f"{options['addrport']!r} is not host:port")
+        host = (host or '127.0.0.1').strip('[]')
+        workers = options['workers'] or prefork.default_workers()
+
+        application, steps = prefork.preload(asgi=options['asgi'])
+        for label, ms, detail in steps:
+            self.stdout.write(f'  preloaded {label:<34} {ms:8.1f}ms  {detail}')
+        try:
+            sock = prefork.bind(host, port)
+        except OSError as e:
+            raise CommandError(f'Cannot listen on {host}:{port}: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Serving {'ASGI' if options['asgi'] else 'WSGI'} on http://{options['addrport']}/ with "
+            f"{workers} worker(s), master pid {os.getpid()}"
+        ))
+        self.stdout.flush()
+        master = prefork.Master(application, sock, workers, options['max_requests'],
+                                getattr(settings, 'SERVER_MAX_REQUESTS_JITTER', 500), asgi=options['asgi'])
+        if master.run():
+            raise CommandError('A worker could not start')
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from storefront.routers import get_replicas
+
+
+def snapshot_sqlite(source, target):
+    """Copy the primary into a replica file in place (consistent online backup)"""
+    src = sqlite3.connect(str(source))
+    dst = sqlite3.connect(str(target), timeout=30)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+class Command(BaseCommand):
+    help = 'Refresh the SQLite read replicas listed in DATABASE_REPLICAS from the primary database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running, taking a snapshot every N seconds')
+
+    def handle(self, *args, **options):
+        replicas = get_replicas()
+        if not replicas:
+            raise CommandError('No DATABASE_REPLICAS configured (set DJANGO_DB_REPLICAS with the production settings)')
+        databases = settings.DATABASES
+        for alias in ['default'] + replicas:
+            if databases[alias]['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f'snapshot_replicas only copies SQLite databases ({alias} is not)')
+
+        while True:
+            start = time.perf_counter()
+            for alias in replicas:
+                snapshot_sqlite(databases['default']['NAME'], databases[alias]['NAME'])
+            self.stdout.write(f"Snapshotted {len(replicas)} replica(s) in {time.perf_counter() - start:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 02:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storefront', '0008_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(condition=models.Q(('notify_when_available', True)), fields=['product'], name='favorite_notify_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+"""
+Lazily loaded ML models.
+
+The pickled models need joblib, scikit-learn and NumPy, which together take
+longer to import than the rest of the project. They are imported the first
+time a view asks for a model, so ``manage.py`` commands, test runs and
+worker boot do not pay for them. Set ``ML_PRELOAD = True`` to load them when
+the WSGI/ASGI application starts instead, so no request waits for it. See
+``manage.py profile_startup``.
+"""
+
+import os
+import threading
+
+from django.conf import settings
+
+MODEL_FILES = {
+    'decision_tree': 'decision_tree_model.joblib',
+    'association_rules': 'association_rules_model.joblib',
+}
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_model(name):
+    """The named model, or None if it is missing or cannot be loaded (loaded once per process)"""
+    try:
+        return _models[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _models:
+            _models[name] = _load(name)
+    return _models[name]
+
+
+def _load(name):
+    path = os.path.join(settings.BASE_DIR, 'ml_models', MODEL_FILES[name])
+    if not os.path.exists(path):
+        return None
+    try:
+        import joblib
+        return joblib.load(path)
+    except Exception as e:
+        print(f"Warning: Could not load ML model {name}: {e}")
+        return None
+
+
+def preload_models():
+    """Load every model now (application startup with ML_PRELOAD)"""
+    for name in MODEL_FILES:
+        get_model(name)
@@ -1,9 +1,43 @@
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
 from django.contrib.auth.models import User
 from decimal import Decimal
 
+# Sent with ids=[...] and fields=[...] after QuerySet.update() changes products (which sends no post_save).
+# Stock updates also send out_of_stock=[...]: the ids that had no stock before the update.
+products_updated = Signal()
+
+
+class ProductQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        if set(kwargs) & set(self.model.TEXT_FIELDS) and 'updated_at' not in kwargs:
+            # update() skips auto_now; the search index catches up on text changes by updated_at
+            kwargs['updated_at'] = timezone.now()
+        if not products_updated.has_listeners(self.model):
+            return super().update(**kwargs)
+        # Read the ids under the same write lock as the UPDATE, so out_of_stock
+        # matches what it changed. (SQLite ignores FOR UPDATE; with IMMEDIATE
+        # transactions the lock is taken at BEGIN.)
+        self._for_write = True
+        with transaction.atomic(using=self.db, savepoint=False):
+            locked = self.select_for_update().order_by()
+            extra = {}
+            if 'stock' in kwargs:
+                before = list(locked.values_list('pk', 'stock'))
+                ids = [pk for pk, _ in before]
+                extra['out_of_stock'] = [pk for pk, stock in before if stock <= 0]
+            else:
+                ids = list(locked.values_list('pk', flat=True))
+            count = super().update(**kwargs)
+        if ids:
+            products_updated.send(sender=self.model, ids=ids, fields=list(kwargs), **extra)
+        return count
+
+
 class Product(models.Model):
     """Product model for the storefront"""
+    sku = models.CharField(max_length=50, unique=True, null=True, blank=True)
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     category = models.CharField(max_length=100)
@@ -12,6 +46,9 @@ class Product(models.Model):
     reorder_threshold = models.IntegerField(default=10)
     rating = models.DecimalField(max_digits=3, decimal_places=1, null=True, blank=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Filled in by the image pipeline once resized copies exist (see storefront/images.py)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -20,8 +57,22 @@ class Product(models.Model):
     original_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     discount_percentage = models.IntegerField(null=True, blank=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    # What AuroBot's search index reads (storefront/product_search.py)
+    TEXT_FIELDS = ('name', 'description', 'category')
+
     def __str__(self):
         return self.name
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stock as loaded, so saves can tell a restock apart (storefront/restock.py)
+        instance._loaded_stock = instance.__dict__.get('stock')
+        # Searchable text as loaded, so saves that leave it alone skip the search index
+        instance._loaded_text = tuple(instance.__dict__.get(field) for field in cls.TEXT_FIELDS)
+        return instance
     
     def get_current_price(self):
         """Return current price (discounted if on sale). Prioritize consistent derivation from original_price and discount_percentage when available."""
@@ -43,6 +94,14 @@ class Product(models.Model):
                     return self.price
         return self.price
     
+    @property
+    def card_version(self):
+        """Changes whenever anything shown on a product card does (price, stock, image...)"""
+        return '|'.join(str(value) for value in (
+            self.name, self.price, self.stock, self.image, self.image_width, self.rating,
+            self.is_on_sale, self.original_price, self.discount_percentage,
+        ))
+
     def get_discount_percentage(self):
         """Calculate discount percentage consistently."""
         if not self.is_on_sale:
@@ -59,6 +118,18 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Category pages, "same category" recommendations and category counts
+            models.Index(fields=['category', 'stock'], name='product_category_stock_idx'),
+            # Low-stock report and in-stock filters
+            models.Index(fields=['stock'], name='product_stock_idx'),
+            # Listings only show in-stock products, sorted newest first, by rating or by price
+            models.Index(fields=['-created_at'], condition=models.Q(stock__gt=0), name='product_instock_created_idx'),
+            models.Index(fields=['-rating'], condition=models.Q(stock__gt=0), name='product_instock_rating_idx'),
+            models.Index(fields=['price'], condition=models.Q(stock__gt=0), name='product_instock_price_idx'),
+            # AuroBot search catch-up: products changed since a time
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
 
 
 class Customer(models.Model):
@@ -85,6 +156,8 @@ class Customer(models.Model):
 
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    profile_picture_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    profile_picture_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True, null=True)
     birthday = models.DateField(null=True, blank=True)
     age = models.IntegerField(null=True, blank=True)
@@ -134,6 +207,9 @@ class Order(models.Model):
         ('Delivered', 'Delivered'),
         ('Cancelled', 'Cancelled'),
     ]
+    # Orders that count as sales; listed rather than excluding 'Cancelled' so
+    # the dashboard reads them as ranges of order_status_created_idx
+    VALID_STATUSES = ['Pending', 'Processing', 'Shipped', 'Delivered']
 
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='orders')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
@@ -141,6 +217,14 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Sales dashboard: non-cancelled orders bucketed by date
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # Order history: a customer's orders newest first (storefront/orders.py)
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.customer.user.username}"
 
@@ -159,6 +243,24 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
 
+class OrderSummary(models.Model):
+    """
+    Snapshot of an order as placed: customer, lines with product names and
+    prices, and totals (storefront/order_summary.py). Written once, never updated.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Summary of order #{self.order_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Order summaries are immutable')
+        super().save(*args, **kwargs)
+
+
 class Favorite(models.Model):
     """User favorites for products"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites')
@@ -169,6 +271,11 @@ class Favorite(models.Model):
     class Meta:
         unique_together = ('user', 'product')
         ordering = ['-created_at']
+        indexes = [
+            # Restock notifications: who is waiting for these products
+            models.Index(fields=['product'], condition=models.Q(notify_when_available=True),
+                         name='favorite_notify_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.product.name}"
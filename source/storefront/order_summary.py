@@ -0,0 +1,119 @@
+"""
+Order summaries: what a customer bought, as it was when they bought it.
+
+``confirm_order`` writes an ``OrderSummary`` next to each new order, from the
+cart it already has in memory. The summary is a JSON document::
+
+    {"order_id": 42, "created_at": "2026-10-19T02:10:00+00:00",
+     "customer": {"id": 7, "username": "ana", "name": "Ana"},
+     "lines": [{"product_id": 3, "name": "Desk Lamp", "quantity": 2,
+                "unit_price": "19.99", "total": "39.98"}],
+     "item_count": 2, "subtotal": "39.98", "delivery_fee": "4.99", "total": "44.97"}
+
+Amounts are strings, so they come back as exact decimals. Order pages, the
+Django admin and the live dashboard feed read this one row instead of
+joining lines, products, customers and users. Renaming or repricing a product
+later does not change past orders. The status is not part of the snapshot;
+it stays on ``Order``.
+
+Orders placed before summaries existed get theirs from ``manage.py
+backfill_order_summaries``. Until then, ``attach_summaries`` builds any that
+are missing when the order is shown.
+"""
+
+from decimal import Decimal
+
+from .models import Order, OrderItem, OrderSummary
+
+
+def summary_data(order, items, user, delivery_fee=None):
+    """
+    The summary document for an order. ``items`` are its OrderItems with
+    their products loaded, and ``user`` is the customer's user.
+    """
+    return build_document(
+        order.pk, order.created_at, order.customer_id, user.username, user.first_name, order.total_amount,
+        [(item.product_id, item.product.name, item.quantity, item.price) for item in items],
+        delivery_fee,
+    )
+
+
+def build_document(order_id, created_at, customer_id, username, first_name, total, lines, delivery_fee=None):
+    """
+    The summary document from plain values; ``lines`` are (product_id, name,
+    quantity, unit_price). Without a ``delivery_fee``, the difference between
+    the total and the lines is used.
+    """
+    subtotal = sum((price * quantity for _, _, quantity, price in lines), Decimal('0.00'))
+    if delivery_fee is None:
+        delivery_fee = total - subtotal
+    return {
+        'order_id': order_id,
+        'created_at': created_at.isoformat(),
+        'customer': {'id': customer_id, 'username': username, 'name': first_name or username},
+        'lines': [
+            {'product_id': product_id, 'name': name, 'quantity': quantity,
+             'unit_price': str(price), 'total': str(price * quantity)}
+            for product_id, name, quantity, price in lines
+        ],
+        'item_count': sum(quantity for _, _, quantity, _ in lines),
+        'subtotal': str(subtotal),
+        'delivery_fee': str(delivery_fee),
+        'total': str(total),
+    }
+
+
+def snapshot_order(order, items, user, delivery_fee):
+    """Write the summary of a newly placed order (no reads: everything is in memory)"""
+    return OrderSummary.objects.create(order=order, data=summary_data(order, items, user, delivery_fee))
+
+
+def build_summaries(order_ids):
+    """
+    Unsaved summaries for those of these orders that have none, from two
+    reads whatever the number of orders: the orders with their customers'
+    names, and their lines with product names. Rows are read as plain
+    values, since building model instances would cost more than the rest.
+    """
+    orders = (
+        Order.objects.filter(pk__in=order_ids, summary__isnull=True).order_by('id')
+        .values_list('id', 'created_at', 'customer_id', 'customer__user__username',
+                     'customer__user__first_name', 'total_amount')
+    )
+    lines = {}
+    for order_id, *line in (
+        OrderItem.objects.filter(order_id__in=order_ids).order_by('id')
+        .values_list('order_id', 'product_id', 'product__name', 'quantity', 'price')
+    ):
+        lines.setdefault(order_id, []).append(line)
+    return [
+        OrderSummary(order_id=order[0], data=build_document(*order, lines.get(order[0], [])))
+        for order in orders
+    ]
+
+
+def save_summaries(summaries):
+    # A racing writer (checkout or another batch) may get there first
+    OrderSummary.objects.bulk_create(summaries, ignore_conflicts=True)
+
+
+def summarize_orders(order_ids):
+    """Build and store the missing summaries for these orders; returns how many were built"""
+    summaries = build_summaries(order_ids)
+    save_summaries(summaries)
+    return len(summaries)
+
+
+def attach_summaries(orders):
+    """
+    Make ``order.summary`` available on each order, which must have been
+    loaded with ``select_related('summary')``. Missing summaries are built
+    in one batch.
+    """
+    missing = [order for order in orders if not hasattr(order, 'summary')]
+    if missing:
+        summarize_orders([order.pk for order in missing])
+        summaries = OrderSummary.objects.in_bulk([order.pk for order in missing])
+        for order in missing:
+            order.summary = summaries[order.pk]
+    return orders
@@ -0,0 +1,126 @@
+"""
+A customer's order history.
+
+Orders are listed newest first, ``ORDER_HISTORY_PAGE_SIZE`` at a time. Pages
+use keyset pagination: the link to the next page carries the
+``(created_at, id)`` of the last order shown (``?before=<cursor>``), and
+that page starts strictly after it. Every page is then one range scan on
+``order_customer_created_idx``, however far back the customer goes. An
+offset would make the database skip every earlier order first, and a new
+order would shift the later pages.
+
+Lines, names and totals come from each order's summary
+(storefront/order_summary.py), joined in, so a page is a single query
+whatever the number of lines.
+
+The first page, which is the one most people look at, is cached per
+customer for ``ORDER_HISTORY_CACHE_TIMEOUT`` seconds. The cache key includes
+a per-customer version, which is bumped whenever one of the customer's
+orders is saved or deleted, right away and again on commit. A page read
+before the bump is stored under the old version and never served. Versions
+and pages live in the ``ORDER_HISTORY_CACHE`` cache, which must be shared by
+all server processes (the production settings make the default cache a file
+cache). With a per-process cache, an order placed through one worker would
+not refresh the page another worker cached.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.shortcuts import get_object_or_404
+
+from .models import Order
+from .order_summary import attach_summaries
+
+VERSION_PREFIX = 'order-history-version:'
+PAGE_PREFIX = 'order-history:'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def order_queryset():
+    """Orders with their summaries, and only the order columns the pages show"""
+    return Order.objects.only('id', 'status', 'created_at', 'summary__data').select_related('summary')
+
+
+def customer_order(user, order_id):
+    """The user's order, or 404 (also for other customers' orders)"""
+    order = get_object_or_404(order_queryset().filter(customer__user=user), pk=order_id)
+    return attach_summaries([order])[0]
+
+
+def encode_cursor(order):
+    micros = (order.created_at - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}-{order.pk}'
+
+
+def decode_cursor(cursor):
+    """(created_at, id) from encode_cursor(); ValueError if it is malformed"""
+    micros, _, pk = cursor.partition('-')
+    return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+
+
+def get_cache():
+    return caches[getattr(settings, 'ORDER_HISTORY_CACHE', 'default')]
+
+
+def get_version(customer_id):
+    cache = get_cache()
+    key = f'{VERSION_PREFIX}{customer_id}'
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a cache restart never reuses an old key
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(customer_id):
+    try:
+        get_cache().incr(f'{VERSION_PREFIX}{customer_id}')
+    except ValueError:
+        # Never read, so nothing was cached under it
+        pass
+
+
+def invalidate(customer_id):
+    bump_version(customer_id)
+    transaction.on_commit(lambda: bump_version(customer_id))
+
+
+def history_page(customer_id, before=None):
+    """
+    (orders, next_cursor) for one page of the customer's history; ``before``
+    is a cursor from the previous page. next_cursor is None on the last page.
+    """
+    size = getattr(settings, 'ORDER_HISTORY_PAGE_SIZE', 10)
+    key = None
+    if before is None:
+        key = f'{PAGE_PREFIX}{customer_id}:{get_version(customer_id)}'
+        page = get_cache().get(key)
+        if page is not None:
+            return page
+
+    orders = order_queryset().filter(customer_id=customer_id).order_by('-created_at', '-id')
+    if before is not None:
+        created_at, pk = decode_cursor(before)
+        orders = orders.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    # One extra row tells whether there is a next page
+    orders = attach_summaries(list(orders[:size + 1]))
+    next_cursor = encode_cursor(orders[size - 1]) if len(orders) > size else None
+    page = (orders[:size], next_cursor)
+    if key is not None:
+        get_cache().set(key, page, getattr(settings, 'ORDER_HISTORY_CACHE_TIMEOUT', 300))
+    return page
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def order_changed(sender, instance, **kwargs):
+    invalidate(instance.customer_id)
+
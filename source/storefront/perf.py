@@ -0,0 +1,246 @@
+"""
+Per-request performance instrumentation.
+
+``PerformanceMiddleware`` records the query count, SQL time, template render
+time and total time of every request routed to a named URL. It adds them to
+the response as a ``Server-Timing`` header, so they show up in the browser's
+network panel. ``PERF_SERVER_TIMING`` says who gets the header: everyone
+(True, for development and load tests), staff only (``'staff'``, the
+production setting: query counts and N+1 suspects are internals), or nobody. When a request runs the same SQL (same statement, different
+parameters) ``PERF_N_PLUS_ONE_THRESHOLD`` times or more, it is flagged as a
+suspected N+1 and logged to ``storefront.perf``.
+
+Samples are kept per URL name in a rolling window of the last
+``PERF_WINDOW`` requests, per process. The admin panel's performance page
+shows their percentiles. Set ``PERF_INSTRUMENTATION = False`` to remove the
+middleware entirely.
+
+Queries are timed by a wrapper that every database connection gets when it
+opens. Template time comes from ``InstrumentedDjangoTemplates``, the template
+backend in ``TEMPLATES``. Both find the current request through a context
+variable, so they also count work done in ``sync_to_async`` threads. Outside
+a request they do nothing.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends import django as django_backend
+from django.template.exceptions import TemplateDoesNotExist
+
+logger = logging.getLogger('storefront.perf')
+
+TABLE_RE = re.compile(r'\bFROM\s+"?(\w+)"?', re.IGNORECASE)
+
+_current = ContextVar('storefront_perf_request', default=None)
+
+_samples_lock = threading.Lock()
+_samples = defaultdict(deque)
+_suspects = {}
+
+
+def window():
+    return getattr(settings, 'PERF_WINDOW', 500)
+
+
+def n_plus_one_threshold():
+    return getattr(settings, 'PERF_N_PLUS_ONE_THRESHOLD', 5)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'sql_time', 'template_time', 'shapes')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.shapes = Counter()
+
+    def suspected_n_plus_one(self):
+        """[(count, sql)] for statements repeated at least the threshold number of times"""
+        threshold = n_plus_one_threshold()
+        return [(count, sql) for sql, count in self.shapes.most_common() if count >= threshold]
+
+
+def server_timing_for(user):
+    """Whether a response to ``user`` carries the Server-Timing header"""
+    audience = getattr(settings, 'PERF_SERVER_TIMING', True)
+    if audience == 'staff':
+        return user is not None and user.is_staff
+    return bool(audience)
+
+
+def describe_query(sql):
+    match = TABLE_RE.search(sql)
+    return f"{sql.split(None, 1)[0].upper()} {match.group(1) if match else '?'}"
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_time += time.perf_counter() - started
+        stats.queries += 1
+        # Parameters are bound separately, so one query shape is one SQL string
+        stats.shapes[sql] += 1
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, timing each top-level render"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+def record_sample(view_name, total, stats):
+    suspects = stats.suspected_n_plus_one()
+    sample = (total, stats.sql_time, stats.template_time, stats.queries, len(suspects))
+    with _samples_lock:
+        samples = _samples[view_name]
+        samples.append(sample)
+        while len(samples) > window():
+            samples.popleft()
+        if suspects:
+            _suspects[view_name] = [(count, describe_query(sql), sql) for count, sql in suspects]
+    if suspects:
+        logger.warning(
+            'Suspected N+1 in %s: %s', view_name,
+            ', '.join(f'{count}x {describe_query(sql)}' for count, sql in suspects),
+        )
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def view_stats():
+    """Rolling percentiles per URL name, slowest p95 first (times in ms)"""
+    with _samples_lock:
+        snapshot = {name: list(samples) for name, samples in _samples.items() if samples}
+        suspects = dict(_suspects)
+    rows = []
+    for name, samples in snapshot.items():
+        totals, sql_times, template_times, queries, flagged = zip(*samples)
+        rows.append({
+            'view': name,
+            'requests': len(samples),
+            'p50_ms': percentile(totals, 50) * 1000,
+            'p95_ms': percentile(totals, 95) * 1000,
+            'p99_ms': percentile(totals, 99) * 1000,
+            'sql_p95_ms': percentile(sql_times, 95) * 1000,
+            'template_p95_ms': percentile(template_times, 95) * 1000,
+            'queries_avg': sum(queries) / len(queries),
+            'queries_max': max(queries),
+            'n_plus_one_requests': sum(1 for count in flagged if count),
+            'suspects': suspects.get(name, []),
+        })
+    rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return rows
+
+
+def reset_stats():
+    with _samples_lock:
+        _samples.clear()
+        _suspects.clear()
+
+
+class PerformanceMiddleware:
+    """Time each request and report it in Server-Timing and the rolling per-view stats"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_INSTRUMENTATION', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timing = self.finish(request, stats, time.perf_counter() - started)
+        if timing and server_timing_for(getattr(request, 'user', None)):
+            response.headers['Server-Timing'] = timing
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        timing = self.finish(request, stats, time.perf_counter() - started)
+        if timing and server_timing_for(await request.auser() if hasattr(request, 'auser') else None):
+            response.headers['Server-Timing'] = timing
+        return response
+
+    @staticmethod
+    def finish(request, stats, total):
+        """Record the request; returns its Server-Timing value (None if it is not recorded)"""
+        match = getattr(request, 'resolver_match', None)
+        if match is None or not match.view_name:
+            # Static files, unknown URLs
+            return None
+        record_sample(match.view_name, total, stats)
+        timings = [
+            f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries"',
+            f'tpl;dur={stats.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        suspects = stats.suspected_n_plus_one()
+        if suspects:
+            count, sql = suspects[0]
+            timings.append(f'nplus1;desc="{count}x {describe_query(sql)}"')
+        return ', '.join(timings)
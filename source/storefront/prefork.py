@@ -0,0 +1,389 @@
+"""
+Pre-fork application server for production (``manage.py serve``).
+
+The master process sets up Django and loads everything a worker would
+otherwise load on its first requests: the WSGI/ASGI application and its
+middleware, the URL resolver, the ML models, AuroBot's intent table and
+product search index, compiled templates, the static files manifest and the
+most popular products in the product cache. It then closes its database
+connections, moves everything loaded so far out of the garbage collector's
+reach (``gc.freeze()``, so collections do not write to those pages) and forks
+the workers. They all share those pages copy-on-write, so each worker only
+costs the memory it writes to itself.
+
+Every worker accepts connections on the same listening socket. WSGI workers
+handle them on a fixed pool of ``SERVER_THREADS`` threads, so each thread
+keeps its database connection between requests (``CONN_MAX_AGE``). A worker
+only accepts a connection when one of its threads is free, leaving the rest
+to idle workers. Connections are closed after each response, so put a
+buffering reverse proxy (nginx) in front for slow clients and keep-alive.
+With ``--asgi``, workers run the ASGI application under uvicorn, which must
+be installed.
+
+``SERVER_WORKERS`` defaults to one worker per available CPU. A worker exits
+after ``SERVER_MAX_REQUESTS`` requests (plus up to
+``SERVER_MAX_REQUESTS_JITTER``, so they do not all restart together) and
+the master forks a fresh one, which bounds memory growth from leaks or
+fragmentation. The master also replaces workers that crash. SIGTERM or
+SIGINT stops the workers gracefully, within ``SERVER_GRACEFUL_TIMEOUT``.
+Before exiting, a worker sends the restock emails and image jobs its
+requests queued and writes its coalesced sessions to the database.
+
+A new worker first catches its copy of the search index up with the
+products changed since the master built it; after that, every search does
+(storefront/product_search.py).
+
+Per-process state stays per worker: rate-limit load shedding counts the
+requests of its own worker, the live order feed only sees its worker's
+orders, and the product cache and sessions are only shared between workers
+when their caches are (as in the production settings).
+"""
+
+import gc
+import logging
+import os
+import random
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.db import connections
+
+logger = logging.getLogger('storefront.prefork')
+
+# A worker that fails before serving stops the master instead of being restarted forever
+WORKER_BOOT_ERROR = 3
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def default_workers():
+    """One worker per CPU this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _timed(steps, label, load):
+    started = time.perf_counter()
+    try:
+        detail = load()
+    except Exception as e:
+        logger.warning('Preloading %s failed: %s', label, e)
+        detail = f'failed: {e}'
+    steps.append((label, (time.perf_counter() - started) * 1000, detail))
+
+
+def preload_templates():
+    """Compile the project's templates; kept by the cached template loader"""
+    from django.apps import apps
+    from django.template import TemplateSyntaxError, engines
+
+    base_dir = Path(settings.BASE_DIR).resolve()
+    roots = [Path(directory) for engine in settings.TEMPLATES for directory in engine.get('DIRS', [])]
+    roots += [Path(app.path) / 'templates' for app in apps.get_app_configs()
+              if Path(app.path).resolve().is_relative_to(base_dir)]
+    compiled = 0
+    for engine in engines.all():
+        for root in roots:
+            for path in root.rglob('*.html'):
+                try:
+                    engine.get_template(path.relative_to(root).as_posix())
+                    compiled += 1
+                except TemplateSyntaxError as e:
+                    logger.warning('Template %s does not compile: %s', path, e)
+    return f'{compiled} templates'
+
+
+def preload_products():
+    """Fill the product cache with the products listing pages show most"""
+    from . import product_cache
+    from .models import Product
+
+    limit = setting('SERVER_PRELOAD_PRODUCTS', 1000)
+    ids = list(Product.objects.filter(stock__gt=0).order_by('-rating', '-id').values_list('id', flat=True)[:limit])
+    return f'{len(product_cache.get_products(ids))} products'
+
+
+def preload_search():
+    from . import product_search
+    from .intents import get_engine
+
+    get_engine().current()
+    index = product_search.get_index()
+    return f'{len(index) if index is not None else 0} products indexed'
+
+
+def start_worker():
+    """
+    Bring a new worker up to date with what changed since the master
+    preloaded: the search index is a snapshot of that moment.
+    """
+    from . import product_search
+
+    try:
+        product_search.refresh_index()
+    except Exception:
+        logger.exception('Worker %d could not catch up the search index', os.getpid())
+
+
+def finish_worker():
+    """
+    Finish the work this worker's requests queued. Workers leave through
+    os._exit, which skips atexit handlers and kills background threads.
+    """
+    from . import images, restock, sessions
+
+    for label, finish in [
+        ('restock emails', restock.shutdown_executor),
+        ('image derivatives', images.shutdown_executor),
+        ('sessions', sessions.flush_dirty_sessions),
+    ]:
+        try:
+            finish()
+        except Exception:
+            logger.exception('Worker %d could not finish its %s', os.getpid(), label)
+
+
+def preload_static_manifest():
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None)
+    return f'{len(hashed_files)} hashed files' if hashed_files is not None else 'no manifest'
+
+
+def preload(asgi=False):
+    """
+    Load the application and everything its first requests would load.
+    Returns (application, steps), where steps are (label, ms, detail).
+    """
+    from django.urls import get_resolver
+    from django.utils.module_loading import import_string
+
+    from .ml import MODEL_FILES, get_model
+
+    steps = []
+    application = None
+
+    def load_application():
+        nonlocal application
+        if asgi:
+            application = import_string(setting('ASGI_APPLICATION', 'auroramart.asgi.application'))
+        else:
+            application = import_string(settings.WSGI_APPLICATION)
+        return 'ASGI' if asgi else 'WSGI'
+
+    _timed(steps, 'application', load_application)
+    _timed(steps, 'URL resolver', lambda: f'{len(get_resolver().namespace_dict)} namespaces')
+    _timed(steps, 'ML models', lambda: f'{sum(get_model(name) is not None for name in MODEL_FILES)} loaded')
+    _timed(steps, 'AuroBot intents and search index', preload_search)
+    _timed(steps, 'templates', preload_templates)
+    _timed(steps, 'static manifest', preload_static_manifest)
+    _timed(steps, 'product cache', preload_products)
+    if application is None:
+        raise RuntimeError('The application could not be loaded')
+
+    # Workers must not share the master's database connections
+    connections.close_all()
+    gc.collect()
+    # Keep the collector from touching (and so copying) the preloaded objects in every worker
+    gc.freeze()
+    return application, steps
+
+
+def bind(host, port, backlog=2048):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    # Workers race for connections: whoever loses gets BlockingIOError instead of waiting
+    sock.setblocking(False)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PoolWSGIServer(WSGIServer):
+    """
+    A worker's WSGI server: accepts on an inherited socket and handles each
+    connection on a fixed thread pool, for at most ``max_requests`` requests.
+    """
+
+    def __init__(self, sock, application, threads, max_requests, timeout):
+        super().__init__(sock.getsockname()[:2], WSGIRequestHandler, bind_and_activate=False,
+                         ipv6=sock.family == socket.AF_INET6)
+        self.socket.close()
+        self.socket = sock
+        host, port = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(application)
+        self.threads = threads
+        self.max_requests = max_requests
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        self.free = threading.BoundedSemaphore(threads)
+        self.stopping = threading.Event()
+        self.handled = 0
+
+    def serve(self):
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.socket, selectors.EVENT_READ)
+            while not self.stopping.is_set() and self.handled < self.max_requests:
+                # Only take a connection when a thread can start on it now
+                if not self.free.acquire(timeout=0.5):
+                    continue
+                if not selector.select(0.5):
+                    self.free.release()
+                    continue
+                try:
+                    request, client_address = self.socket.accept()
+                except (BlockingIOError, InterruptedError):
+                    # Another worker took it
+                    self.free.release()
+                    continue
+                request.setblocking(True)
+                request.settimeout(self.timeout)
+                self.handled += 1
+                self.pool.submit(self.handle_connection, request, client_address)
+        self.pool.shutdown(wait=True)
+
+    def handle_connection(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.free.release()
+
+
+def run_wsgi_worker(application, sock, max_requests):
+    server = PoolWSGIServer(sock, application, setting('SERVER_THREADS', 4), max_requests,
+                            setting('SERVER_TIMEOUT', 30))
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stopping.set())
+    server.serve()
+
+
+def run_asgi_worker(application, sock, max_requests):
+    import uvicorn
+
+    config = uvicorn.Config(
+        application, lifespan='off', limit_max_requests=max_requests, log_level='warning',
+        timeout_graceful_shutdown=setting('SERVER_GRACEFUL_TIMEOUT', 30),
+        timeout_keep_alive=5,
+    )
+    sock.setblocking(True)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Master:
+    """Forks the workers and keeps their number up until told to stop"""
+
+    def __init__(self, application, sock, workers, max_requests, jitter, asgi=False):
+        self.application = application
+        self.sock = sock
+        self.workers = workers
+        self.max_requests = max_requests
+        self.jitter = jitter
+        self.asgi = asgi
+        self.children = {}
+        self.stopping = False
+        self.exit_code = 0
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        try:
+            while not self.stopping:
+                while len(self.children) < self.workers and not self.stopping:
+                    self.spawn()
+                self.reap()
+                time.sleep(0.2)
+        finally:
+            self.shutdown()
+        return self.exit_code
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def spawn(self):
+        # Each worker restarts after its own limit so they do not all restart at once
+        max_requests = self.max_requests + random.randint(0, self.jitter) if self.max_requests else sys.maxsize
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        # Worker process: never returns
+        code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            start_worker()
+            if self.asgi:
+                run_asgi_worker(self.application, self.sock, max_requests)
+            else:
+                run_wsgi_worker(self.application, self.sock, max_requests)
+        except Exception:
+            logger.exception('Worker %d failed', os.getpid())
+            code = WORKER_BOOT_ERROR
+        finally:
+            # Recycled or stopped: write back sessions and send queued emails first
+            finish_worker()
+            connections.close_all()
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if not pid:
+                return
+            self.children.pop(pid, None)
+            code = os.waitstatus_to_exitcode(status)
+            if code == WORKER_BOOT_ERROR:
+                logger.error('Worker %d could not start; stopping', pid)
+                self.exit_code = 1
+                self.stopping = True
+            elif self.stopping:
+                continue
+            elif code:
+                logger.warning('Worker %d exited with %d; starting a new one', pid, code)
+            else:
+                logger.info('Worker %d recycled', pid)
+
+    def shutdown(self):
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + setting('SERVER_GRACEFUL_TIMEOUT', 30)
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            logger.warning('Worker %d did not stop in time; killing it', pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.children.clear()
+        self.sock.close()
@@ -0,0 +1,167 @@
+"""
+Read-through cache for ``Product`` rows.
+
+``get_product`` and ``get_products`` serve products from the cache named by
+``PRODUCT_CACHE_ALIAS`` and load misses from the database in one batched
+query. Entries are dropped whenever a product is saved or deleted, or is
+changed by ``Product.objects.filter(...).update(...)`` (e.g. the ``F()``
+stock decrements at checkout). They are dropped right away and again once
+the surrounding transaction commits.
+
+Only one caller rebuilds a missing key at a time; others wait briefly for it
+(stampede protection). Every fill holds a token, which an invalidation
+deletes. The token is checked before the row is written and again after, so
+a fill that raced with an invalidation never leaves the old row cached.
+Fills read the primary: a replica's row may be minutes old, and the cache
+would share it with every client. Hit/miss counters are kept per process;
+see ``stats()``.
+"""
+
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Product, products_updated
+
+KEY_PREFIX = 'product:'
+LOCK_PREFIX = 'product-fill:'
+# How long a fill may hold a key, and how long others wait for it
+LOCK_TIMEOUT = 5
+WAIT_TIMEOUT = 0.5
+WAIT_INTERVAL = 0.01
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'fills': 0, 'waits': 0, 'wait_hits': 0, 'invalidations': 0}
+
+
+def get_cache():
+    return caches[getattr(settings, 'PRODUCT_CACHE_ALIAS', 'default')]
+
+
+def product_key(product_id):
+    return f'{KEY_PREFIX}{product_id}'
+
+
+def lock_key(product_id):
+    return f'{LOCK_PREFIX}{product_id}'
+
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+
+
+def stats():
+    """Counters for this process, plus the hit ratio"""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    lookups = snapshot['hits'] + snapshot['misses']
+    snapshot['hit_ratio'] = snapshot['hits'] / lookups if lookups else 0.0
+    return snapshot
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def get_product(product_id):
+    """The product with this id, or None"""
+    return get_products([product_id]).get(int(product_id))
+
+
+def get_products(product_ids):
+    """{id: Product} for the ids that exist, in one cache round trip plus at most one query"""
+    ids = list(dict.fromkeys(int(i) for i in product_ids))
+    if not ids:
+        return {}
+    cache = get_cache()
+    found = cache.get_many([product_key(i) for i in ids])
+    products = {product.pk: product for product in found.values()}
+    missing = [i for i in ids if i not in products]
+    _count(hits=len(products), misses=len(missing))
+    if not missing:
+        return products
+
+    # Stampede protection: whoever adds the lock loads the key, everyone else waits for it
+    token = uuid.uuid4().hex
+    mine = [i for i in missing if cache.add(lock_key(i), token, LOCK_TIMEOUT)]
+    waiting = [i for i in missing if i not in set(mine)]
+    if waiting:
+        products.update(_wait_for(cache, waiting))
+        # Give up on keys nobody filled in time and load them ourselves (without caching)
+        mine_uncached = [i for i in waiting if i not in products]
+    else:
+        mine_uncached = []
+
+    if mine:
+        products.update(_fill(cache, mine, token))
+    if mine_uncached:
+        products.update(Product.objects.in_bulk(mine_uncached))
+    return products
+
+
+def _fill(cache, ids, token):
+    loaded = Product.objects.using(DEFAULT_DB_ALIAS).in_bulk(ids)
+    locks = cache.get_many([lock_key(i) for i in ids])
+    # Skip keys invalidated while we were reading (their lock is gone or re-taken)
+    fresh = [pk for pk in loaded if locks.get(lock_key(pk)) == token]
+    if fresh:
+        cache.set_many({product_key(pk): loaded[pk] for pk in fresh})
+        # An invalidation between the check above and the write took the lock: take our write back
+        locks.update({lock_key(pk): None for pk in fresh})
+        locks.update(cache.get_many([lock_key(pk) for pk in fresh]))
+        stale = [pk for pk in fresh if locks[lock_key(pk)] != token]
+        if stale:
+            cache.delete_many([product_key(pk) for pk in stale])
+            fresh = [pk for pk in fresh if pk not in stale]
+    cache.delete_many([lock_key(i) for i in ids if locks.get(lock_key(i)) == token])
+    _count(fills=len(fresh))
+    return loaded
+
+
+def _wait_for(cache, ids):
+    _count(waits=len(ids))
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    products = {}
+    pending = list(ids)
+    while pending and time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        found = cache.get_many([product_key(i) for i in pending])
+        for product in found.values():
+            products[product.pk] = product
+        pending = [i for i in pending if i not in products]
+    _count(wait_hits=len(products))
+    return products
+
+
+def invalidate_products(product_ids):
+    """Drop cached entries (and pending fills) for these products"""
+    ids = list(product_ids)
+    if not ids:
+        return
+    keys = [product_key(i) for i in ids] + [lock_key(i) for i in ids]
+    cache = get_cache()
+    cache.delete_many(keys)
+    _count(invalidations=len(ids))
+    # Readers may have cached the old row before this transaction committed
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+@receiver(products_updated, sender=Product)
+def products_bulk_updated(sender, ids, **kwargs):
+    invalidate_products(ids)
@@ -0,0 +1,361 @@
+"""
+Product retrieval for AuroBot.
+
+``search`` ranks products for a free-text question by TF-IDF cosine
+similarity over their name (counted twice), category and description. The
+index is built once: from ``PRODUCT_SEARCH_INDEX`` if ``manage.py
+build_search_index`` has written it, otherwise from the database on first use.
+Only products changed since then are re-read. Queries never touch the
+database. ``suggest_products`` adds live price and stock from the product
+cache (``product_cache.get_products``). It never waits for the build: until
+the index is ready (a background thread loads it on the first question,
+unless ``manage.py serve`` preloaded it), AuroBot answers from its intents
+alone.
+
+Saved products are re-vectorised in this process once their transaction
+commits, and held in a small delta matrix that is searched next to the main
+one. Deleted products are masked out. The delta is folded into the main
+matrix once it grows past ``DELTA_LIMIT`` rows. The vocabulary and IDF weights
+only change on a full rebuild, so words first seen after the build are
+ignored until then. Every committed change to a name, description or
+category (not stock or price saves) also bumps a version in the default
+cache (shared by all workers in production). Before searching, a process
+whose index has seen an older version re-reads the products updated since
+its last catch-up (``sync_index``), so changes made elsewhere are searchable
+on its next question. Products deleted by another process stay in
+its index until the next load, but ``suggest_products`` drops them. Prices and
+stock are always live, because they come from the product cache.
+
+scikit-learn, SciPy and NumPy are imported only when the index is first
+needed (see ``storefront.ml``).
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Product, products_updated
+from .product_cache import get_products
+
+logger = logging.getLogger('storefront.product_search')
+
+TEXT_FIELDS = Product.TEXT_FIELDS
+DELTA_LIMIT = 2000
+MIN_SCORE = 0.15
+VERSION_KEY = 'product-search-version'
+# A catch-up re-reads this far back, for changes whose transaction committed after it ran
+SYNC_OVERLAP = timedelta(seconds=60)
+
+_index = None
+_index_lock = threading.Lock()
+# Thread building the index for ready_index()
+_loader = None
+
+
+def document(name, description, category):
+    # A word in the name matters more than one in the description
+    return f"{name} {name} {category} {description or ''}"
+
+
+def index_path():
+    return getattr(settings, 'PRODUCT_SEARCH_INDEX', os.path.join(settings.BASE_DIR, 'ml_models', 'product_index.joblib'))
+
+
+class ProductIndex:
+    def __init__(self, vectorizer, ids, matrix, built_at):
+        import numpy as np
+
+        self.vectorizer = vectorizer
+        self.built_at = built_at
+        # Changes up to synced_at (and text version ``version``) have been applied
+        self.synced_at = built_at
+        self.version = None
+        self.lock = threading.Lock()
+        self._set_base(np.asarray(ids, dtype=np.int64), matrix.tocsr())
+
+    def _set_base(self, ids, matrix):
+        import numpy as np
+
+        self.ids = ids
+        self.matrix = matrix
+        # Term -> products, so a query only touches the products sharing a word with it
+        self.postings = matrix.T.tocsr()
+        self.live = np.ones(len(ids), dtype=bool)
+        self.row_of = {int(pid): row for row, pid in enumerate(ids)}
+        self.delta = {}
+        self.delta_ids = None
+        self.delta_matrix = None
+
+    @classmethod
+    def build(cls, rows):
+        """Index (id, name, description, category) rows"""
+        import numpy as np
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        ids, documents = [], []
+        for pid, name, description, category in rows:
+            ids.append(pid)
+            documents.append(document(name, description, category))
+        vectorizer = TfidfVectorizer(stop_words='english', sublinear_tf=True, dtype=np.float32)
+        matrix = vectorizer.fit_transform(documents)
+        return cls(vectorizer, ids, matrix, timezone.now())
+
+    def __getstate__(self):
+        return {'vectorizer': self.vectorizer, 'ids': self.ids, 'matrix': self.matrix, 'built_at': self.built_at}
+
+    def __setstate__(self, state):
+        self.__init__(state['vectorizer'], state['ids'], state['matrix'], state['built_at'])
+
+    def __len__(self):
+        return int(self.live.sum()) + len(self.delta)
+
+    def update(self, rows):
+        """Re-vectorise changed or new (id, name, description, category) rows"""
+        rows = list(rows)
+        if not rows:
+            return
+        vectors = self.vectorizer.transform([document(*row[1:]) for row in rows])
+        with self.lock:
+            for (pid, *_), vector in zip(rows, vectors):
+                row = self.row_of.get(pid)
+                if row is not None:
+                    self.live[row] = False
+                self.delta[pid] = vector
+            self.delta_ids = None
+            if len(self.delta) > DELTA_LIMIT:
+                self._fold()
+
+    def remove(self, ids):
+        with self.lock:
+            for pid in ids:
+                row = self.row_of.get(pid)
+                if row is not None:
+                    self.live[row] = False
+                if self.delta.pop(pid, None) is not None:
+                    self.delta_ids = None
+
+    def _fold(self):
+        import numpy as np
+        from scipy import sparse
+
+        pids = list(self.delta)
+        ids = np.concatenate([self.ids[self.live], np.asarray(pids, dtype=np.int64)])
+        matrix = sparse.vstack([self.matrix[self.live], sparse.vstack([self.delta[pid] for pid in pids])])
+        self._set_base(ids, matrix.tocsr())
+
+    def search(self, query, k=5, min_score=MIN_SCORE):
+        """[(product id, score)], best first"""
+        import numpy as np
+        from scipy import sparse
+
+        q = self.vectorizer.transform([query])
+        if not q.nnz:
+            return []
+        with self.lock:
+            # Cosine similarity: rows are L2-normalised, so it is the dot product
+            scores = (sparse.csr_matrix(q.data) @ self.postings[q.indices]).tocsr()
+            rows, values = scores.indices, scores.data
+            keep = self.live[rows] & (values >= min_score)
+            candidate_ids, candidate_scores = self.ids[rows[keep]], values[keep]
+            if self.delta:
+                if self.delta_ids is None:
+                    self.delta_ids = np.asarray(list(self.delta), dtype=np.int64)
+                    self.delta_matrix = sparse.vstack(list(self.delta.values())).tocsr()
+                delta_scores = (self.delta_matrix @ q.T).toarray().ravel()
+                keep = delta_scores >= min_score
+                candidate_ids = np.concatenate([candidate_ids, self.delta_ids[keep]])
+                candidate_scores = np.concatenate([candidate_scores, delta_scores[keep]])
+        if len(candidate_ids) > k:
+            top = np.argpartition(-candidate_scores, k)[:k]
+            candidate_ids, candidate_scores = candidate_ids[top], candidate_scores[top]
+        order = np.argsort(-candidate_scores, kind='stable')
+        return [(int(candidate_ids[i]), float(candidate_scores[i])) for i in order]
+
+    def save(self, path):
+        import joblib
+
+        joblib.dump(self, path)
+
+
+def text_rows(queryset):
+    return queryset.values_list('id', *TEXT_FIELDS).iterator(chunk_size=5000)
+
+
+def build_index():
+    """A fresh index of every product, or None for an empty catalog"""
+    if not Product.objects.exists():
+        return None
+    return ProductIndex.build(text_rows(Product.objects.all()))
+
+
+def load_index():
+    """The saved index brought up to date, or a newly built one"""
+    path = index_path()
+    if os.path.exists(path):
+        try:
+            import joblib
+
+            index = joblib.load(path)
+            index.update(text_rows(Product.objects.filter(updated_at__gte=index.built_at)))
+            return index
+        except Exception as e:
+            logger.warning('Rebuilding the product search index: cannot load %s: %s', path, e)
+    started = time.perf_counter()
+    index = build_index()
+    if index is not None:
+        logger.info('Built product search index of %d products in %.1fs', len(index), time.perf_counter() - started)
+    return index
+
+
+def get_version():
+    """The current text version of the catalog (bumped on every committed text change)"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a cache restart never reuses an old version
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Gone from the cache: the next reader seeds a new one, which also differs
+        pass
+
+
+def sync_index(index):
+    """Apply text changes made by other processes since this index last caught up"""
+    version = get_version()
+    if version == index.version:
+        return
+    started = timezone.now()
+    index.update(text_rows(Product.objects.filter(updated_at__gte=index.synced_at - SYNC_OVERLAP).order_by()))
+    index.synced_at, index.version = started, version
+
+
+def get_index():
+    """The index, loading it first if needed (blocks; see ``ready_index`` for requests)"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                # Read before loading, so changes committed during the load are caught up later
+                version = get_version()
+                index = load_index()
+                if index is not None:
+                    index.version = version
+                _index = index
+    return _index
+
+
+def ready_index():
+    """The index if it is loaded; otherwise start loading it in the background and return None"""
+    global _loader
+    if _index is None:
+        with _index_lock:
+            if _index is None and (_loader is None or not _loader.is_alive()):
+                _loader = threading.Thread(target=_load_in_background, name='search-index-loader', daemon=True)
+                _loader.start()
+    return _index
+
+
+def _load_in_background():
+    try:
+        get_index()
+    except Exception:
+        logger.exception('Error loading the product search index')
+    finally:
+        connections.close_all()
+
+
+def refresh_index():
+    """Catch the loaded index up, if there is one (a worker forked from a process that loaded it)"""
+    if _index is not None:
+        sync_index(_index)
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def search(query, k=5, index=None):
+    if index is None:
+        index = get_index()
+    if index is None:
+        return []
+    sync_index(index)
+    return index.search(query, k=k)
+
+
+def suggest_products(query, k=3):
+    """
+    Matching products with live price and stock, in-stock ones first. None
+    until the index has loaded: a question never waits for the build.
+    """
+    index = ready_index()
+    if index is None:
+        return []
+    ranked = search(query, k=k * 2, index=index)
+    products = get_products(pid for pid, _ in ranked)
+    suggestions = [
+        {
+            'id': pid,
+            'name': products[pid].name,
+            'url': reverse('storefront:product_detail', args=[pid]),
+            'price': str(products[pid].get_current_price()),
+            'stock': products[pid].stock,
+        }
+        for pid, _ in ranked if pid in products
+    ]
+    suggestions.sort(key=lambda s: s['stock'] <= 0)
+    return suggestions[:k]
+
+
+def _reindex(ids):
+    if _index is not None:
+        _index.update(text_rows(Product.objects.filter(pk__in=ids)))
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(TEXT_FIELDS):
+        return
+    text = tuple(instance.__dict__.get(field) for field in TEXT_FIELDS)
+    if not created and text == getattr(instance, '_loaded_text', None):
+        # Stock, price or rating only (checkout): nothing searchable changed
+        return
+    instance._loaded_text = text
+    if _index is not None:
+        row = (instance.pk, *text)
+        transaction.on_commit(lambda: _index is not None and _index.update([row]))
+    transaction.on_commit(bump_version)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    if _index is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: _index is not None and _index.remove([pk]))
+
+
+@receiver(products_updated, sender=Product)
+def products_bulk_updated(sender, ids, fields=None, **kwargs):
+    # Stock and price updates (checkout) do not change what is searchable
+    if fields is None or set(fields) & set(TEXT_FIELDS):
+        if _index is not None:
+            transaction.on_commit(lambda: _reindex(ids))
+        transaction.on_commit(bump_version)
@@ -0,0 +1,240 @@
+"""
+Rate limiting and load shedding for expensive views.
+
+``RATE_LIMITS`` maps URL names to a token bucket per user (or per client IP
+for anonymous requests)::
+
+    RATE_LIMITS = {
+        'storefront:aurabot_reply': {'rate': '30/m', 'burst': 10, 'priority': 'low'},
+        'accounts:login': {'rate': '10/m', 'burst': 10, 'methods': ['POST'], 'priority': 'high'},
+    }
+
+A bucket holds up to ``burst`` tokens and refills at ``rate`` (per s, m or
+h). Each request takes one token. An empty bucket gets a 429 with
+``Retry-After``, before the view runs.
+
+Buckets have to be shared by every worker process. With
+``RATE_LIMIT_SHARED_FILE`` set (production), they live in a memory-mapped
+table in that file, updated under an exclusive lock, so the check is atomic
+and costs a few microseconds. Otherwise they live in the ``RATE_LIMIT_CACHE``
+cache (development). That is shared only if the cache is, and its
+read-then-write lets racing requests occasionally get an extra token.
+
+Load shedding protects the worker itself. ``LOAD_SHED_LIMITS`` caps how many
+requests this process may have in flight before new requests of that
+priority get a 503 with ``Retry-After``. Low-priority views are shed first,
+then normal ones (every view not in ``RATE_LIMITS``). High-priority views are
+never shed. An entry without a rate only sets the priority.
+"""
+
+import functools
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+logger = logging.getLogger('storefront.ratelimit')
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+DEFAULT_PRIORITY = 'normal'
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'30/m' -> tokens per second"""
+    count, _, period = rate.partition('/')
+    return int(count) / PERIODS[period[:1] or 's']
+
+
+def get_cache():
+    return caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+
+
+class CacheBuckets:
+    """Buckets as (tokens, updated) cache entries"""
+
+    def take(self, key, rate, burst, now):
+        cache = get_cache()
+        tokens, updated = cache.get(key) or (burst, now)
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            # Kept until the bucket would be full again anyway
+            cache.set(key, (tokens - 1, now), math.ceil(burst / rate) + 1)
+            return 0
+        return (1 - tokens) / rate
+
+
+class SharedMemoryBuckets:
+    """
+    Buckets in a fixed-size hash table in a memory-mapped file shared by all
+    workers. Each slot holds (key hash, tokens, updated, full_at), where
+    full_at is when the bucket will have refilled completely. From then on the
+    slot can be reused, because a full bucket is the same as no bucket. If
+    every slot within PROBES of a key is still live, the one closest to full
+    is reused.
+    """
+
+    SLOT = struct.Struct('<Qddd')
+    PROBES = 8
+
+    def __init__(self, path, slots=65536):
+        import fcntl
+
+        self.fcntl = fcntl
+        self.slots = slots
+        size = slots * self.SLOT.size
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size != size:
+            os.ftruncate(self.fd, size)
+        self.table = mmap.mmap(self.fd, size)
+        # flock is per open file, so threads of this process also need a lock
+        self.lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        first = key_hash % self.slots
+        with self.lock:
+            self.fcntl.flock(self.fd, self.fcntl.LOCK_EX)
+            try:
+                offset, tokens, updated = self.find(key_hash, first, now)
+                if updated is None:
+                    tokens = burst
+                else:
+                    tokens = min(burst, tokens + (now - updated) * rate)
+                if tokens < 1:
+                    return (1 - tokens) / rate
+                tokens -= 1
+                self.SLOT.pack_into(self.table, offset, key_hash, tokens, now, now + (burst - tokens) / rate)
+                return 0
+            finally:
+                self.fcntl.flock(self.fd, self.fcntl.LOCK_UN)
+
+    def find(self, key_hash, first, now):
+        """(offset, tokens, updated) of the key's slot; updated is None for a new bucket"""
+        reuse = None
+        reuse_full_at = math.inf
+        for probe in range(self.PROBES):
+            offset = (first + probe) % self.slots * self.SLOT.size
+            slot_hash, tokens, updated, full_at = self.SLOT.unpack_from(self.table, offset)
+            if slot_hash == key_hash:
+                return offset, tokens, updated
+            if full_at < reuse_full_at:
+                reuse, reuse_full_at = offset, full_at
+        if reuse_full_at > now:
+            logger.warning('Rate-limit table is full; raise RATE_LIMIT_SHARED_SLOTS')
+        return reuse, None, None
+
+
+@functools.lru_cache(maxsize=None)
+def _store(path, slots):
+    if path is None:
+        return CacheBuckets()
+    return SharedMemoryBuckets(path, slots)
+
+
+def get_store():
+    path = getattr(settings, 'RATE_LIMIT_SHARED_FILE', None)
+    return _store(path and str(path), getattr(settings, 'RATE_LIMIT_SHARED_SLOTS', 65536))
+
+
+def take_token(key, rate, burst, now=None):
+    """Take a token from the bucket; returns 0 if allowed, else seconds until a token is available"""
+    return get_store().take(key, rate, burst, time.time() if now is None else now)
+
+
+def client_id(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    header = getattr(settings, 'RATE_LIMIT_CLIENT_IP_HEADER', None)
+    if header and request.META.get(header):
+        # e.g. HTTP_X_FORWARDED_FOR behind a trusted proxy: the first address is the client
+        return f"ip:{request.META[header].split(',')[0].strip()}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def inflight():
+    """Requests being handled by this process"""
+    return _inflight
+
+
+def too_busy(status, message, retry_after):
+    response = HttpResponse(message, status=status, content_type='text/plain')
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class RateLimitMiddleware:
+    """Token-bucket limits per URL name, and load shedding by priority"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.enter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.leave()
+
+    async def __acall__(self, request):
+        self.enter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.leave()
+
+    @staticmethod
+    def enter():
+        global _inflight
+        with _inflight_lock:
+            _inflight += 1
+
+    @staticmethod
+    def leave():
+        global _inflight
+        with _inflight_lock:
+            _inflight -= 1
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_name = request.resolver_match.view_name
+        limit = getattr(settings, 'RATE_LIMITS', {}).get(view_name)
+        priority = limit.get('priority', DEFAULT_PRIORITY) if limit else DEFAULT_PRIORITY
+
+        shed_at = getattr(settings, 'LOAD_SHED_LIMITS', {}).get(priority)
+        if shed_at is not None and _inflight > shed_at:
+            logger.warning('Shedding %s request to %s: %d requests in flight', priority, view_name, _inflight)
+            return too_busy(503, 'The store is busy right now, please try again shortly.',
+                            getattr(settings, 'LOAD_SHED_RETRY_AFTER', 1))
+
+        if limit is None or 'rate' not in limit or request.method not in limit.get('methods', (request.method,)):
+            return None
+        wait = take_token(f'ratelimit:{view_name}:{client_id(request)}', parse_rate(limit['rate']), limit['burst'])
+        if wait:
+            logger.info('Rate limited %s on %s', client_id(request), view_name)
+            return too_busy(429, 'Too many requests, please slow down.', wait)
+        return None
@@ -0,0 +1,178 @@
+"""
+"Back in stock" emails for favorites with ``notify_when_available``.
+
+A product is restocked when its stock goes from zero (or below) to positive.
+This is caught for:
+
+- ``Product.save()``, including the admin product form. The stock as loaded
+  is remembered by ``Product.from_db``.
+- ``Product.objects.filter(...).update(stock=...)``, via ``products_updated``.
+- Catalog imports, which call ``notify_restocked`` themselves.
+
+Once the change commits, the restocked ids go to a small thread pool, so an
+admin save never waits for the emails. Products are handled
+``RESTOCK_PRODUCT_BATCH`` at a time. Each batch reads its subscribers with
+one query on ``favorite_notify_idx``. The emails are then sent through
+Django's email backend ``RESTOCK_EMAIL_CHUNK`` at a time, one connection per
+chunk. Notifications are one-off. Before a chunk is sent, its favorites are
+claimed: ``notify_when_available`` is cleared in one transaction, and only
+the favorites that still had it are emailed. Two notifiers racing on the
+same product (two workers, or a save and a bulk update) therefore never
+send the same email twice. If sending fails, the chunk's flags are set
+again for the next restock; a crash between claim and send loses that
+chunk's emails rather than repeating them. A product that sells out again
+before the batch is reached is skipped.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from .models import Favorite, Product, products_updated
+
+logger = logging.getLogger('storefront.restock')
+
+_executor = None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'RESTOCK_NOTIFY_WORKERS', 1),
+            thread_name_prefix='restock-notify',
+        )
+    return _executor
+
+
+def shutdown_executor():
+    """Wait for queued notifications to be sent (a stopping server worker)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def restock_email(product, email, name):
+    url = getattr(settings, 'SITE_URL', '') + reverse('storefront:product_detail', args=[product.pk])
+    return EmailMessage(
+        subject=f'{product.name} is back in stock',
+        body=(
+            f'Hi {name},\n\n'
+            f'{product.name} is back in stock at AuroraMart (SGD ${product.get_current_price()}).\n'
+            f'{url}\n\n'
+            f"You're getting this because you asked to be told when it was available again."
+        ),
+        to=[email],
+    )
+
+
+def claim(favorite_ids):
+    """
+    Clear ``notify_when_available`` on those of these favorites that still
+    have it, and return their ids: the caller now owns their emails.
+    """
+    # SQLite ignores FOR UPDATE, but a concurrent claim cannot commit in between:
+    # one of two racing transactions fails to upgrade its lock instead
+    with transaction.atomic():
+        ids = set(
+            Favorite.objects.select_for_update()
+            .filter(id__in=favorite_ids, notify_when_available=True)
+            .values_list('id', flat=True)
+        )
+        if ids:
+            Favorite.objects.filter(id__in=ids).update(notify_when_available=False)
+    return ids
+
+
+def send_restock_notifications(product_ids):
+    """Email everyone waiting for these products; returns the number of emails sent"""
+    batch_size = getattr(settings, 'RESTOCK_PRODUCT_BATCH', 500)
+    chunk_size = getattr(settings, 'RESTOCK_EMAIL_CHUNK', 500)
+    sent = 0
+    for batch in chunked(sorted(set(product_ids)), batch_size):
+        products = Product.objects.filter(pk__in=batch, stock__gt=0).in_bulk()
+        if not products:
+            continue
+        subscribers = list(
+            Favorite.objects.filter(product_id__in=list(products), notify_when_available=True)
+            .exclude(user__email='')
+            .values_list('id', 'product_id', 'user__email', 'user__first_name', 'user__username')
+        )
+        for chunk in chunked(subscribers, chunk_size):
+            claimed = claim([row[0] for row in chunk])
+            messages = [
+                restock_email(products[product_id], email, first_name or username)
+                for favorite_id, product_id, email, first_name, username in chunk if favorite_id in claimed
+            ]
+            if not messages:
+                continue
+            try:
+                with get_connection() as connection:
+                    sent += connection.send_messages(messages) or 0
+            except Exception:
+                # Not sent: wait for the next restock instead
+                Favorite.objects.filter(id__in=claimed).update(notify_when_available=True)
+                raise
+    if sent:
+        logger.info('Sent %d restock notifications for %d products', sent, len(set(product_ids)))
+    return sent
+
+
+def _run_in_worker(product_ids):
+    try:
+        send_restock_notifications(product_ids)
+    except Exception:
+        logger.exception('Restock notifications failed for %d products', len(product_ids))
+    finally:
+        # Worker threads have their own DB connections
+        close_old_connections()
+
+
+def notify_restocked(product_ids):
+    """Queue notifications for products that just came back in stock, once the change is committed"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+
+    def submit():
+        if getattr(settings, 'RESTOCK_NOTIFY_WORKERS', 1) == 0:
+            # Synchronous mode (tests, management shells)
+            send_restock_notifications(product_ids)
+        else:
+            get_executor().submit(_run_in_worker, product_ids)
+
+    transaction.on_commit(submit)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, update_fields=None, **kwargs):
+    loaded = getattr(instance, '_loaded_stock', None)
+    stock = instance.stock
+    if not isinstance(stock, int) or (update_fields is not None and 'stock' not in update_fields):
+        # An F() expression or an unrelated partial save: stock is not known here
+        return
+    if loaded is not None and loaded <= 0 < stock:
+        notify_restocked([instance.pk])
+    instance._loaded_stock = stock
+
+
+@receiver(products_updated, sender=Product)
+def products_bulk_updated(sender, ids, out_of_stock=(), **kwargs):
+    if out_of_stock:
+        # Which of the ids that had no stock have some now (checked after the update)
+        restocked = Product.objects.filter(pk__in=out_of_stock, stock__gt=0).values_list('pk', flat=True)
+        notify_restocked(restocked)
@@ -0,0 +1,155 @@
+"""
+Read replica routing.
+
+``ReplicaRouter`` sends catalog reads (``REPLICA_MODELS``) to one of the
+aliases listed in ``DATABASE_REPLICAS``; every write and every other read goes
+to the primary. Orders stay on the primary: the dashboard's ETags change as
+soon as an order commits, so charts read from a replica would be cached under
+the new ETag with the old revenue. Replicas are only used inside safe
+(GET/HEAD) requests, which ``ReplicaRoutingMiddleware`` marks. Unsafe requests,
+code running outside a request, and any request that has already written stay
+on the primary.
+
+Each request reads from one replica, picked when it starts, so its reads all
+come from the same snapshot. A request has written once it runs an INSERT,
+UPDATE or DELETE on a replicated table (seen by a wrapper on every primary
+connection). Routing a query to the primary, as ``get_or_create`` does before
+finding its row, and writing sessions or carts do not count. After a request writes, the client gets a short-lived cookie that
+keeps its reads on the primary for ``REPLICA_STICKY_SECONDS``, so users read
+their own writes while the replicas catch up. Locally, the replicas are SQLite copies
+refreshed by ``manage.py snapshot_replicas``; see
+``auroramart.settings_production``.
+"""
+
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Models whose reads may be served slightly stale
+REPLICA_MODELS = {'storefront.product'}
+STICKY_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_state = Local()
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def replica_reads_allowed():
+    return getattr(_state, 'replica_ok', False) and not getattr(_state, 'wrote', False)
+
+
+@contextmanager
+def allow_replica_reads(allowed=True):
+    """Enable (or disable) replica reads for the enclosed block, all from one replica"""
+    previous = (getattr(_state, 'replica_ok', False), getattr(_state, 'wrote', False),
+                getattr(_state, 'replica', None))
+    replicas = get_replicas()
+    _state.replica_ok, _state.wrote = allowed, False
+    _state.replica = random.choice(replicas) if allowed and replicas else None
+    try:
+        yield
+    finally:
+        _state.replica_ok, _state.wrote, _state.replica = previous
+
+
+def pin_primary():
+    """Read everything from the primary inside the block"""
+    return allow_replica_reads(False)
+
+
+def replica_tables():
+    return [apps.get_model(label)._meta.db_table for label in REPLICA_MODELS]
+
+
+def record_writes(execute, sql, params, many, context):
+    """Connection execute wrapper: note that the current request changed data read from replicas"""
+    if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+        quote = context['connection'].ops.quote_name
+        if any(quote(table) in sql for table in replica_tables()):
+            # Later reads in this request (and, via the cookie, the next few) read their own writes
+            _state.wrote = True
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def watch_for_writes(sender, connection, **kwargs):
+    replicas = get_replicas()
+    if replicas and connection.alias not in replicas and record_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_writes)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, 'replica', None)
+        if replica and model._meta.label_lower in REPLICA_MODELS and replica_reads_allowed():
+            return replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in get_replicas():
+            # Objects loaded from a replica are saved to the primary
+            return DEFAULT_DB_ALIAS
+        # Otherwise Django's default: the primary, or the database of a related instance
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated directly
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Allow replica reads for safe requests that have not written recently"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with allow_replica_reads(self.replica_ok(request)):
+            response = self.get_response(request)
+            return self.finish(response)
+
+    async def __acall__(self, request):
+        with allow_replica_reads(self.replica_ok(request)):
+            response = await self.get_response(request)
+            return self.finish(response)
+
+    @staticmethod
+    def replica_ok(request):
+        return request.method in SAFE_METHODS and STICKY_COOKIE not in request.COOKIES
+
+    @staticmethod
+    def finish(response):
+        if getattr(_state, 'wrote', False):
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
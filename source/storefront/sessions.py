@@ -0,0 +1,237 @@
+"""
+Write-coalescing session engine (``SESSION_ENGINE = 'storefront.sessions'``).
+
+Sessions live in the ``SESSION_CACHE_ALIAS`` cache and are read from there.
+Browsing changes the session on every page (``category_clicks``), but a
+changed session is written to the database at most once every
+``SESSION_FLUSH_INTERVAL`` seconds. Changes in between go to the cache only.
+Sessions are written through to the database immediately when they are
+created, on login and key rotation, and at checkout (``persist_session``).
+Logout deletes them from both stores at once.
+
+Crash-loss bound: sessions and logins are always in the database. Server
+processes (``wsgi.py``, ``asgi.py``) call ``enable_flusher()``; each of them,
+and each worker forked from them, then writes its dirty sessions back from a
+background thread every ``SESSION_FLUSH_INTERVAL`` seconds, started on its
+first coalesced save. So if a process dies without a clean shutdown, a
+session loses at most the changes made in the last interval. Dirty sessions
+are also written at interpreter exit and when a ``manage.py serve`` worker
+stops. Processes without the flusher (management commands, tests) only write
+them on the session's next save after the interval, or at exit. With a
+per-process cache (LocMemCache), another worker may read a session up to
+that interval old. The production settings use a cache shared by all
+workers, so they do not have this problem.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import connections
+from django.dispatch import receiver
+
+KEY_PREFIX = 'storefront.sessions:'
+
+logger = logging.getLogger('django.contrib.sessions')
+
+# session_key -> time of the first unflushed change, for this process
+_dirty = {}
+_dirty_lock = threading.Lock()
+_flusher_enabled = False
+# pid of the process whose flusher thread is running (threads do not survive fork)
+_flusher_pid = None
+
+
+def flush_interval():
+    return getattr(settings, 'SESSION_FLUSH_INTERVAL', 30)
+
+
+def persist_session(session):
+    """Write this session to the database when it is next saved (checkout, login)"""
+    session.write_through = True
+    session.modified = True
+
+
+class SessionStore(DBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self.write_through = False
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def _get_entry(self):
+        try:
+            return self._cache.get(self.cache_key)
+        except Exception:
+            # Invalid cache key - treat as a miss (see cached_db)
+            return None
+
+    def _set_entry(self, data, flushed_at, dirty, version=0):
+        try:
+            self._cache.set(
+                self.cache_key,
+                {'data': data, 'flushed_at': flushed_at, 'dirty': dirty, 'version': version},
+                self.get_expiry_age(),
+            )
+        except Exception:
+            logger.exception('Error saving to cache (%s)', self._cache)
+
+    def load(self):
+        entry = self._get_entry()
+        if entry is not None:
+            return entry['data']
+        s = self._get_session_from_db()
+        if not s:
+            return {}
+        data = self.decode(s.session_data)
+        self._cache.set(
+            self.cache_key,
+            {'data': data, 'flushed_at': time.time(), 'dirty': False, 'version': 0},
+            self.get_expiry_age(expiry=s.expire_date),
+        )
+        return data
+
+    def exists(self, session_key):
+        return (
+            session_key
+            and (self.cache_key_prefix + session_key) in self._cache
+            or super().exists(session_key)
+        )
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        now = time.time()
+        entry = None if must_create else self._get_entry()
+        # Every save gets a new version, so a flush running meanwhile can tell its copy is outdated
+        version = entry.get('version', 0) + 1 if entry is not None else 0
+        if not self.write_through and entry is not None and now - entry['flushed_at'] < flush_interval():
+            # Coalesce: keep the change in the cache until the interval is up
+            self._set_entry(self._session, entry['flushed_at'], dirty=True, version=version)
+            with _dirty_lock:
+                _dirty.setdefault(self.session_key, now)
+            ensure_flusher()
+        else:
+            super().save(must_create)
+            self.write_through = False
+            self._set_entry(self._session, now, dirty=False, version=version)
+            with _dirty_lock:
+                _dirty.pop(self.session_key, None)
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(self.cache_key_prefix + session_key)
+        with _dirty_lock:
+            _dirty.pop(session_key, None)
+
+    def cycle_key(self):
+        # The new key (login) must be durable straight away
+        super().cycle_key()
+        self.write_through = True
+
+    def flush_dirty(self):
+        """Write this session's cached changes to the database if it has any"""
+        # Before reading: a save from this process while we write marks the session dirty again.
+        # On failure the entry stays dirty and is written by the session's next save.
+        with _dirty_lock:
+            _dirty.pop(self.session_key, None)
+        entry = self._get_entry()
+        if entry is None or not entry['dirty']:
+            return
+        self._session_cache = entry['data']
+        super().save()
+        # Only mark it clean if nobody saved in the meantime; a newer version stays dirty for the next flush
+        current = self._get_entry()
+        if current is not None and current.get('version', 0) == entry.get('version', 0):
+            self._set_entry(entry['data'], time.time(), dirty=False, version=entry.get('version', 0))
+
+    # Async variants go through the same cache-first logic
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    async def acycle_key(self):
+        return await sync_to_async(self.cycle_key)()
+
+
+def flush_dirty_sessions(older_than=0, log_errors=True):
+    """Write back sessions changed more than ``older_than`` seconds ago; returns how many"""
+    cutoff = time.time() - older_than
+    with _dirty_lock:
+        keys = [key for key, since in _dirty.items() if since <= cutoff]
+    for key in keys:
+        try:
+            SessionStore(key).flush_dirty()
+        except Exception:
+            if log_errors:
+                logger.exception('Error flushing session %s', key)
+    return len(keys)
+
+
+def enable_flusher():
+    """Write dirty sessions back from a background thread in this process and the workers it forks"""
+    global _flusher_enabled
+    _flusher_enabled = True
+
+
+def ensure_flusher():
+    """Start this process's flusher thread if it is enabled and not running yet"""
+    global _flusher_pid
+    if not _flusher_enabled or _flusher_pid == os.getpid():
+        return
+    with _dirty_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_periodically, name='session-flusher', daemon=True).start()
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(max(flush_interval(), 1))
+        try:
+            # Everything dirty: a change is then at most one interval old when written
+            flush_dirty_sessions()
+        except Exception:
+            logger.exception('Error flushing sessions')
+        finally:
+            connections.close_all()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Best effort: the database may already be gone (e.g. after a test run)
+    try:
+        flush_dirty_sessions(log_errors=False)
+    except Exception:
+        pass
+
+
+@receiver(user_logged_in)
+def write_through_login(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        persist_session(request.session)
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Product, Order, OrderItem
+import time
+
+SALES_VERSION_KEY = 'storefront:sales_version'
+
+
+def version_cache():
+    # Must be shared by every server process, or one that did not see the order keeps answering 304
+    return caches[getattr(settings, 'SALES_VERSION_CACHE', 'default')]
+
+
+def get_sales_version():
+    """Return the current sales-data version (used for dashboard ETags)"""
+    cache = version_cache()
+    version = cache.get(SALES_VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a cache restart never reuses an old ETag
+        version = int(time.time() * 1000)
+        cache.add(SALES_VERSION_KEY, version, timeout=None)
+        version = cache.get(SALES_VERSION_KEY, version)
+    return version
+
+
+def bump_sales_version():
+    """Mark all sales aggregations as stale"""
+    try:
+        return version_cache().incr(SALES_VERSION_KEY)
+    except ValueError:
+        # Key missing (evicted or never read) - seeding gives a fresh value
+        return get_sales_version()
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def sales_changed(sender, **kwargs):
+    # After the commit: a chart read in between would cache pre-order totals under the new ETag
+    transaction.on_commit(bump_sales_version)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, **kwargs):
+    # Category revenue is grouped by product category, so product edits count too
+    transaction.on_commit(bump_sales_version)
@@ -0,0 +1,210 @@
+"""
+Production static assets.
+
+``CompressedManifestStaticFilesStorage`` fingerprints files at collectstatic
+time (Django's manifest storage) and also writes ``.gz`` and, if the
+``brotli`` package is installed, ``.br`` copies of text assets.
+``StaticAssetMiddleware`` serves STATIC_ROOT (and optionally MEDIA_ROOT)
+straight from the Django process. Hashed files are sent with a one-year
+``immutable`` Cache-Control, so no separate web server is needed.
+Enabled by ``auroramart.settings_production``.
+"""
+
+import gzip
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.checks import Error, Tags, Warning, register
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.template.utils import get_app_template_dirs
+from django.utils._os import safe_join
+from django.utils.http import parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE = 'public, max-age=60'
+MEDIA_CACHE = 'public, max-age=86400'
+# Files up to this size are kept in memory once read
+MEMORY_CACHE_LIMIT = 512 * 1024
+
+STATIC_TAG_RE = re.compile(r"""\{%\s*static\s+['"]([^'"]+)['"]""")
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest (content-hashed) storage that also precompresses text assets"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()) | set(paths):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data, quality=11)))
+        for suffix, compressed in variants:
+            # Only keep copies that actually save bytes
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+
+
+class StaticAssetMiddleware:
+    """Serve collected static files (and optionally media) with far-future caching"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.mounts = [(self.url_prefix(settings.STATIC_URL), settings.STATIC_ROOT, True)]
+        if getattr(settings, 'STATIC_ASSETS_SERVE_MEDIA', False) and settings.MEDIA_ROOT:
+            self.mounts.append((self.url_prefix(settings.MEDIA_URL), settings.MEDIA_ROOT, False))
+        self.immutable_names = None
+        self.memory = {}
+
+    @staticmethod
+    def url_prefix(url):
+        return '/' + url.strip('/') + '/'
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.serve(request)
+        if response is None:
+            response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        response = self.serve(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+    def hashed_names(self):
+        if self.immutable_names is None:
+            manifest = getattr(staticfiles_storage, 'hashed_files', None) or {}
+            self.immutable_names = set(manifest.values())
+        return self.immutable_names
+
+    def serve(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        for prefix, root, is_static in self.mounts:
+            if root and request.path.startswith(prefix):
+                return self.serve_file(request, root, request.path[len(prefix):], is_static)
+        return None
+
+    def serve_file(self, request, root, name, is_static):
+        try:
+            path = safe_join(str(root), name)
+        except ValueError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        if is_static and name in self.hashed_names():
+            cache_control = IMMUTABLE_CACHE
+        else:
+            cache_control = DEFAULT_CACHE if is_static else MEDIA_CACHE
+
+        stat = os.stat(path)
+        if not cache_control.endswith('immutable'):
+            since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            if since is not None and int(stat.st_mtime) <= since:
+                response = HttpResponseNotModified()
+                response['Cache-Control'] = cache_control
+                return response
+
+        content_type, _ = mimetypes.guess_type(name)
+        encoding, path = self.choose_encoding(request, path, name)
+        # Only immutable files may be kept in memory; media can be replaced in place
+        response = self.file_response(path, content_type or 'application/octet-stream',
+                                      cacheable=cache_control == IMMUTABLE_CACHE)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        if name.endswith(COMPRESSIBLE_EXTENSIONS):
+            response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = cache_control
+        response['Last-Modified'] = formatdate(stat.st_mtime, usegmt=True)
+        return response
+
+    @staticmethod
+    def choose_encoding(request, path, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return None, path
+        accepted = {token.split(';')[0].strip() for token in request.headers.get('Accept-Encoding', '').split(',')}
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in accepted and os.path.isfile(path + suffix):
+                return encoding, path + suffix
+        return None, path
+
+    def file_response(self, path, content_type, cacheable):
+        cached = self.memory.get(path)
+        if cached is None:
+            if not cacheable or os.path.getsize(path) > MEMORY_CACHE_LIMIT:
+                return FileResponse(open(path, 'rb'), content_type=content_type)
+            with open(path, 'rb') as f:
+                cached = f.read()
+            self.memory[path] = cached
+        return HttpResponse(cached, content_type=content_type)
+
+
+def find_static_references():
+    """(template path, static path) for every literal {% static %} tag in app templates"""
+    references = []
+    for template_dir in get_app_template_dirs('templates'):
+        for folder, _, files in os.walk(template_dir):
+            for filename in files:
+                if not filename.endswith('.html'):
+                    continue
+                template_path = os.path.join(folder, filename)
+                with open(template_path, encoding='utf-8') as f:
+                    for static_path in STATIC_TAG_RE.findall(f.read()):
+                        references.append((template_path, static_path))
+    return references
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_static_references(app_configs, **kwargs):
+    """Every {% static %} reference must resolve to a hashed name in the manifest"""
+    if not isinstance(staticfiles_storage, ManifestStaticFilesStorage):
+        return []
+    if not staticfiles_storage.hashed_files:
+        return [Warning(
+            'No staticfiles manifest found.',
+            hint='Run "python manage.py collectstatic" with the production settings.',
+            id='storefront.W001',
+        )]
+    errors = []
+    for template_path, static_path in find_static_references():
+        try:
+            hashed = staticfiles_storage.stored_name(static_path)
+        except ValueError:
+            hashed = None
+        if not hashed or hashed == static_path:
+            errors.append(Error(
+                f"{{% static '{static_path}' %}} does not resolve to a hashed file.",
+                hint=f'Referenced in {template_path}; add the file under static/ and re-run collectstatic.',
+                id='storefront.E001',
+            ))
+    return errors
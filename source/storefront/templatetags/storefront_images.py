@@ -0,0 +1,31 @@
+from django import template
+from ..images import derivative_name, derivative_widths
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_srcset(image, original_width, fmt='jpeg'):
+    """srcset of an image's resized copies (empty until they have been generated)"""
+    if not image or not original_width:
+        return ''
+    storage = image.storage
+    candidates = [f'{storage.url(derivative_name(image.name, w, fmt))} {w}w' for w in derivative_widths(original_width)]
+    if fmt == 'jpeg':
+        # The original is the largest JPEG candidate
+        candidates.append(f'{image.url} {original_width}w')
+    return ', '.join(candidates)
+
+
+@register.inclusion_tag('storefront/includes/responsive_image.html')
+def responsive_image(image, original_width, alt='', sizes='100vw', style='', loading='lazy'):
+    """<picture> with WebP/JPEG srcsets for an uploaded image"""
+    return {
+        'image': image,
+        'alt': alt,
+        'sizes': sizes,
+        'style': style,
+        'loading': loading,
+        'webp_srcset': image_srcset(image, original_width, 'webp'),
+        'jpeg_srcset': image_srcset(image, original_width, 'jpeg'),
+    }
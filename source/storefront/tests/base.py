@@ -0,0 +1,57 @@
+import os
+import re
+import tempfile
+
+from django.db import connection
+
+
+# "SCAN <table>", with or without "USING [COVERING] INDEX <name>", walks the whole
+# table or index; only "SEARCH" reads a range of it
+FULL_SCAN_RE = re.compile(r'^SCAN (\S+)')
+
+
+class QueryPlanMixin:
+    """Record every query a block runs and check its EXPLAIN QUERY PLAN"""
+
+    # Tables that are tiny or only read in full on purpose
+    scan_allowed = {'django_content_type', 'auth_permission', 'auth_group', 'CONSTANT'}
+
+    def capture_queries(self):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if not many:
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        return connection.execute_wrapper(record), queries
+
+    def query_plan(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[3] for row in cursor.fetchall()]
+
+    def full_scans(self, queries):
+        scans = []
+        for sql, params in queries:
+            # Only filtered reads/writes; an unfiltered listing reads everything by design
+            if not sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')) or ' WHERE ' not in sql:
+                continue
+            for step in self.query_plan(sql, params):
+                match = FULL_SCAN_RE.match(step)
+                if match and match.group(1) not in self.scan_allowed:
+                    scans.append(f'{step}\n    {sql} {params}')
+        return scans
+
+    def assertNoFullScans(self, queries):
+        self.assertTrue(queries, 'No queries were captured')
+        scans = self.full_scans(queries)
+        self.assertFalse(scans, 'Full table scans:\n' + '\n'.join(scans))
+
+
+def write_temp_csv(testcase, content):
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    testcase.addCleanup(os.remove, path)
+    return path
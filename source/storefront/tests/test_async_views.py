@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Product, Customer
+
+
+class AsyncStorefrontViewTests(TestCase):
+    """The async home and product pages must agree with the sync views they share state with"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.lamp = Product.objects.create(
+            sku='LAMP', name='Lamp', category='Home & Kitchen', price=Decimal('20.00'), stock=5,
+            image='products/lamp.jpg',
+        )
+        cls.kettle = Product.objects.create(
+            sku='KETTLE', name='Kettle', category='Home & Kitchen', price=Decimal('30.00'), stock=5,
+            image='products/kettle.jpg',
+        )
+        Product.objects.create(
+            sku='SCARF', name='Scarf', category='Fashion', price=Decimal('15.00'), stock=5,
+            image='products/scarf.jpg',
+        )
+        cls.user = User.objects.create_user('async', password='pass12345')
+        Customer.objects.create(user=cls.user)
+
+    def test_async_views_see_sync_writes(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('storefront:add_to_cart', args=[self.lamp.id]), {'quantity': 1})
+        self.client.post(reverse('storefront:toggle_favorite', args=[self.lamp.id]))
+
+        self.async_client.cookies = self.client.cookies
+        response = async_to_sync(self.async_client.get)(reverse('storefront:product_detail', args=[self.lamp.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cart_count'], 1)
+        self.assertTrue(response.context['is_favorite'])
+        self.assertEqual([p.sku for p in response.context['recommendations']], ['KETTLE'])
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_sync_views_see_async_session_changes(self):
+        self.async_client.cookies = self.client.cookies
+        for product in (self.lamp, self.kettle):
+            async_to_sync(self.async_client.get)(reverse('storefront:product_detail', args=[product.id]))
+        self.client.cookies = self.async_client.cookies
+        self.assertEqual(self.client.session['category_clicks'], {'Home & Kitchen': 2})
+
+        response = async_to_sync(self.async_client.get)(reverse('storefront:index'))
+        self.assertTrue(response.context['is_personalized'])
+        self.assertEqual({p.category for p in response.context['featured_products']}, {'Home & Kitchen'})
+
+    def test_missing_product_is_404(self):
+        response = async_to_sync(self.async_client.get)(reverse('storefront:product_detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
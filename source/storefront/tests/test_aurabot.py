@@ -0,0 +1,261 @@
+import asyncio
+from decimal import Decimal
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import chat, product_cache, product_search
+from ..intents import IntentEngine, get_engine
+from ..models import Product
+
+
+class IntentMatcherTests(SimpleTestCase):
+    def intent(self, message):
+        intent = get_engine().table.match(message)
+        return intent.name if intent else None
+
+    def test_patterns_match_whole_words_only(self):
+        self.assertEqual(self.intent('Hi!'), 'greeting')
+        self.assertEqual(self.intent('How long does shipping take?'), 'shipping')
+        self.assertEqual(self.intent('I know the price'), 'price')
+        self.assertIsNone(self.intent('this is nothing'))
+
+    def test_priority_then_longest_phrase(self):
+        self.assertEqual(self.intent('hello, which products do you have?'), 'hello')
+        self.assertEqual(self.intent('No, thanks - that is all'), 'goodbye')
+        self.assertEqual(self.intent('when will my order ship'), 'order')
+
+    def test_fallback_quotes_the_message(self):
+        self.assertIn("asking about 'warranty'", get_engine().reply('warranty'))
+
+    def test_table_reloads_when_the_file_changes(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        path = os.path.join(workdir, 'intents.json')
+
+        def write(data, mtime):
+            with open(path, 'w') as f:
+                f.write(data if isinstance(data, str) else json.dumps(data))
+            os.utime(path, (mtime, mtime))
+
+        write({'fallback': '?', 'intents': [{'name': 'a', 'patterns': ['ping'], 'reply': 'pong'}]}, 1000)
+        engine = IntentEngine(path, reload_interval=0)
+        self.assertEqual(engine.reply('ping'), 'pong')
+
+        write({'fallback': '?', 'intents': [{'name': 'a', 'patterns': ['ping'], 'reply': 'PONG'}]}, 2000)
+        self.assertEqual(engine.reply('ping'), 'PONG')
+
+        write('{not json', 3000)
+        with self.assertLogs('storefront.intents', 'WARNING'):
+            self.assertEqual(engine.reply('ping'), 'PONG')
+
+
+@override_settings(PRODUCT_SEARCH_INDEX='/nonexistent/product_index.joblib')
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        product_search.reset_index()
+        self.addCleanup(product_search.reset_index)
+        product_cache.get_cache().clear()
+        self.kettle = Product.objects.create(
+            name='Electric Kettle', category='Home & Kitchen', price=Decimal('39.00'), stock=4,
+            description='A 1.7 litre stainless steel kettle that boils water fast.',
+        )
+        self.mug = Product.objects.create(
+            name='Travel Mug', category='Home & Kitchen', price=Decimal('15.00'), stock=0,
+            description='Keeps coffee or tea hot for hours.',
+        )
+        self.novel = Product.objects.create(
+            name='Mystery Novel', category='Books', price=Decimal('12.00'), stock=9,
+            description='A detective story set in a lighthouse.',
+        )
+
+    def ids(self, query):
+        return [pid for pid, _ in product_search.search(query)]
+
+    def test_only_text_changes_bump_the_version(self):
+        product_search.get_index()
+        version = product_search.get_version()
+        kettle = Product.objects.get(pk=self.kettle.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            kettle.stock = 3
+            kettle.save()
+            kettle.rating = Decimal('4.5')
+            kettle.save(update_fields=['rating'])
+        self.assertEqual(product_search.get_version(), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            kettle.description = 'A kettle for detective stories.'
+            kettle.save()
+        self.assertNotEqual(product_search.get_version(), version)
+        self.assertIn(self.kettle.id, self.ids('detective'))
+
+    def test_questions_do_not_wait_for_the_index(self):
+        with mock.patch('storefront.product_search.threading.Thread') as thread:
+            self.assertEqual(product_search.suggest_products('do you sell a kettle?'), [])
+            reply, products = chat.answer('do you sell a kettle?')
+        # One background load, and the intents answer meanwhile
+        thread.assert_called_once_with(target=product_search._load_in_background, name='search-index-loader',
+                                       daemon=True)
+        self.assertEqual(products, [])
+        self.assertTrue(reply)
+
+    def test_ranks_by_name_and_description(self):
+        self.assertEqual(self.ids('do you sell a kettle?')[0], self.kettle.id)
+        self.assertEqual(self.ids('something to keep my coffee hot'), [self.mug.id])
+        self.assertEqual(self.ids('the weather today'), [])
+
+    def test_updates_without_rebuilding(self):
+        index = product_search.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.novel.description = 'A detective story about a stolen kettle.'
+            self.novel.save()
+            # Only words the index was built with count until the next full build
+            flask = Product.objects.create(name='Stainless Steel Flask', category='Home & Kitchen',
+                                           price=Decimal('25.00'), description='Keeps water hot.')
+        self.assertIs(product_search.get_index(), index)
+        self.assertIn(self.novel.id, self.ids('kettle'))
+        self.assertEqual(self.ids('stainless steel flask')[0], flask.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kettle.delete()
+            Product.objects.filter(pk=self.novel.pk).update(name='Lighthouse Mystery')
+        self.assertNotIn(self.kettle.id, self.ids('kettle'))
+        self.assertEqual(self.ids('lighthouse')[0], self.novel.id)
+
+    def test_catches_up_on_changes_from_other_processes(self):
+        index = product_search.get_index()
+        self.assertEqual(self.ids('lighthouse'), [self.novel.id])
+        updated_at = self.mug.updated_at
+        # Another process edits the mug: this one only sees the version bump
+        with mock.patch.object(product_search, '_index', None), self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=self.mug.pk).update(description='A lighthouse souvenir.')
+        self.assertGreater(Product.objects.get(pk=self.mug.pk).updated_at, updated_at)
+        self.assertIs(product_search.get_index(), index)
+        with self.assertNumQueries(1):
+            self.assertIn(self.mug.id, self.ids('lighthouse'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ids('coffee'), [])
+
+    def test_saved_index_catches_up(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        path = os.path.join(workdir, 'index.joblib')
+        call_command('build_search_index', output=path, stdout=StringIO())
+        # Saved after the build, while this process had no index loaded
+        self.mug.description = 'A lighthouse souvenir.'
+        self.mug.save()
+        with override_settings(PRODUCT_SEARCH_INDEX=path):
+            self.assertIn(self.mug.id, self.ids('lighthouse'))
+            self.assertEqual(self.ids('coffee'), [])
+
+    def test_view_lists_products_with_stock(self):
+        product_search.get_index()
+        product_cache.get_products([self.kettle.id, self.mug.id, self.novel.id])
+        with self.assertNumQueries(0):
+            data = self.client.post(
+                reverse('storefront:aurabot_reply'), data=json.dumps({'message': 'kettle or mug for coffee?'}),
+                content_type='application/json',
+            ).json()
+        self.assertIn('found', data['reply'])
+        self.assertEqual([p['name'] for p in data['products']][0], 'Electric Kettle')
+        mug = next(p for p in data['products'] if p['id'] == self.mug.id)
+        self.assertEqual((mug['stock'], mug['url']), (0, reverse('storefront:product_detail', args=[self.mug.id])))
+
+    def test_intent_replies(self):
+        product_search.get_index()
+
+        def ask(message):
+            return self.client.post(
+                reverse('storefront:aurabot_reply'), data=json.dumps({'message': message}),
+                content_type='application/json',
+            ).json()
+
+        self.assertIn('on sale', ask('any discounts?')['reply'])
+        self.assertEqual(ask('hello, do you sell a kettle?')['products'], [])
+        self.assertIn("asking about 'warranty'", ask('warranty')['reply'])
+
+
+@override_settings(PRODUCT_SEARCH_INDEX='/nonexistent/product_index.joblib', AURABOT_STREAM_DELAY=0)
+class ChatStreamTests(TransactionTestCase):
+    # Committed rows: under ASGI the answer is computed in a pool thread with its own connection
+    def setUp(self):
+        product_search.reset_index()
+        self.addCleanup(product_search.reset_index)
+        product_cache.get_cache().clear()
+        self.kettle = Product.objects.create(name='Electric Kettle', category='Home & Kitchen',
+                                             price=Decimal('39.00'), stock=4, description='Boils water fast.')
+        product_search.get_index()
+
+    def events(self, chunks):
+        parsed = []
+        for block in ''.join(c.decode() if isinstance(c, bytes) else c for c in chunks).strip().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.split('\n'))
+            parsed.append((fields.get('event', 'message'), json.loads(fields['data'])))
+        return parsed
+
+    def test_streams_chunks_then_products_under_asgi(self):
+        async def ask():
+            response = await self.async_client.post(
+                reverse('storefront:aurabot_stream'), data={'message': 'do you sell a kettle?'},
+                content_type='application/json',
+            )
+            return response, [chunk async for chunk in response.streaming_content]
+
+        threads = []
+
+        def answer(message):
+            threads.append(threading.current_thread())
+            return real_answer(message)
+
+        real_answer = chat.answer
+        with mock.patch.object(chat, 'answer', side_effect=answer):
+            response, chunks = async_to_sync(ask)()
+        # Not on the shared sync thread (this one), where it would queue behind other sync work
+        self.assertNotEqual(threads, [threading.current_thread()])
+        self.assertEqual(len(threads), 1)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = self.events(chunks)
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(''.join(data['text'] for event, data in events if event == 'message'),
+                         "Here's what I found for 'do you sell a kettle?':")
+        self.assertEqual(events[-2][0], 'products')
+        self.assertEqual([p['id'] for p in events[-2][1]], [self.kettle.id])
+        self.assertEqual(events[-1], ('done', {}))
+        self.assertEqual(chat.open_streams(), 0)
+
+    def test_same_events_under_wsgi(self):
+        response = self.client.post(reverse('storefront:aurabot_stream'), data={'message': 'hello'},
+                                    content_type='application/json')
+        events = self.events(response.streaming_content)
+        self.assertTrue(''.join(data['text'] for event, data in events if event == 'message').startswith('Hello!'))
+        self.assertEqual(events[-2:], [('products', []), ('done', {})])
+
+    def test_disconnect_stops_the_stream(self):
+        async def abandon():
+            received = []
+
+            async def read():
+                async for event in chat.stream_reply('one two three four five six seven eight', [], delay=10):
+                    received.append(event)
+
+            task = asyncio.create_task(read())
+            while not received:
+                await asyncio.sleep(0)
+            self.assertEqual(chat.open_streams(), 1)
+            # What Django does when the client goes away
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return received
+
+        self.assertEqual(len(async_to_sync(abandon)()), 1)
+        self.assertEqual(chat.open_streams(), 0)
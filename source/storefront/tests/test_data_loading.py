@@ -0,0 +1,115 @@
+from decimal import Decimal
+from io import StringIO
+
+import pandas as pd
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..management.commands.load_customers import derive_customer_fields
+from ..models import Product, Customer, Order, OrderItem, Favorite
+from .base import write_temp_csv
+
+
+PRODUCTS_CSV = """SKU code,Product name,Product description,Product Category,Product Subcategory,Quantity on hand,Reorder Quantity,Unit price,Product rating
+AAA-1,Lamp,A lamp,Home & Kitchen,Lighting,5,10,19.99,4.5
+BBB-2,Lamp,Another lamp,Home & Kitchen,Lighting,7,10,24.50,
+CCC-3,Novel,A book,Books,Fiction,0,5,12,3.9
+"""
+
+
+CUSTOMERS_CSV = """age,gender,employment_status,occupation,education,household_size,has_children,monthly_income_sgd,preferred_category
+40,Female,Full-time,Sales,Diploma,1,0,6500.00,Fashion - Women
+28,Male,Self-employed,Service,Bachelor,2,0,2221.21,Electronics
+,Other,Retired,,,1,0,,
+"""
+
+
+class LoadCatalogTests(TestCase):
+    def setUp(self):
+        self.csv_path = write_temp_csv(self, PRODUCTS_CSV)
+
+    def load(self, *args):
+        call_command('load_catalog', self.csv_path, *args, chunk_size=2, stdout=StringIO())
+
+    def test_loads_every_sku(self):
+        self.load()
+        self.assertEqual(Product.objects.count(), 3)
+        lamp = Product.objects.get(sku='BBB-2')
+        self.assertEqual(lamp.price, Decimal('24.50'))
+        self.assertIsNone(lamp.rating)
+
+    def test_rerun_is_idempotent_and_keeps_stock(self):
+        self.load()
+        Product.objects.filter(sku='AAA-1').update(stock=1, price=Decimal('1.00'))
+        self.load()
+        self.assertEqual(Product.objects.count(), 3)
+        lamp = Product.objects.get(sku='AAA-1')
+        self.assertEqual(lamp.stock, 1)
+        self.assertEqual(lamp.price, Decimal('19.99'))
+        self.load('--update-stock')
+        self.assertEqual(Product.objects.get(sku='AAA-1').stock, 5)
+
+    def test_adopts_products_loaded_without_sku(self):
+        legacy = Product.objects.create(name='Novel', category='Books', price=Decimal('10.00'), stock=3)
+        self.load()
+        self.assertEqual(Product.objects.count(), 3)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.sku, 'CCC-3')
+        self.assertEqual(legacy.price, Decimal('12.00'))
+
+
+class LoadCustomersTests(TestCase):
+    def setUp(self):
+        self.csv_path = write_temp_csv(self, CUSTOMERS_CSV)
+
+    def test_derive_customer_fields(self):
+        fields = derive_customer_fields(pd.read_csv(self.csv_path))
+        self.assertEqual(list(fields['username']), ['customer_1', 'customer_2', 'customer_3'])
+        self.assertEqual(list(fields['gender']), ['F', 'M', 'P'])
+        self.assertEqual(list(fields['employment_status']), ['Employed', 'Self-Employed', 'Unemployed'])
+        # Monthly income is banded on its annual equivalent
+        self.assertEqual(list(fields['income_range']), ['60k-100k', 'Below 30k', 'Below 30k'])
+        self.assertEqual(list(fields['age']), [40, 28, None])
+        self.assertIsNone(fields['preferred_category'][2])
+
+    def test_rerun_is_idempotent(self):
+        call_command('load_customers', self.csv_path, chunk_size=2, stdout=StringIO())
+        call_command('load_customers', self.csv_path, chunk_size=2, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Customer.objects.count(), 3)
+        user = User.objects.get(username='customer_1')
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(user.customer.income_range, '60k-100k')
+
+    def test_existing_user_gets_profile(self):
+        User.objects.create_user('customer_2')
+        call_command('load_customers', self.csv_path, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Customer.objects.get(user__username='customer_2').employment_status, 'Self-Employed')
+
+
+class GenerateSyntheticDataTests(TestCase):
+    def generate(self):
+        call_command('generate_synthetic_data', products=40, customers=20, orders=90,
+                     chunk_size=40, workers=1, seed=7, stdout=StringIO())
+
+    def test_generates_linked_dataset(self):
+        self.generate()
+        self.assertEqual(Product.objects.count(), 40)
+        self.assertEqual(Customer.objects.count(), 20)
+        self.assertEqual(Order.objects.count(), 90)
+        self.assertGreaterEqual(OrderItem.objects.count(), 90)
+        self.assertTrue(Favorite.objects.exists())
+        # Order totals are the item subtotal plus the delivery fee rule
+        for order in Order.objects.prefetch_related('items')[:20]:
+            subtotal = sum(item.get_total() for item in order.items.all())
+            fee = Decimal('0.00') if subtotal >= Decimal('150.00') else Decimal('4.99')
+            self.assertEqual(order.total_amount, subtotal + fee)
+
+    def test_refuses_to_generate_twice(self):
+        self.generate()
+        with self.assertRaises(CommandError):
+            self.generate()
@@ -0,0 +1,195 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Product, Customer, Cart, Order, OrderItem, Favorite
+from ..routers import STICKY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, record_writes
+from .base import QueryPlanMixin
+
+
+class SQLitePragmaTests(TestCase):
+    def open_connection(self):
+        connection = connections.create_connection('default')
+        connection.ensure_connection()
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={'synchronous': 'NORMAL', 'cache_size': -1234, 'busy_timeout': 4321})
+    def test_pragmas_applied_to_new_connections(self):
+        connection = self.open_connection()
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(connection, 'cache_size'), -1234)
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 4321)
+
+    def test_no_pragmas_by_default(self):
+        connection = self.open_connection()
+        self.assertEqual(self.pragma(connection, 'synchronous'), 2)  # FULL
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def execute(self, sql):
+        """Pass a statement through the write-tracking wrapper without running it"""
+        record_writes(lambda *args: None, sql, (), False, {'connection': connection})
+
+    def route(self, request, write=None):
+        """Run a request through the middleware; return (read db inside the view, response)"""
+        seen = {}
+
+        def view(request):
+            seen['before_write'] = self.router.db_for_read(Product)
+            if write:
+                self.execute(write)
+                seen['after_write'] = self.router.db_for_read(Product)
+            seen['user'] = self.router.db_for_read(User)
+            seen['order'] = self.router.db_for_read(Order)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_catalog_reads_in_get_requests_use_replica(self):
+        seen, response = self.route(self.factory.get('/'))
+        self.assertEqual(seen['before_write'], 'replica')
+        # Auth/session reads always stay on the primary, and so do orders (dashboard ETags)
+        self.assertIsNone(seen['user'])
+        self.assertIsNone(seen['order'])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_unsafe_requests_and_non_request_code_use_primary(self):
+        seen, _ = self.route(self.factory.post('/'))
+        self.assertIsNone(seen['before_write'])
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_write_pins_rest_of_request_and_sets_sticky_cookie(self):
+        seen, response = self.route(self.factory.get('/'), write='UPDATE "storefront_product" SET "stock" = 1')
+        self.assertEqual(seen['before_write'], 'replica')
+        self.assertIsNone(seen['after_write'])
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        seen, _ = self.route(request)
+        self.assertIsNone(seen['before_write'])
+
+    def test_routine_writes_do_not_pin_to_primary(self):
+        def view(request):
+            # get_or_create routes its read to the primary; the cart and session rows are not replicated
+            self.router.db_for_write(Cart)
+            self.execute('SELECT "storefront_product"."id" FROM "storefront_product"')
+            self.execute('INSERT INTO "storefront_cart" ("customer_id") VALUES (%s)')
+            self.execute('UPDATE "django_session" SET "session_data" = %s')
+            return HttpResponse(self.router.db_for_read(Product))
+
+        response = ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(response.content, b'replica')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=['replica', 'replica2', 'replica3'])
+    def test_request_reads_from_one_replica(self):
+        def view(request):
+            seen.append({self.router.db_for_read(Product) for _ in range(20)})
+            return HttpResponse()
+
+        seen = []
+        for _ in range(5):
+            ReplicaRoutingMiddleware(view)(self.factory.get('/'))
+        self.assertEqual([len(replicas) for replicas in seen], [1] * 5)
+
+    def test_replica_loaded_objects_are_written_to_primary(self):
+        product = Product(name='Lamp', price=Decimal('10.00'))
+        product._state.db = 'replica'
+        self.assertEqual(self.router.db_for_write(Product, instance=product), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'storefront'))
+        self.assertIsNone(self.router.allow_migrate('default', 'storefront'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        seen, _ = self.route(self.factory.get('/'))
+        self.assertIsNone(seen['before_write'])
+
+
+class StorefrontQueryPlanTests(QueryPlanMixin, TestCase):
+    """Every query on the storefront's browse and checkout paths must use an index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(
+                sku=f'QP-{i}', name=f'Item {i}', category=category, price=Decimal('10.00') + i,
+                stock=i % 4, rating=Decimal('4.0'), image=f'products/item{i}.jpg',
+            )
+            for i, category in enumerate(['Fashion - Men', 'Fashion - Women', 'Books', 'Electronics'] * 3)
+        ]
+        cls.user = User.objects.create_user('planner', password='pass12345')
+        cls.customer = Customer.objects.create(user=cls.user, preferred_category='Books')
+        order = Order.objects.create(customer=cls.customer, total_amount=Decimal('11.00'))
+        OrderItem.objects.create(order=order, product=cls.products[1], quantity=1, price=Decimal('11.00'))
+        Favorite.objects.create(user=cls.user, product=cls.products[2])
+
+    def assertPageUsesIndexes(self, method, url, data=None):
+        wrapper, queries = self.capture_queries()
+        with wrapper:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400, url)
+        self.assertNoFullScans(queries)
+
+    def test_browse_pages(self):
+        product = self.products[1]
+        for url in [
+            reverse('storefront:index'),
+            reverse('storefront:category_list'),
+            reverse('storefront:product_detail', args=[product.id]),
+        ]:
+            with self.subTest(url=url, user='anonymous'):
+                self.assertPageUsesIndexes('get', url)
+        self.client.force_login(self.user)
+        for url in [reverse('storefront:index'), reverse('storefront:product_detail', args=[product.id]),
+                    reverse('storefront:favorites')]:
+            with self.subTest(url=url, user='customer'):
+                self.assertPageUsesIndexes('get', url)
+
+    def test_category_sorts(self):
+        url = reverse('storefront:category_products', args=['Fashion'])
+        for sort in ['recommended', 'newest', 'price_high', 'price_low', 'name', 'rating']:
+            with self.subTest(sort=sort):
+                self.assertPageUsesIndexes('get', url, {'sort': sort})
+        self.assertPageUsesIndexes('get', url, {'search': 'Item'})
+        # "Fashion" covers its subcategories, and only those (the in-stock ones are all women's)
+        response = self.client.get(url, {'sort': 'name'})
+        self.assertEqual({p.category for p in response.context['products']}, {'Fashion - Women'})
+
+    def test_category_list_counts_in_one_query(self):
+        wrapper, queries = self.capture_queries()
+        with wrapper:
+            response = self.client.get(reverse('storefront:category_list'))
+        counts = {c['name']: c['count'] for c in response.context['categories']}
+        self.assertEqual((counts['Fashion'], counts['Books'], counts['Pet Supplies']), (6, 3, 0))
+        self.assertEqual(sum('"storefront_product"' in sql for sql, _ in queries), 1)
+
+    def test_checkout_flow(self):
+        self.client.force_login(self.user)
+        product = self.products[1]
+        self.assertPageUsesIndexes('post', reverse('storefront:add_to_cart', args=[product.id]), {'quantity': 1})
+        self.assertPageUsesIndexes('get', reverse('storefront:cart'))
+        self.assertPageUsesIndexes('get', reverse('storefront:checkout'))
+        self.assertPageUsesIndexes('post', reverse('storefront:toggle_favorite', args=[product.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertPageUsesIndexes('post', reverse('storefront:confirm_order'))
+        order = Order.objects.filter(customer=self.customer).latest('id')
+        self.assertPageUsesIndexes('get', reverse('storefront:order_confirmation', args=[order.id]))
+        self.assertPageUsesIndexes('get', reverse('storefront:order_history'))
+        self.assertPageUsesIndexes('get', reverse('storefront:order_detail', args=[order.id]))
@@ -0,0 +1,59 @@
+from decimal import Decimal
+from io import BytesIO, StringIO
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from ..images import derivative_name
+from ..models import Product
+
+
+def jpeg_upload(name='photo.jpg', size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (120, 80, 200)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(IMAGE_PIPELINE_WORKERS=0)
+class ImagePipelineTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media_root = media_root
+
+    def test_product_form_upload_generates_derivatives(self):
+        from adminpanel.forms import ProductForm
+        form = ProductForm(
+            {'name': 'Lamp', 'category': 'Home & Kitchen', 'price': '19.99', 'stock': 3, 'reorder_threshold': 10},
+            {'image': jpeg_upload()},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            product = form.save()
+        product.refresh_from_db()
+        self.assertEqual((product.image_width, product.image_height), (800, 600))
+        for width in (160, 320, 640):
+            for fmt in ('webp', 'jpeg'):
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, derivative_name(product.image.name, width, fmt))))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, derivative_name(product.image.name, 960, 'webp'))))
+
+    def test_srcset_only_after_processing(self):
+        product = Product.objects.create(name='Lamp', category='Home', price=Decimal('1.00'), image=jpeg_upload())
+        template = Template('{% load storefront_images %}{% responsive_image product.image product.image_width alt="x" %}')
+        self.assertNotIn('srcset', template.render(Context({'product': product})))
+        call_command('generate_image_derivatives', workers=1, stdout=StringIO())
+        product.refresh_from_db()
+        html = template.render(Context({'product': product}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('-320w.webp 320w', html)
+        self.assertIn(f'{product.image.url} 800w', html)
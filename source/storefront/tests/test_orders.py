@@ -0,0 +1,142 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import order_summary
+from ..models import Product, Customer, Order, OrderItem, OrderSummary
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('buyer', password='pass12345')
+        self.customer = Customer.objects.create(user=self.user)
+        self.products = [Product.objects.create(name=f'Mug {n}', category='Home & Kitchen', price=Decimal('5.00'))
+                         for n in range(30)]
+        self.client.force_login(self.user)
+
+    def create_order(self, lines, customer=None):
+        order = Order.objects.create(customer=customer or self.customer, total_amount=Decimal('5.00') * lines)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, quantity=1, price=Decimal('5.00'))
+            for product in self.products[:lines]
+        )
+        return order
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_order_size(self):
+        url = reverse('storefront:order_history')
+        small = self.create_order(1)
+        one_order = self.count_queries(url)
+        for _ in range(5):
+            self.create_order(30)
+        # Orders without a summary yet get theirs built in one batch
+        self.assertEqual(self.count_queries(url), one_order)
+        cache.clear()
+        self.assertLess(self.count_queries(url), one_order)
+
+        large = Order.objects.latest('id')
+        for view in ['storefront:order_detail', 'storefront:order_confirmation']:
+            with self.subTest(view=view):
+                self.assertEqual(self.count_queries(reverse(view, args=[small.pk])),
+                                 self.count_queries(reverse(view, args=[large.pk])))
+        response = self.client.get(reverse('storefront:order_detail', args=[large.pk]))
+        self.assertContains(response, 'Mug 29')
+
+    @override_settings(ORDER_HISTORY_PAGE_SIZE=4)
+    def test_keyset_pages_cover_every_order_once(self):
+        created = [self.create_order(1) for _ in range(10)]
+        # Ties on created_at are broken by id
+        Order.objects.filter(pk__in=[o.pk for o in created[3:7]]).update(created_at=created[3].created_at)
+        self.create_order(1, customer=Customer.objects.create(user=User.objects.create_user('other')))
+
+        seen, url = [], reverse('storefront:order_history')
+        while url:
+            response = self.client.get(url)
+            seen += [order.pk for order in response.context['orders']]
+            cursor = response.context['next_cursor']
+            url = cursor and reverse('storefront:order_history') + '?before=' + cursor
+        expected = Order.objects.filter(customer=self.customer).order_by('-created_at', '-id')
+        self.assertEqual(seen, list(expected.values_list('pk', flat=True)))
+        self.assertEqual(self.client.get(reverse('storefront:order_history') + '?before=junk').status_code, 404)
+
+    def test_first_page_is_cached_until_an_order_changes(self):
+        order = self.create_order(2)
+        url = reverse('storefront:order_history')
+        uncached = self.count_queries(url)
+        self.assertLess(self.count_queries(url), uncached)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newer = self.create_order(1)
+        self.assertEqual([o.pk for o in self.client.get(url).context['orders']], [newer.pk, order.pk])
+        order.status = 'Shipped'
+        order.save()
+        self.assertContains(self.client.get(url), 'Shipped')
+
+    def test_orders_are_private(self):
+        other = self.create_order(1, customer=Customer.objects.create(user=User.objects.create_user('other')))
+        for view in ['storefront:order_detail', 'storefront:order_confirmation']:
+            with self.subTest(view=view):
+                self.assertEqual(self.client.get(reverse(view, args=[other.pk])).status_code, 404)
+        self.client.logout()
+        response = self.client.get(reverse('storefront:order_confirmation', args=[other.pk]))
+        self.assertEqual(response.status_code, 302)
+
+
+class OrderSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('ana', password='pass12345', first_name='Ana')
+        self.customer = Customer.objects.create(user=self.user)
+        self.product = Product.objects.create(name='Desk Lamp', category='Home & Kitchen', price=Decimal('19.99'),
+                                              stock=10)
+
+    def test_checkout_snapshots_the_order(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('storefront:add_to_cart', args=[self.product.pk]), {'quantity': 2})
+        self.client.post(reverse('storefront:confirm_order'))
+        order = Order.objects.get(customer=self.customer)
+        data = order.summary.data
+        self.assertEqual(data['customer'], {'id': self.customer.pk, 'username': 'ana', 'name': 'Ana'})
+        self.assertEqual(data['lines'], [{'product_id': self.product.pk, 'name': 'Desk Lamp', 'quantity': 2,
+                                          'unit_price': '19.99', 'total': '39.98'}])
+        self.assertEqual((data['subtotal'], data['delivery_fee'], data['total']), ('39.98', '4.99', '44.97'))
+
+        # Past orders keep the name they were bought under
+        Product.objects.filter(pk=self.product.pk).update(name='Desk Lamp (2027 model)')
+        response = self.client.get(reverse('storefront:order_confirmation', args=[order.pk]))
+        self.assertContains(response, 'Desk Lamp')
+        self.assertNotContains(response, '2027 model')
+        with self.assertRaises(ValueError):
+            order.summary.save()
+
+    def test_backfill(self):
+        for n in range(5):
+            order = Order.objects.create(customer=self.customer, total_amount=Decimal('24.99') * (n + 1))
+            OrderItem.objects.create(order=order, product=self.product, quantity=n + 1, price=Decimal('19.99'))
+        order_summary.summarize_orders([order.pk])
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('backfill_order_summaries', batch_size=2, workers=1, stdout=out)
+        self.assertIn('4 orders without a summary, 2 batch(es)', out.getvalue())
+        # Per batch: orders, lines with product names, then one insert
+        self.assertEqual(len(queries), 1 + 2 * 3)
+        summaries = OrderSummary.objects.order_by('order_id')
+        self.assertEqual(summaries.count(), 5)
+        self.assertEqual([s.data['item_count'] for s in summaries], [1, 2, 3, 4, 5])
+        self.assertEqual(summaries[0].data['delivery_fee'], '5.00')
+
+        call_command('backfill_order_summaries', workers=1, stdout=out)
+        self.assertEqual(OrderSummary.objects.count(), 5)
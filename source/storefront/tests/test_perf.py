@@ -0,0 +1,151 @@
+from decimal import Decimal
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve, reverse
+
+from .. import ml, perf
+from ..management.commands.loadtest import compare_results, summarize
+from ..management.commands.profile_startup import by_package, parse_importtime
+from ..models import Product
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        perf.reset_stats()
+        self.products = [
+            Product.objects.create(sku=f'PERF-{i}', name=f'Item {i}', category='Books', price=Decimal('5.00'), stock=3)
+            for i in range(6)
+        ]
+
+    def server_timing(self, response):
+        return dict(
+            (part.split(';', 1) + [''])[:2] for part in response['Server-Timing'].split(', ')
+        )
+
+    def test_records_timings_per_view(self):
+        response = self.client.get(reverse('storefront:category_products', args=['Books']))
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'db', 'tpl', 'total'})
+        self.assertRegex(timing['db'], r'^dur=[\d.]+;desc="[1-9]\d* queries"$')
+        [row] = perf.view_stats()
+        self.assertEqual((row['view'], row['requests']), ('storefront:category_products', 1))
+        self.assertGreater(row['queries_avg'], 0)
+        self.assertGreater(row['template_p95_ms'], 0)
+
+    def test_async_view_queries_are_counted(self):
+        # The queries run in sync_to_async threads; the context variable follows them
+        response = async_to_sync(self.async_client.get)(
+            reverse('storefront:product_detail', args=[self.products[0].id])
+        )
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+        self.assertEqual(perf.view_stats()[0]['view'], 'storefront:product_detail')
+
+    def test_flags_repeated_queries(self):
+        def n_plus_one(request):
+            for product in self.products:
+                Product.objects.get(id=product.id)
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve(reverse('storefront:favorites'))
+        with self.assertLogs('storefront.perf', 'WARNING') as logs:
+            response = perf.PerformanceMiddleware(n_plus_one)(request)
+        self.assertEqual(self.server_timing(response)['nplus1'], 'desc="6x SELECT storefront_product"')
+        self.assertIn('Suspected N+1 in storefront:favorites', logs.output[0])
+        self.assertEqual(perf.view_stats()[0]['n_plus_one_requests'], 1)
+
+    @override_settings(PERF_SERVER_TIMING='staff')
+    def test_only_staff_see_timings_in_production(self):
+        url = reverse('storefront:category_products', args=['Books'])
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        self.client.force_login(User.objects.create_user('shopper'))
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertIn('Server-Timing', self.client.get(url))
+        self.async_client.force_login(staff)
+        response = async_to_sync(self.async_client.get)(reverse('storefront:product_detail', args=[self.products[0].id]))
+        self.assertIn('Server-Timing', response)
+        # Recorded either way, for the admin performance page
+        self.assertEqual(sum(row['requests'] for row in perf.view_stats()), 4)
+
+    def test_requests_without_a_view_are_not_recorded(self):
+        response = self.client.get('/no-such-page/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(perf.view_stats(), [])
+
+
+class LoadTestResultsTests(SimpleTestCase):
+    def results(self, p95_ms, queries):
+        samples = {'checkout': [(p95_ms / 1000, queries, True)] * 20, 'dashboard': [(0.01, 3, True)] * 5}
+        return summarize(samples, elapsed=2.0)
+
+    def test_summary(self):
+        results = self.results(50, 5)
+        self.assertEqual(results['requests'], 25)
+        self.assertEqual(results['throughput_rps'], 12.5)
+        self.assertEqual(results['views']['checkout']['p95_ms'], 50.0)
+        self.assertEqual(results['views']['checkout']['queries_avg'], 5.0)
+        self.assertEqual(list(results['views']), ['checkout', 'dashboard'])
+
+    def test_compare_flags_slower_views_and_extra_queries(self):
+        baseline = self.results(50, 5)
+        self.assertEqual(compare_results(baseline, self.results(60, 5)), [])
+        self.assertEqual(compare_results(baseline, self.results(80, 5)), ['checkout: p95 50.0ms -> 80.0ms'])
+        self.assertEqual(compare_results(baseline, self.results(50, 7)), ['checkout: queries 5.0 -> 7.0 per request'])
+        # Small absolute changes on fast views are noise
+        self.assertEqual(compare_results(self.results(2, 5), self.results(4, 5)), [])
+
+    def test_compare_mode_fails_on_regression(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        paths = {}
+        for name, p95_ms in [('baseline', 50), ('current', 100)]:
+            paths[name] = os.path.join(workdir, f'{name}.json')
+            with open(paths[name], 'w') as f:
+                json.dump(self.results(p95_ms, 5), f)
+        call_command('loadtest', results=paths['baseline'], compare=paths['baseline'], stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'checkout: p95 50.0ms -> 100.0ms'):
+            call_command('loadtest', results=paths['current'], compare=paths['baseline'], stdout=StringIO())
+
+
+class StartupTests(SimpleTestCase):
+    def test_models_load_once_on_first_use(self):
+        self.addCleanup(ml._models.clear)
+        ml._models.clear()
+        with mock.patch('joblib.load', return_value='tree') as load:
+            self.assertEqual(ml.get_model('decision_tree'), 'tree')
+            self.assertEqual(ml.get_model('decision_tree'), 'tree')
+        load.assert_called_once()
+
+        ml._models.clear()
+        with mock.patch('joblib.load', side_effect=ValueError('bad pickle')), mock.patch('builtins.print'):
+            self.assertIsNone(ml.get_model('decision_tree'))
+
+    def test_parse_importtime(self):
+        modules = parse_importtime(
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |     django.utils.version\n"
+            "import time:       300 |        420 |   django\n"
+            "import time:      2000 |       2000 | joblib\n"
+        )
+        self.assertEqual(modules[1], ('django', 300, 420, 1))
+        self.assertEqual(by_package(modules), {'joblib': 2000, 'django': 420})
+
+    def test_startup_does_not_import_ml_libraries(self):
+        out = StringIO()
+        call_command('profile_startup', runs=1, forbid=['joblib', 'sklearn'], stdout=out)
+        self.assertIn('Startup within budget', out.getvalue())
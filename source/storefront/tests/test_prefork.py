@@ -0,0 +1,72 @@
+from decimal import Decimal
+import threading
+from unittest import mock
+import urllib.request
+
+from django.test import TestCase
+
+from .. import prefork, product_cache, product_search, restock, sessions
+from ..models import Product
+
+
+class PreforkServerTests(TestCase):
+    def test_worker_serves_on_its_pool_until_max_requests(self):
+        sock = prefork.bind('127.0.0.1', 0)
+        self.addCleanup(sock.close)
+        threads = []
+
+        def application(environ, start_response):
+            threads.append(threading.current_thread().name)
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [b'ok']
+
+        server = prefork.PoolWSGIServer(sock, application, threads=2, max_requests=3, timeout=5)
+        worker = threading.Thread(target=server.serve)
+        with mock.patch.object(prefork.WSGIRequestHandler, 'log_message'):
+            worker.start()
+            for _ in range(3):
+                with urllib.request.urlopen(f'http://127.0.0.1:{sock.getsockname()[1]}/', timeout=5) as response:
+                    self.assertEqual(response.read(), b'ok')
+            # The worker stops by itself after its last request
+            worker.join(timeout=5)
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(len(threads), 3)
+        self.assertTrue(all(name.startswith('request') for name in threads))
+
+    def test_preload_loads_before_forking(self):
+        Product.objects.create(name='Lamp', category='Home & Kitchen', price=Decimal('9.00'), stock=3)
+        self.addCleanup(product_search.reset_index)
+        self.addCleanup(product_cache.get_cache().clear)
+        with mock.patch.object(prefork.gc, 'freeze') as freeze, \
+                mock.patch.object(prefork.connections, 'close_all') as close_all, \
+                mock.patch('storefront.ml.get_model', return_value=None):
+            application, steps = prefork.preload()
+        self.assertTrue(callable(application))
+        details = {label: detail for label, _, detail in steps}
+        self.assertEqual(details['product cache'], '1 products')
+        self.assertEqual(details['AuroBot intents and search index'], '1 products indexed')
+        self.assertNotIn('failed', ' '.join(details.values()))
+        close_all.assert_called_once()
+        freeze.assert_called_once()
+
+    def test_exiting_worker_finishes_queued_work(self):
+        calls = []
+        with mock.patch.object(restock, 'shutdown_executor', side_effect=lambda: calls.append('restock')), \
+                mock.patch('storefront.images.shutdown_executor', side_effect=RuntimeError('disk full')), \
+                mock.patch.object(sessions, 'flush_dirty_sessions', side_effect=lambda: calls.append('sessions')), \
+                self.assertLogs('storefront.prefork', 'ERROR'):
+            prefork.finish_worker()
+        # One failing step does not stop the others; sessions go last
+        self.assertEqual(calls, ['restock', 'sessions'])
+
+    def test_new_worker_catches_up_the_search_index(self):
+        Product.objects.create(name='Desk Lamp', category='Home & Kitchen', price=Decimal('9.00'), stock=3)
+        chair = Product.objects.create(name='Chair', category='Home & Kitchen', price=Decimal('40.00'), stock=3)
+        self.addCleanup(product_search.reset_index)
+        index = product_search.get_index()
+        # Renamed by another process after the master built its index
+        with mock.patch.object(product_search, '_index', None), self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(pk=chair.pk).update(name='Desk Chair')
+        with self.assertNumQueries(1):
+            prefork.start_worker()
+        self.assertIn(chair.pk, [pk for pk, _ in index.search('desk')])
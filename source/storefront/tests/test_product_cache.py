@@ -0,0 +1,150 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import product_cache
+from ..images import record_dimensions
+from ..models import Product, ProductQuerySet, Customer, Cart, CartItem, Order, products_updated
+from ..routers import allow_replica_reads
+
+
+class ProductCacheTests(TestCase):
+    def setUp(self):
+        product_cache.get_cache().clear()
+        product_cache.reset_stats()
+        self.lamp = Product.objects.create(name='Lamp', category='Home & Kitchen', price=Decimal('20.00'), stock=5)
+        self.book = Product.objects.create(name='Novel', category='Books', price=Decimal('12.00'), stock=2,
+                                           image='products/novel.jpg')
+
+    def test_read_through_and_hit_ratio(self):
+        self.assertEqual(product_cache.get_product(self.lamp.id).name, 'Lamp')
+        with self.assertNumQueries(0):
+            self.assertEqual(product_cache.get_product(self.lamp.id).name, 'Lamp')
+        self.assertIsNone(product_cache.get_product(999999))
+        stats = product_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertAlmostEqual(stats['hit_ratio'], 1 / 3)
+
+    def test_multi_get_is_batched(self):
+        with self.assertNumQueries(1):
+            products = product_cache.get_products([self.lamp.id, self.book.id, self.lamp.id])
+        self.assertEqual(set(products), {self.lamp.id, self.book.id})
+        with self.assertNumQueries(0):
+            product_cache.get_products([self.book.id, self.lamp.id])
+
+    def test_invalidated_on_save_update_and_delete(self):
+        product_cache.get_products([self.lamp.id, self.book.id])
+
+        self.lamp.price = Decimal('25.00')
+        self.lamp.save()
+        self.assertEqual(product_cache.get_product(self.lamp.id).price, Decimal('25.00'))
+
+        Product.objects.filter(id=self.lamp.id).update(stock=F('stock') - 2)
+        self.assertEqual(product_cache.get_product(self.lamp.id).stock, 3)
+
+        record_dimensions(Product, self.book.id, self.book.image.name, 800, 600)
+        self.assertEqual(product_cache.get_product(self.book.id).image_width, 800)
+
+        book_id = self.book.id
+        self.book.delete()
+        self.assertIsNone(product_cache.get_product(book_id))
+
+    def test_fill_racing_an_invalidation_is_not_cached(self):
+        real_in_bulk = ProductQuerySet.in_bulk
+
+        def in_bulk_then_write(queryset, ids):
+            loaded = real_in_bulk(queryset, ids)
+            # A writer updates the row after we read it
+            Product.objects.filter(id=self.lamp.id).update(stock=0)
+            return loaded
+
+        with mock.patch.object(ProductQuerySet, 'in_bulk', autospec=True, side_effect=in_bulk_then_write):
+            self.assertEqual(product_cache.get_product(self.lamp.id).stock, 5)
+        self.assertEqual(product_cache.get_product(self.lamp.id).stock, 0)
+
+    def test_invalidation_just_before_the_fill_writes_is_undone(self):
+        cache = product_cache.get_cache()
+        real_set_many = cache.set_many
+
+        def invalidate_then_set_many(data, *args, **kwargs):
+            # The writer lands after the fill checked its lock, before it writes
+            Product.objects.filter(id=self.lamp.id).update(stock=0)
+            return real_set_many(data, *args, **kwargs)
+
+        with mock.patch.object(cache, 'set_many', side_effect=invalidate_then_set_many):
+            self.assertEqual(product_cache.get_product(self.lamp.id).stock, 5)
+        self.assertIsNone(cache.get(product_cache.product_key(self.lamp.id)))
+        self.assertEqual(product_cache.get_product(self.lamp.id).stock, 0)
+
+    def test_update_reads_ids_only_for_receivers(self):
+        with mock.patch.object(products_updated, 'has_listeners', return_value=False), self.assertNumQueries(1):
+            self.assertEqual(Product.objects.filter(stock__gt=0).update(price=Decimal('1.00')), 2)
+        with mock.patch.object(products_updated, 'send') as send:
+            self.assertEqual(Product.objects.update(stock=0), 2)
+        send.assert_called_once_with(sender=Product, ids=mock.ANY, fields=['stock'], out_of_stock=[])
+        self.assertCountEqual(send.call_args.kwargs['ids'], [self.lamp.id, self.book.id])
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_fills_read_the_primary(self):
+        # 'replica' is not a configured database: routing a fill there would fail
+        with allow_replica_reads():
+            self.assertEqual(product_cache.get_product(self.lamp.id).name, 'Lamp')
+
+    def test_waits_for_concurrent_fill(self):
+        cache = product_cache.get_cache()
+        # Another request is already loading this key
+        cache.add(product_cache.lock_key(self.lamp.id), 'other', product_cache.LOCK_TIMEOUT)
+        with mock.patch.object(product_cache, 'WAIT_TIMEOUT', 0.05):
+            self.assertEqual(product_cache.get_product(self.lamp.id).name, 'Lamp')
+        self.assertEqual(product_cache.stats()['waits'], 1)
+        # The waiter loaded it without caching; the lock holder still owns the key
+        self.assertIsNone(cache.get(product_cache.product_key(self.lamp.id)))
+
+    def test_checkout_decrements_stock_atomically(self):
+        user = User.objects.create_user('shopper', password='pass12345')
+        customer = Customer.objects.create(user=user)
+        cart = Cart.objects.create(customer=customer)
+        CartItem.objects.create(cart=cart, product=self.lamp, quantity=2)
+        CartItem.objects.create(cart=cart, product=self.book, quantity=2)
+        self.client.force_login(user)
+        product_cache.get_products([self.lamp.id, self.book.id])
+
+        # Someone else buys the last books after our cart was priced
+        Product.objects.filter(id=self.book.id).update(stock=1)
+        with mock.patch('storefront.views.get_cart_items') as get_items:
+            items = list(cart.items.select_related('product'))
+            for item in items:
+                item.product.stock = 5
+            get_items.return_value = items
+            response = self.client.post(reverse('storefront:confirm_order'))
+        self.assertRedirects(response, reverse('storefront:cart'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Product.objects.get(id=self.lamp.id).stock, 5)
+
+        Product.objects.filter(id=self.book.id).update(stock=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('storefront:confirm_order'))
+        self.assertEqual(product_cache.get_product(self.lamp.id).stock, 3)
+        self.assertEqual(product_cache.get_product(self.book.id).stock, 0)
+        self.assertFalse(cart.items.exists())
+
+    def test_checkout_charges_the_current_price(self):
+        user = User.objects.create_user('shopper', password='pass12345')
+        cart = Cart.objects.create(customer=Customer.objects.create(user=user))
+        CartItem.objects.create(cart=cart, product=self.lamp, quantity=2)
+        self.client.force_login(user)
+        product_cache.get_product(self.lamp.id)
+        # Repriced behind the cache's back, as a replica or another process might still see it
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE storefront_product SET price = %s WHERE id = %s', ['30.00', self.lamp.id])
+        self.assertEqual(product_cache.get_product(self.lamp.id).price, Decimal('20.00'))
+
+        self.client.post(reverse('storefront:confirm_order'))
+        order = Order.objects.get()
+        self.assertEqual(order.items.get().price, Decimal('30.00'))
+        self.assertEqual(order.total_amount, Decimal('64.99'))
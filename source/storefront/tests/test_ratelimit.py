@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import ratelimit
+
+
+class RateLimitTests(TestCase):
+    LIMITS = {
+        'storefront:aurabot_reply': {'rate': '1/m', 'burst': 2, 'priority': 'low'},
+        'accounts:login': {'rate': '1/h', 'burst': 1, 'methods': ['POST'], 'priority': 'high'},
+    }
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+
+    def test_token_bucket(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        for store in [ratelimit.CacheBuckets(), ratelimit.SharedMemoryBuckets(os.path.join(workdir, 'b'), slots=64)]:
+            with self.subTest(store=type(store).__name__):
+                takes = [store.take('k', 1.0, 2, now) for now in (100, 100, 100, 100.5, 101, 101)]
+                self.assertEqual(takes, [0, 0, 1.0, 0.5, 0, 1.0])
+                self.assertEqual(store.take('other', 1.0, 2, 101), 0)
+
+    def test_shared_table_reuses_refilled_slots(self):
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        store = ratelimit.SharedMemoryBuckets(os.path.join(workdir, 'b'), slots=4)
+        for n in range(4):
+            store.take(f'client{n}', 1.0, 1, 100)
+        # All slots are refilled (and reusable) a second later
+        self.assertEqual([store.take(f'new{n}', 1.0, 1, 101) for n in range(4)], [0, 0, 0, 0])
+
+    @override_settings(RATE_LIMITS=LIMITS)
+    def test_429_with_retry_after_per_client(self):
+        def ask(**extra):
+            return self.client.post(reverse('storefront:aurabot_reply'), data=json.dumps({'message': 'hi'}),
+                                    content_type='application/json', **extra)
+
+        self.assertEqual([ask().status_code, ask().status_code], [200, 200])
+        response = ask()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(ask(REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+        self.client.force_login(User.objects.create_user('chatty', password='pass12345'))
+        self.assertEqual(ask().status_code, 200)
+
+    @override_settings(RATE_LIMITS=LIMITS)
+    def test_only_listed_methods_are_limited(self):
+        login = reverse('accounts:login')
+        self.client.post(login, {'username': 'x', 'password': 'y'})
+        self.assertEqual(self.client.post(login, {'username': 'x', 'password': 'y'}).status_code, 429)
+        self.assertEqual(self.client.get(login).status_code, 200)
+
+    @override_settings(RATE_LIMITS=LIMITS, LOAD_SHED_LIMITS={'low': 4, 'normal': 8}, LOAD_SHED_RETRY_AFTER=3)
+    def test_sheds_low_priority_first(self):
+        with mock.patch.object(ratelimit, '_inflight', 5):
+            response = self.client.post(reverse('storefront:aurabot_reply'), data='{}', content_type='application/json')
+            self.assertEqual((response.status_code, response['Retry-After']), (503, '3'))
+            self.assertEqual(self.client.get(reverse('storefront:index')).status_code, 200)
+        with mock.patch.object(ratelimit, '_inflight', 9):
+            self.assertEqual(self.client.get(reverse('storefront:index')).status_code, 503)
+            self.assertEqual(self.client.get(reverse('accounts:login')).status_code, 200)
+        self.assertEqual(ratelimit.inflight(), 0)
@@ -0,0 +1,103 @@
+from decimal import Decimal
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import restock
+from ..models import Product, Favorite
+
+
+@override_settings(RESTOCK_NOTIFY_WORKERS=0, RESTOCK_PRODUCT_BATCH=2, RESTOCK_EMAIL_CHUNK=2)
+class RestockNotificationTests(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(name=f'Kettle {n}', category='Home & Kitchen', price=Decimal('30.00'), stock=0)
+            for n in range(3)
+        ]
+        self.users = [User.objects.create_user(f'fan{n}', email=f'fan{n}@example.com') for n in range(3)]
+        for user in self.users:
+            for product in self.products:
+                Favorite.objects.create(user=user, product=product, notify_when_available=user != self.users[2])
+        # Favorited without asking to be notified, and no email address
+        Favorite.objects.filter(user=self.users[2]).update(notify_when_available=False)
+        Favorite.objects.create(user=User.objects.create_user('noemail'), product=self.products[0],
+                                notify_when_available=True)
+
+    def test_save_from_zero_notifies_once(self):
+        product = Product.objects.get(pk=self.products[0].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock = 5
+            product.save()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['fan0@example.com', 'fan1@example.com'])
+        self.assertIn('Kettle 0 is back in stock', mail.outbox[0].subject)
+        self.assertIn(f'/product/{product.pk}/', mail.outbox[0].body)
+
+        # Still in stock, then sold out and restocked: nobody is waiting any more
+        with self.captureOnCommitCallbacks(execute=True):
+            product.stock = 8
+            product.save()
+            Product.objects.filter(pk=product.pk).update(stock=0)
+            Product.objects.filter(pk=product.pk).update(stock=3)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_bulk_update_batches_and_chunks(self):
+        # A product that sells out again before the notifier runs is skipped
+        with self.captureOnCommitCallbacks() as callbacks:
+            Product.objects.filter(pk__in=[p.pk for p in self.products]).update(stock=10)
+            Product.objects.filter(pk=self.products[2].pk).update(stock=F('stock') - 10)
+        with CaptureQueriesContext(connection) as queries:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual({m.subject for m in mail.outbox}, {'Kettle 0 is back in stock', 'Kettle 1 is back in stock'})
+        subscriber_reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'auth_user' in q['sql']]
+        # 3 products in batches of 2, but the second batch has nothing in stock left
+        self.assertEqual(len(subscriber_reads), 1)
+        self.assertFalse(Favorite.objects.filter(product__in=self.products[:2], notify_when_available=True)
+                         .exclude(user__email='').exists())
+        self.assertTrue(Favorite.objects.get(product=self.products[2], user=self.users[0]).notify_when_available)
+
+    def test_racing_notifiers_send_each_email_once(self):
+        Product.objects.filter(pk=self.products[0].pk).update(stock=5)
+        real_claim = restock.claim
+        rivals = []
+
+        def claim_after_rival(ids):
+            # Another worker notifies for the same product between our read and our claim
+            if not rivals:
+                rivals.append(True)
+                restock.send_restock_notifications([self.products[0].pk])
+            return real_claim(ids)
+
+        with mock.patch.object(restock, 'claim', side_effect=claim_after_rival):
+            restock.send_restock_notifications([self.products[0].pk])
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['fan0@example.com', 'fan1@example.com'])
+
+    def test_failed_send_keeps_the_flags(self):
+        Product.objects.filter(pk=self.products[0].pk).update(stock=5)
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError):
+            with self.assertRaises(OSError):
+                restock.send_restock_notifications([self.products[0].pk])
+        self.assertEqual(Favorite.objects.filter(product=self.products[0], notify_when_available=True).count(), 3)
+
+    def test_checkbox_sets_the_flag(self):
+        user = User.objects.create_user('shopper', password='pass12345', email='s@example.com')
+        self.client.force_login(user)
+        url = reverse('storefront:set_restock_alert', args=[self.products[1].pk])
+        data = self.client.post(url, data=json.dumps({'notify': True}), content_type='application/json').json()
+        self.assertEqual(data, {'is_favorite': True, 'notify': True})
+        self.assertTrue(Favorite.objects.get(user=user, product=self.products[1]).notify_when_available)
+        response = self.client.get(reverse('storefront:product_detail', args=[self.products[1].pk]))
+        self.assertTrue(response.context['notify_when_available'])
+
+        for body in ['{not json', '[true]', '"notify"']:
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post(url, data=body, content_type='application/json').status_code, 400)
+        self.assertTrue(Favorite.objects.get(user=user, product=self.products[1]).notify_when_available)
@@ -0,0 +1,100 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import sessions
+from ..models import Product
+
+
+class CoalescingSessionTests(TestCase):
+    def setUp(self):
+        Product.objects.create(name='Lamp', category='Home & Kitchen', price=Decimal('20.00'), stock=5)
+
+    def session_writes(self, func):
+        writes = []
+
+        def record(execute, sql, params, many, context):
+            if 'django_session' in sql and sql.lstrip().upper().startswith(('INSERT', 'UPDATE')):
+                writes.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            func()
+        return len(writes)
+
+    def browse(self, pages=10):
+        for _ in range(pages):
+            self.client.get(reverse('storefront:category_products', args=['Home & Kitchen']))
+
+    def stored_session(self):
+        store = sessions.SessionStore(self.client.cookies['sessionid'].value)
+        return store.decode(store._get_session_from_db().session_data)
+
+    def test_browsing_coalesces_session_writes(self):
+        # Only creating the session touches the table
+        self.assertEqual(self.session_writes(self.browse), 1)
+        self.assertEqual(self.client.session['category_clicks'], {'Home & Kitchen': 10})
+        self.assertEqual(self.stored_session()['category_clicks'], {'Home & Kitchen': 1})
+
+        self.assertGreaterEqual(sessions.flush_dirty_sessions(), 1)
+        self.assertEqual(self.stored_session()['category_clicks'], {'Home & Kitchen': 10})
+
+    def test_save_during_flush_is_not_lost(self):
+        self.browse(2)
+        key = self.client.cookies['sessionid'].value
+        db_save = sessions.DBStore.save
+
+        def save_then_browse(store, *args, **kwargs):
+            db_save(store, *args, **kwargs)
+            if not interleaved:
+                # Another request saves the session between the flush's database write and its cache update
+                interleaved.append(True)
+                self.browse(1)
+
+        interleaved = []
+        with mock.patch.object(sessions.DBStore, 'save', autospec=True, side_effect=save_then_browse):
+            sessions.SessionStore(key).flush_dirty()
+        self.assertEqual(self.stored_session()['category_clicks'], {'Home & Kitchen': 2})
+        self.assertEqual(self.client.session['category_clicks'], {'Home & Kitchen': 3})
+        # The newer change is still pending and goes out with the next flush
+        self.assertIn(key, sessions._dirty)
+        sessions.flush_dirty_sessions()
+        self.assertEqual(self.stored_session()['category_clicks'], {'Home & Kitchen': 3})
+
+    def test_flusher_thread_starts_once_per_process(self):
+        with mock.patch.object(sessions, '_flusher_enabled', True), \
+                mock.patch.object(sessions, '_flusher_pid', None), \
+                mock.patch('storefront.sessions.threading.Thread') as thread:
+            self.browse(3)
+            thread.assert_called_once_with(target=sessions._flush_periodically, name='session-flusher', daemon=True)
+            # A forked worker starts its own
+            with mock.patch('storefront.sessions.os.getpid', return_value=-1):
+                self.browse(1)
+            self.assertEqual(thread.call_count, 2)
+
+    @override_settings(SESSION_FLUSH_INTERVAL=0)
+    def test_interval_elapsed_writes_through(self):
+        self.assertEqual(self.session_writes(lambda: self.browse(3)), 3)
+
+    def test_login_and_checkout_write_through(self):
+        self.browse(2)
+        user = User.objects.create_user('shopper', password='pass12345')
+        self.client.login(username='shopper', password='pass12345')
+        self.assertEqual(self.stored_session()['_auth_user_id'], str(user.id))
+
+        self.browse(1)
+        store = sessions.SessionStore(self.client.cookies['sessionid'].value)
+        store['checkout'] = True
+        sessions.persist_session(store)
+        self.assertEqual(self.session_writes(store.save), 1)
+
+    def test_logout_removes_session_everywhere(self):
+        User.objects.create_user('shopper', password='pass12345')
+        self.client.login(username='shopper', password='pass12345')
+        key = self.client.cookies['sessionid'].value
+        self.client.logout()
+        self.assertFalse(sessions.SessionStore().exists(key))
@@ -0,0 +1,54 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..staticfiles import check_static_references
+
+
+class StaticAssetTests(TestCase):
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        from django.conf import settings
+        override = override_settings(
+            STATIC_ROOT=static_root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'storefront.staticfiles.CompressedManifestStaticFilesStorage'},
+            },
+            MIDDLEWARE=['storefront.staticfiles.StaticAssetMiddleware'] + settings.MIDDLEWARE,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.static_root = static_root
+
+    def test_template_references_resolve_to_hashed_names(self):
+        self.assertEqual(check_static_references(None), [])
+        self.assertRegex(staticfiles_storage.url('img/auroramart_logo.png'), r'auroramart_logo\.[0-9a-f]{12}\.png$')
+
+    def test_missing_reference_is_reported(self):
+        with mock.patch('storefront.staticfiles.find_static_references',
+                        return_value=[('index.html', 'img/missing.png')]):
+            errors = check_static_references(None)
+        self.assertEqual([e.id for e in errors], ['storefront.E001'])
+
+    def test_text_assets_are_precompressed(self):
+        hashed = staticfiles_storage.stored_name('admin/css/base.css')
+        self.assertTrue(os.path.exists(os.path.join(self.static_root, hashed + '.gz')))
+
+    def test_hashed_files_are_served_immutable_and_compressed(self):
+        url = staticfiles_storage.url('admin/css/base.css')
+        resp = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(resp['Content-Encoding'], 'gzip')
+        self.assertEqual(resp['Vary'], 'Accept-Encoding')
+        # Unhashed names are still served, but only briefly cached
+        resp = self.client.get('/static/admin/css/base.css')
+        self.assertEqual(resp['Cache-Control'], 'public, max-age=60')
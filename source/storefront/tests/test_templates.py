@@ -0,0 +1,50 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Product
+
+
+class ProductCardTests(TestCase):
+    def setUp(self):
+        caches['template_fragments'].clear()
+        self.product = Product.objects.create(
+            sku='CARD', name='Kettle', category='Home & Kitchen', price=Decimal('30.00'), stock=5,
+            rating=Decimal('4.5'), image='products/kettle.jpg',
+        )
+
+    def render(self, **context):
+        product = Product.objects.get(pk=self.product.pk)
+        return render_to_string('storefront/includes/product_card.html', {'product': product, **context})
+
+    def test_card_is_cached_per_product_version(self):
+        html = self.render()
+        self.assertIn('SGD $30.00', html)
+        with mock.patch('storefront.templatetags.storefront_images.image_srcset') as srcset:
+            self.assertEqual(self.render(), html)
+        srcset.assert_not_called()
+
+        # Price, stock and image changes each render a new card
+        Product.objects.filter(pk=self.product.pk).update(price=Decimal('25.00'))
+        self.assertIn('SGD $25.00', self.render())
+        Product.objects.filter(pk=self.product.pk).update(image_width=1600)
+        self.assertIn('kettle-640w.webp', self.render())
+        Product.objects.filter(pk=self.product.pk).update(stock=3)
+        self.assertIn('Low Stock', self.render(variant='favorite'))
+
+    def test_variants(self):
+        listing = self.render()
+        self.assertIn('⭐ 4.5', listing)
+        self.assertNotIn('In Stock', listing)
+        favorite = self.render(variant='favorite')
+        self.assertIn('Low Stock', favorite)
+        self.assertNotIn('⭐', favorite)
+
+    def test_pages_use_the_shared_card(self):
+        response = self.client.get(reverse('storefront:category_products', args=['Home & Kitchen']))
+        self.assertTemplateUsed(response, 'storefront/includes/product_card.html')
+        self.assertContains(response, reverse('storefront:product_detail', args=[self.product.id]))
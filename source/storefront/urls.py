@@ -16,7 +16,11 @@ urlpatterns = [
     path('checkout/', views.checkout, name='checkout'),
     path('checkout/confirm/', views.confirm_order, name='confirm_order'),
     path('order/<int:order_id>/', views.order_confirmation, name='order_confirmation'),
+    path('orders/', views.order_history, name='order_history'),
+    path('orders/<int:order_id>/', views.order_detail, name='order_detail'),
     path('favorites/', views.favorites, name='favorites'),
     path('favorites/toggle/<int:product_id>/', views.toggle_favorite, name='toggle_favorite'),
+    path('favorites/notify/<int:product_id>/', views.set_restock_alert, name='set_restock_alert'),
     path('aurabot/', views.aurabot_reply, name='aurabot_reply'),
+    path('aurabot/stream/', views.aurabot_stream, name='aurabot_stream'),
 ]
@@ -1,37 +1,65 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, Q
+from . import chat, orders
+from .events import publish_order
+from .ml import get_model
+from .order_summary import snapshot_order
+from .product_cache import get_product, get_products
+from .sessions import persist_session
 from .models import Product, Customer, Cart, CartItem, Order, OrderItem, Favorite
 from django.contrib.auth.models import User
 from decimal import Decimal
-import joblib
-import os
 import json
 from django.conf import settings
 import random
+import asyncio
 
-# Load ML models
-decision_tree_model = None
-association_rules = None
-
-try:
-    dt_path = os.path.join(settings.BASE_DIR, 'ml_models', 'decision_tree_model.joblib')
-    ar_path = os.path.join(settings.BASE_DIR, 'ml_models', 'association_rules_model.joblib')
-    if os.path.exists(dt_path):
-        decision_tree_model = joblib.load(dt_path)
-    if os.path.exists(ar_path):
-        association_rules = joblib.load(ar_path)
-except Exception as e:
-    print(f"Warning: Could not load ML models: {e}")
-
-def index(request):
+def listable(queryset):
+    """In-stock products that have an image"""
+    return queryset.filter(stock__gt=0, image__isnull=False).exclude(image='')
+
+def in_category(name):
+    """
+    Products in category ``name`` or in its subcategories ("Fashion" covers
+    "Fashion - Men"). Both are ranges on product_category_stock_idx; a
+    LIKE '%name%' would read every product.
+    """
+    prefix = f'{name} - '
+    return Q(category=name) | Q(category__gte=prefix, category__lt=prefix + '\U0010ffff')
+
+def category_matches(category, name):
+    """Python version of in_category() for one category value"""
+    return category == name or category.startswith(f'{name} - ')
+
+async def random_products(queryset, limit=6):
+    return [p async for p in queryset.order_by('?')[:limit]]
+
+async def get_customer_async(user):
+    if not user.is_authenticated:
+        return None
+    return await Customer.objects.filter(user=user).afirst()
+
+async def get_cart_count_async(user):
+    """Number of lines in the user's cart (0 without a customer or cart)"""
+    if not user.is_authenticated:
+        return 0
+    return await CartItem.objects.filter(cart__customer__user=user).acount()
+
+async def index(request):
     """Home page showing featured products - adaptive by user's browsing, with fallbacks"""
     # Clear any old messages when loading the homepage
     storage = messages.get_messages(request)
     storage.used = True
+
+    # Resolve the user here; templates must not trigger a sync lookup
+    user = request.user = await request.auser()
     
     featured_products = None
     is_personalized = False
@@ -39,7 +67,8 @@ def index(request):
     # 1) Adaptive featured products based on user's most-viewed categories (session-based)
     #    - Consider the top 2-3 most-clicked categories
     #    - Randomize products within those categories each refresh
-    category_clicks = request.session.get('category_clicks', {})
+    category_clicks = await request.session.aget('category_clicks', {})
+    frequent_cats = []
     if category_clicks:
         try:
             # Sort categories by clicks desc
@@ -49,70 +78,61 @@ def index(request):
             frequent_cats = [c for c, n in sorted_cats if n >= 0.8 * max_clicks]
             # Limit to top 3 frequent categories
             frequent_cats = frequent_cats[:3]
+        except Exception:
+            frequent_cats = []
 
+    async def session_featured():
+        if not frequent_cats:
+            return None
+        try:
             # Randomized selection from these categories
-            featured_products = (
-                Product.objects.filter(category__in=frequent_cats, stock__gt=0, image__isnull=False)
-                .exclude(image='')
-                .order_by('?')[:6]
-            )
-            if featured_products:
-                is_personalized = True
+            return await random_products(listable(Product.objects.filter(category__in=frequent_cats)))
         except Exception:
-            featured_products = None
+            return None
+
+    # Independent queries run concurrently
+    featured_products, customer, cart_count = await asyncio.gather(
+        session_featured(),
+        get_customer_async(user),
+        get_cart_count_async(user),
+    )
+    if featured_products:
+        is_personalized = True
 
     # 2) If none from session, try ML personalization as before (if profile available)
-    if not featured_products and request.user.is_authenticated:
-        try:
-            customer = Customer.objects.get(user=request.user)
-            if customer.age and customer.gender and customer.gender != 'P':
-                income_map = {
-                    'Below 30k': 1,
-                    '30k-60k': 2,
-                    '60k-100k': 3,
-                    'Above 100k': 3,
-                }
-                income_level = income_map.get(customer.income_range, 2)
-                gender_numeric = 1 if customer.gender == 'F' else 0
-                predicted_category = None
-                if decision_tree_model is not None:
-                    try:
-                        features = [[customer.age, gender_numeric, income_level]]
-                        predicted_category = decision_tree_model.predict(features)[0]
-                    except Exception as e:
-                        print(f"Error predicting category: {e}")
-                if predicted_category:
-                    featured_products = (
-                        Product.objects.filter(category__icontains=predicted_category, stock__gt=0, image__isnull=False)
-                        .exclude(image='')
-                        .order_by('?')[:6]
-                    )
-                    if featured_products:
-                        is_personalized = True
-        except Customer.DoesNotExist:
-            pass
+    if not featured_products and customer is not None:
+        if customer.age and customer.gender and customer.gender != 'P':
+            income_map = {
+                'Below 30k': 1,
+                '30k-60k': 2,
+                '60k-100k': 3,
+                'Above 100k': 3,
+            }
+            income_level = income_map.get(customer.income_range, 2)
+            gender_numeric = 1 if customer.gender == 'F' else 0
+            predicted_category = None
+            # The first call imports and unpickles the model; keep that off the event loop
+            decision_tree_model = await sync_to_async(get_model)('decision_tree')
+            if decision_tree_model is not None:
+                try:
+                    features = [[customer.age, gender_numeric, income_level]]
+                    predicted_category = decision_tree_model.predict(features)[0]
+                except Exception as e:
+                    print(f"Error predicting category: {e}")
+            if predicted_category:
+                featured_products = await random_products(
+                    listable(Product.objects.filter(in_category(predicted_category)))
+                )
+                if featured_products:
+                    is_personalized = True
 
     # 3) First-time or no personalization: random high-quality picks (with images)
     if not featured_products:
-        featured_products = (
-            Product.objects.filter(stock__gt=0, image__isnull=False)
-            .exclude(image='')
-            .order_by('?')[:6]
-        )
+        featured_products = await random_products(listable(Product.objects.all()))
     
     # Show only 3 categories on home page
     categories = ['Beauty & Personal Care', 'Home & Kitchen', 'Fashion']
     
-    # Get cart count if user is logged in
-    cart_count = 0
-    if request.user.is_authenticated:
-        try:
-            customer = Customer.objects.get(user=request.user)
-            cart = Cart.objects.get(customer=customer)
-            cart_count = cart.items.count()
-        except:
-            cart_count = 0
-    
     context = {
         'featured_products': featured_products,
         'categories': categories,
@@ -133,6 +153,18 @@ def get_or_create_cart(customer):
     cart, created = Cart.objects.get_or_create(customer=customer)
     return cart
 
+def get_cart_items(cart):
+    """Cart items with their products filled in from the product cache"""
+    cart_items = list(cart.items.all())
+    products = get_products(item.product_id for item in cart_items)
+    for item in cart_items:
+        if item.product_id in products:
+            item.product = products[item.product_id]
+    return cart_items
+
+class OutOfStock(Exception):
+    pass
+
 @login_required
 def onboarding(request):
     """Onboarding page for new users - collects demographics and predicts preferred category"""
@@ -162,6 +194,7 @@ def onboarding(request):
         
         # Predict preferred category using decision tree
         preferred_category = None
+        decision_tree_model = get_model('decision_tree')
         if decision_tree_model is not None:
             try:
                 # Prepare features for decision tree
@@ -209,13 +242,15 @@ def category_list(request):
         'Toys & Games',
     ]
     
-    categories = []
-    for cat_name in category_names:
-        count = Product.objects.filter(category__icontains=cat_name).count()
-        categories.append({
+    # Product counts for every stored category in one grouped query
+    counts = list(Product.objects.order_by().values('category').annotate(count=Count('id')))
+    categories = [
+        {
             'name': cat_name,
-            'count': count,
-        })
+            'count': sum(row['count'] for row in counts if category_matches(row['category'], cat_name)),
+        }
+        for cat_name in category_names
+    ]
     
     context = {'categories': categories}
     return render(request, 'storefront/category_list.html', context)
@@ -263,7 +298,7 @@ def category_products(request, category_name):
     
     # Base query for all products in category (only with images)
     products_query = Product.objects.filter(
-        category__icontains=category_name,
+        in_category(category_name),
         stock__gt=0
     ).exclude(image='')
     
@@ -314,7 +349,7 @@ def category_products(request, category_name):
     try:
         # Get top 3 recommendations for this category (only with images)
         recommendations = list(Product.objects.filter(
-            category__icontains=category_name,
+            in_category(category_name),
             stock__gt=0
         ).exclude(id__in=[p.id for p in products]).exclude(image='').order_by('-rating'))[:3]
     except:
@@ -329,53 +364,61 @@ def category_products(request, category_name):
     }
     return render(request, 'storefront/category_products.html', context)
 
-def product_detail(request, product_id):
+async def product_detail(request, product_id):
     """Show detailed view of a product"""
     # Clear any old messages when loading the product detail page
     storage = messages.get_messages(request)
     storage.used = True
-    
-    product = get_object_or_404(Product, id=product_id)
 
-    # Record interest for personalization
-    try:
-        clicks = request.session.get('category_clicks', {})
-        if product and product.category:
-            clicks[product.category] = clicks.get(product.category, 0) + 1
-            request.session['category_clicks'] = clicks
-            request.session.modified = True
-    except Exception:
-        pass
-    
-    # Get "frequently bought together" recommendations using association rules
-    recommendations = []
-    try:
-        # Find products in same category or get top rated products (only with images)
-        recommendations = Product.objects.filter(
-            category=product.category
-        ).exclude(id=product.id).filter(stock__gt=0).exclude(image='')[:3]
-    except:
-        pass
+    user = request.user = await request.auser()
     
-    # Get cart count if user is logged in
-    cart_count = 0
-    is_favorite = False
-    if request.user.is_authenticated:
+    product = await sync_to_async(get_product)(product_id)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+
+    async def record_interest():
+        # Record interest for personalization
         try:
-            customer = Customer.objects.get(user=request.user)
-            cart = Cart.objects.get(customer=customer)
-            cart_count = cart.items.count()
-        except:
-            cart_count = 0
-        
-        # Check if product is favorited
-        is_favorite = Favorite.objects.filter(user=request.user, product=product).exists()
+            clicks = await request.session.aget('category_clicks', {})
+            if product.category:
+                clicks[product.category] = clicks.get(product.category, 0) + 1
+                await request.session.aset('category_clicks', clicks)
+        except Exception:
+            pass
+
+    async def get_recommendations():
+        # Get "frequently bought together" recommendations using association rules
+        try:
+            # Find products in same category or get top rated products (only with images)
+            return [
+                p async for p in Product.objects.filter(
+                    category=product.category
+                ).exclude(id=product.id).filter(stock__gt=0).exclude(image='')[:3]
+            ]
+        except Exception:
+            return []
+
+    async def get_favorite():
+        # None if not favorited, else whether a restock email was asked for
+        if not user.is_authenticated:
+            return None
+        return await Favorite.objects.filter(user=user, product_id=product.id).values_list(
+            'notify_when_available', flat=True).afirst()
+
+    # Independent queries run concurrently
+    _, recommendations, cart_count, favorite = await asyncio.gather(
+        record_interest(),
+        get_recommendations(),
+        get_cart_count_async(user),
+        get_favorite(),
+    )
     
     context = {
         'product': product,
         'recommendations': recommendations,
         'cart_count': cart_count,
-        'is_favorite': is_favorite,
+        'is_favorite': favorite is not None,
+        'notify_when_available': bool(favorite),
     }
     return render(request, 'storefront/product_detail.html', context)
 
@@ -383,7 +426,9 @@ def product_detail(request, product_id):
 def add_to_cart(request, product_id):
     """Add product to cart"""
     if request.method == 'POST':
-        product = get_object_or_404(Product, id=product_id)
+        product = get_product(product_id)
+        if product is None:
+            raise Http404('No Product matches the given query.')
         quantity = int(request.POST.get('quantity', 1))
         
         customer = get_or_create_customer(request.user)
@@ -416,7 +461,7 @@ def cart(request):
     
     customer = get_or_create_customer(request.user)
     cart = get_or_create_cart(customer)
-    cart_items = cart.items.all()
+    cart_items = get_cart_items(cart)
     
     total = sum(item.get_total() for item in cart_items)
     
@@ -456,7 +501,7 @@ def checkout(request):
     """Checkout page with recommendations based on association rules"""
     customer = get_or_create_customer(request.user)
     cart = get_or_create_cart(customer)
-    cart_items = cart.items.all()
+    cart_items = get_cart_items(cart)
     
     if not cart_items:
         messages.warning(request, 'Your cart is empty!')
@@ -504,63 +549,103 @@ def confirm_order(request):
     if request.method == 'POST':
         customer = get_or_create_customer(request.user)
         cart = get_or_create_cart(customer)
-        cart_items = cart.items.all()
+        cart_items = get_cart_items(cart)
         
         if not cart_items:
             messages.warning(request, 'Your cart is empty!')
             return redirect('storefront:cart')
         
-        # Calculate subtotal and delivery fee
-        subtotal = sum(item.get_total() for item in cart_items)
-        
-        # Calculate delivery fee
-        delivery_fee = Decimal('4.99')
-        free_delivery_threshold = Decimal('150.00')
-        
-        if subtotal >= free_delivery_threshold:
-            delivery_fee = Decimal('0.00')
-        
-        total = subtotal + delivery_fee
-        
-        # Check stock availability
-        for item in cart_items:
-            if item.product.stock < item.quantity:
-                messages.error(request, f'Insufficient stock for {item.product.name}')
-                return redirect('storefront:cart')
-        
-        # Create order
-        order = Order.objects.create(
-            customer=customer,
-            status='Pending',
-            total_amount=total
-        )
-        
-        # Create order items and update stock
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.price
-            )
-            # Update stock
-            item.product.stock -= item.quantity
-            item.product.save()
+        try:
+            with transaction.atomic():
+                # Price and stock from the primary: the cart page's cached or replica rows may be stale
+                products = Product.objects.using(DEFAULT_DB_ALIAS).in_bulk([item.product_id for item in cart_items])
+                for item in cart_items:
+                    product = products.get(item.product_id)
+                    if product is None or product.stock < item.quantity:
+                        raise OutOfStock(item.product.name)
+                    item.product = product
+
+                # Calculate subtotal and delivery fee
+                subtotal = sum(item.get_total() for item in cart_items)
+                delivery_fee = Decimal('4.99')
+                free_delivery_threshold = Decimal('150.00')
+                if subtotal >= free_delivery_threshold:
+                    delivery_fee = Decimal('0.00')
+                total = subtotal + delivery_fee
+
+                # Create order
+                order = Order.objects.create(
+                    customer=customer,
+                    status='Pending',
+                    total_amount=total
+                )
+                
+                # Create order items and update stock
+                order_items = []
+                for item in cart_items:
+                    order_items.append(OrderItem.objects.create(
+                        order=order,
+                        product=item.product,
+                        quantity=item.quantity,
+                        price=item.product.price
+                    ))
+                    # Decrement in the database so concurrent orders cannot oversell
+                    updated = Product.objects.filter(
+                        id=item.product_id, stock__gte=item.quantity
+                    ).update(stock=F('stock') - item.quantity)
+                    if not updated:
+                        raise OutOfStock(item.product.name)
+                
+                # What was bought, as it was bought (storefront/order_summary.py)
+                summary = snapshot_order(order, order_items, request.user, delivery_fee)
+
+                # Clear cart
+                cart.items.all().delete()
+        except OutOfStock as e:
+            messages.error(request, f'Insufficient stock for {e}')
+            return redirect('storefront:cart')
         
-        # Clear cart
-        cart_items.delete()
+        # Push the new order to live dashboards once it is committed
+        transaction.on_commit(lambda: publish_order(order, summary))
+        # Checkout is a durability point for the session (see storefront/sessions.py)
+        persist_session(request.session)
         
         messages.success(request, f'Order #{order.id} confirmed! Thank you for shopping!')
         return redirect('storefront:order_confirmation', order_id=order.id)
     
     return redirect('storefront:checkout')
 
+@login_required
 def order_confirmation(request, order_id):
     """Order confirmation page"""
-    order = get_object_or_404(Order, id=order_id)
+    order = orders.customer_order(request.user, order_id)
     context = {'order': order}
     return render(request, 'storefront/order_confirmation.html', context)
 
+@login_required
+def order_history(request):
+    """The customer's orders, newest first (keyset-paginated, see storefront/orders.py)"""
+    customer_id = Customer.objects.filter(user=request.user).values_list('id', flat=True).first()
+    before = request.GET.get('before')
+    order_list, next_cursor = [], None
+    if customer_id is not None:
+        try:
+            order_list, next_cursor = orders.history_page(customer_id, before)
+        except ValueError:
+            raise Http404('Invalid page')
+    context = {
+        'orders': order_list,
+        'next_cursor': next_cursor,
+        'is_first_page': before is None,
+    }
+    return render(request, 'storefront/order_history.html', context)
+
+@login_required
+def order_detail(request, order_id):
+    """One of the customer's orders with its lines"""
+    order = orders.customer_order(request.user, order_id)
+    return render(request, 'storefront/order_detail.html', {'order': order})
+
 
 @login_required
 def toggle_favorite(request, product_id):
@@ -583,6 +668,26 @@ def toggle_favorite(request, product_id):
     return JsonResponse({'is_favorite': is_favorite})
 
 
+@login_required
+def set_restock_alert(request, product_id):
+    """Turn "notify me when back in stock" on or off (favoriting the product if needed)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+    product = get_object_or_404(Product, id=product_id)
+    try:
+        data = json.loads(request.body or '{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Expected a JSON object'}, status=400)
+    notify = bool(data.get('notify'))
+    favorite, _ = Favorite.objects.get_or_create(user=request.user, product=product)
+    if favorite.notify_when_available != notify:
+        favorite.notify_when_available = notify
+        favorite.save(update_fields=['notify_when_available'])
+    return JsonResponse({'is_favorite': True, 'notify': notify})
+
+
 @login_required
 def favorites(request):
     """Display user's favorite products"""
@@ -617,34 +722,34 @@ def aurabot_reply(request):
             data = json.loads(request.body)
             user_input = data.get("message", "")
             
-            # Simple rule-based responses (no OpenAI for now to avoid API keys)
-            responses = {
-                "hello": "Hello! I'm AuroBot, your friendly assistant at AuroraMart! How can I help you today?",
-                "hi": "Hi there! Welcome to AuroraMart! What can I help you with?",
-                "products": "We have a wide range of products! Check out our categories: Beauty & Personal Care, Home & Kitchen, Fashion, Electronics, and more!",
-                "order": "To place an order, simply add items to your cart and proceed to checkout. We offer free delivery on orders over $150!",
-                "shipping": "We offer fast shipping! Standard delivery is $4.99, and it's FREE for orders over $150!",
-                "help": "I can help you with product information, orders, shipping, promotions, and more. Just ask me anything!",
-                "price": "Great news! We have many products on sale right now with fantastic discounts. Check out our featured products!",
-                "no that's all": "Hope AuroBot could help! Shop Bright and happy shopping! 🌟",
-            }
-            
-            user_lower = user_input.lower()
-            reply = f"I understand you're asking about '{user_input}'. At AuroraMart, we're here to help! Visit our product pages for detailed information, or contact our support team for specific inquiries. Is there anything else I can help you with?"
-            
-            # Check for keywords (check "no thanks" responses first)
-            if "no" in user_lower and ("thanks" in user_lower or "thank" in user_lower):
-                reply = "Hope AuroBot could help! Shop Bright and happy shopping! 🌟"
-            else:
-                # Check for other keywords
-                for key, response in responses.items():
-                    if key in user_lower:
-                        reply = response
-                        break
+            # Rule-based responses from the intent table (storefront/data/intents.json),
+            # with matching products from the search index unless it is small talk
+            reply, products = chat.answer(user_input)
             
-            return JsonResponse({"reply": reply})
+            return JsonResponse({"reply": reply, "products": products})
         except Exception as e:
             return JsonResponse({"reply": "I'm having trouble understanding that. Could you please rephrase?"})
     
     return JsonResponse({"reply": "Please send a POST request with a message."})
 
+@csrf_exempt
+async def aurabot_stream(request):
+    """Chatbot reply streamed as Server-Sent Events (text chunks, then products)"""
+    if request.method != "POST":
+        return JsonResponse({"reply": "Please send a POST request with a message."}, status=405)
+    try:
+        user_input = json.loads(request.body).get("message", "")
+        reply, products = await sync_to_async(chat.answer_off_thread, thread_sensitive=False)(user_input)
+    except Exception:
+        reply, products = "I'm having trouble understanding that. Could you please rephrase?", []
+
+    if isinstance(request, ASGIRequest):
+        events = chat.stream_reply(reply, products, getattr(settings, 'AURABOT_STREAM_DELAY', 0))
+    else:
+        # No pacing under WSGI: each stream holds a worker thread
+        events = chat.reply_events(reply, products)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+